@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Collect the makespans of the runs of insitu-ensemble-simulator into CSV tables.
+
+A log directory holds one run directory <simulations>_<analyses>_<data>_<nodes>.<trial>
+per ensemble and trial, with the configuration written by the scheduler
+(<scenario>_<node heuristic>_<core heuristic>.conf, whose `makespan*` keys are the model
+makespans) and the standard error of the simulator (.err, with the 'End time of the
+simulation') of every scenario and heuristic pair. Run directories are parsed in a
+process pool, every file once, and the normalizations of every table are computed on
+arrays indexed by run directory, scenario, node heuristic and core heuristic:
+
+- statistics: time and model makespans of every cell, normalized by the 'ideal' scenario
+  of its heuristics (ideal-normalization) and by the 'model' heuristics of its scenario
+  (model-normalization)
+- bw: the time of every cell and its model makespans with the bandwidths of the config
+  (Model(B)) and the three others (Model(B1), Model(B2), Model(B3)), the latter normalized
+  by the time
+
+Missing runs leave their time and the ratios that depend on it empty.
+
+    python3 analysis/extract.py statistics|bw <log directory> [<output csv>] [--incremental]
+
+With --incremental, the run directories listed in <output csv>.runs are skipped and the
+rows of the others are appended to the output.
+"""
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import re
+import sys
+import numpy as np
+
+SCENARIOS = ['ideal', 'transit', 'increasing0.25', 'increasing0.5', 'increasing0.75', 'decreasing0.25', 'decreasing0.5', 'decreasing0.75']
+HEURISTICS = ['model', 'even']
+COLUMNS = {
+    'statistics': ['simulation', 'analysis', 'data', 'node', 'scenario', 'heuristic', 'time', 'model', 'model-bw',
+                   'ideal-normalization', 'model-normalization'],
+    'bw': ['simulation', 'analysis', 'data', 'node', 'trial', 'scenario', 'heuristic', 'type', 'time', 'simulator-normalization'],
+}
+# Model makespans of every table, as keys of the configurations
+MAKESPANS = {
+    'statistics': ['makespan', 'makespan_bw'],
+    'bw': ['makespan', 'makespan_1', 'makespan_2', 'makespan_3'],
+}
+END_TIME = re.compile(r'End time of the simulation: *(\S+)')
+MAKESPAN = re.compile(r'^(makespan\w*): *(\S+)', re.MULTILINE)
+
+
+def run_directories(log_dir, done=()):
+    """
+    Run directories of a log directory in name order, except the names in `done`.
+    """
+    names = sorted(entry.name for entry in os.scandir(log_dir) if entry.is_dir())
+    return [os.path.join(log_dir, name) for name in names if name not in done]
+
+
+def parse_run(run_dir, scenarios, heuristics, keys):
+    """
+    End times and model makespans of the cells of a run directory.
+
+    Returns:
+        (end times as written, one per scenario, node and core heuristic, '' if missing;
+        model makespans as written, one list per key and cell)
+
+    """
+    times = []
+    makespans = {key: [] for key in keys}
+    for scenario in scenarios:
+        for node_heuristic in heuristics:
+            for core_heuristic in heuristics:
+                case = os.path.join(run_dir, f'{scenario}_{node_heuristic}_{core_heuristic}')
+                match = None
+                if os.path.exists(case + '.err'):
+                    with open(case + '.err', 'r', errors='replace') as file:
+                        match = END_TIME.search(file.read())
+                times.append(match.group(1) if match else '')
+                values = {}
+                if os.path.exists(case + '.conf'):
+                    with open(case + '.conf', 'r') as file:
+                        values = dict(MAKESPAN.findall(file.read()))
+                for key in keys:
+                    makespans[key].append(values.get(key, ''))
+    return times, makespans
+
+
+def _parse_run(task):
+    return parse_run(*task)
+
+
+def to_float(values):
+    """
+    Array of numbers written as strings, NaN for the empty or invalid ones.
+    """
+    numbers = np.full(len(values), np.nan)
+    for k, value in enumerate(values):
+        try:
+            numbers[k] = float(value)
+        except ValueError:
+            pass
+    return numbers
+
+
+def ratio_strings(numerator, denominator):
+    """
+    numerator / denominator as strings, empty where either is missing or the ratio is
+    not finite.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = numerator / denominator
+    return ['' if not math.isfinite(value) else repr(value) for value in ratio.tolist()]
+
+
+def ingest(table, log_dir, scenarios=SCENARIOS, heuristics=HEURISTICS, processes=None, done=()):
+    """
+    Rows of a table (see COLUMNS) for the run directories of a log directory.
+
+    Args:
+        table: 'statistics' or 'bw'
+        log_dir: log directory
+        scenarios: scenarios of every run directory
+        heuristics: node and core heuristics
+        processes: number of worker processes (number of CPUs if None)
+        done: names of the run directories to skip
+
+    Returns:
+        (names of the run directories, rows)
+
+    """
+    # The normalizations of the statistics need the 'ideal' scenario and the 'model' heuristics
+    read_scenarios = scenarios + [scenario for scenario in ['ideal'] if table == 'statistics' and scenario not in scenarios]
+    read_heuristics = heuristics + [heuristic for heuristic in ['model'] if table == 'statistics' and heuristic not in heuristics]
+    keys = MAKESPANS[table]
+    runs = run_directories(log_dir, done)
+    tasks = [(run_dir, read_scenarios, read_heuristics, keys) for run_dir in runs]
+    if len(tasks) > 1 and processes != 1:
+        with multiprocessing.Pool(processes) as pool:
+            parsed = pool.map(_parse_run, tasks, chunksize=max(1, len(tasks) // (4 * (processes or multiprocessing.cpu_count()))))
+    else:
+        parsed = [_parse_run(task) for task in tasks]
+
+    # Strings and numbers indexed by run, scenario, node heuristic and core heuristic
+    shape = (len(runs), len(read_scenarios), len(read_heuristics), len(read_heuristics))
+    times = np.array([time for run_times, _ in parsed for time in run_times], dtype=object).reshape(shape)
+    makespans = {key: np.array([value for _, run_makespans in parsed for value in run_makespans[key]], dtype=object).reshape(shape)
+                 for key in keys}
+    time = to_float(times.ravel()).reshape(shape)
+    cells = np.ix_(np.arange(len(runs)), [read_scenarios.index(scenario) for scenario in scenarios],
+                   [read_heuristics.index(heuristic) for heuristic in heuristics], [read_heuristics.index(heuristic) for heuristic in heuristics])
+    columns = {'time': times[cells].ravel().tolist()}
+    columns.update((key, makespans[key][cells].ravel().tolist()) for key in keys)
+    if table == 'statistics':
+        ideal = read_scenarios.index('ideal')
+        model = read_heuristics.index('model')
+        columns['ideal-normalization'] = ratio_strings(time[cells].ravel(), np.broadcast_to(time[:, ideal:ideal + 1], shape)[cells].ravel())
+        columns['model-normalization'] = ratio_strings(time[cells].ravel(), np.broadcast_to(time[:, :, model:model + 1, model:model + 1], shape)[cells].ravel())
+    else:
+        for key in keys:
+            columns[key + '-normalization'] = ratio_strings(time[cells].ravel(), to_float(columns[key]))
+
+    rows = []
+    cell = 0
+    for run_dir in runs:
+        # <simulations>_<analyses>_<data>_<nodes>.<trial>
+        name = os.path.basename(run_dir)
+        parts = name.split('.')
+        trial = parts[1] if len(parts) > 1 else ''
+        ensemble = (parts[0].split('_') + [''] * 4)[:4]
+        for scenario in scenarios:
+            for node_heuristic in heuristics:
+                for core_heuristic in heuristics:
+                    heuristic = f'{node_heuristic}-{core_heuristic}'
+                    if table == 'statistics':
+                        rows.append(ensemble + [scenario, heuristic, columns['time'][cell], columns['makespan'][cell], columns['makespan_bw'][cell],
+                                                columns['ideal-normalization'][cell], columns['model-normalization'][cell]])
+                    else:
+                        prefix = ensemble + [trial, scenario, heuristic]
+                        rows.append(prefix + ['Simulator', columns['time'][cell], '1.0'])
+                        for key, label in zip(keys, ['Model(B)', 'Model(B1)', 'Model(B2)', 'Model(B3)']):
+                            rows.append(prefix + [label, columns[key][cell], columns[key + '-normalization'][cell]])
+                    cell += 1
+    return [os.path.basename(run_dir) for run_dir in runs], rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage='python3 extract.py statistics|bw <log directory> [<output csv>] [--incremental] [--processes <number of processes>]')
+    parser.add_argument('table', choices=list(COLUMNS))
+    parser.add_argument('log_dir', help='directory of the run directories')
+    parser.add_argument('output', nargs='?', help='CSV file (standard output if omitted)')
+    parser.add_argument('--incremental', action='store_true', help='only add the run directories missing from <output>.runs to the output')
+    parser.add_argument('--scenarios', nargs='+', default=SCENARIOS)
+    parser.add_argument('--heuristics', nargs='+', default=HEURISTICS, help='node and core heuristics')
+    parser.add_argument('--processes', type=int, help='number of worker processes')
+    args = parser.parse_args()
+    if args.incremental and not args.output:
+        parser.error('--incremental needs an output file')
+
+    done = set()
+    manifest = args.output + '.runs' if args.output else None
+    append = args.incremental and os.path.exists(args.output) and os.path.exists(manifest)
+    if append:
+        with open(manifest, 'r') as file:
+            done = set(file.read().split())
+    names, rows = ingest(args.table, args.log_dir, args.scenarios, args.heuristics, args.processes, done)
+
+    if args.output is None:
+        writer = csv.writer(sys.stdout, lineterminator='\n')
+        writer.writerow(COLUMNS[args.table])
+        writer.writerows(rows)
+    else:
+        with open(args.output, 'a' if append else 'w', newline='') as file:
+            writer = csv.writer(file, lineterminator='\n')
+            if not append:
+                writer.writerow(COLUMNS[args.table])
+            writer.writerows(rows)
+        with open(manifest, 'a' if append else 'w') as file:
+            file.writelines(name + '\n' for name in names)
+        print(f'{len(names)} run directories, {len(rows)} rows written to {args.output}', file=sys.stderr)
@@ -4,4 +4,12 @@ mkdir -p ${log_dir}
 cp build/insitu-ensemble-simulator ${log_dir}
 cp solver/generator.py ${log_dir}
 cp solver/scheduler.py ${log_dir}
+cp solver/engine.py ${log_dir}
+cp solver/search.py ${log_dir}
+cp solver/cache.py ${log_dir}
+cp solver/results.py ${log_dir}
+cp solver/network.py ${log_dir}
+cp solver/simulator.py ${log_dir}
+cp solver/robustness.py ${log_dir}
+cp solver/instrument.py ${log_dir}
 cp run.sh ${log_dir}
\ No newline at end of file
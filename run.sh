@@ -2,7 +2,7 @@
 echo "Generating configuration and platform files ..."
 python3 generator.py config.yml platform.xml
 echo "Computing the solution ..."
-python3 scheduler.py config.yml
+python3 scheduler.py config.yml --sweep
 
 scenarios=( "ideal" "transit" "increasing0.25" "increasing0.5" "increasing0.75" "decreasing0.25" "decreasing0.5" "decreasing0.75" )
 # scenarios=( "increasing0.5" )
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the generator and the scheduler over ensemble sizes.
+
+Every case is a synthetic ensemble of a number of members with a number of analyses per
+member (generator.generate() with 4 nodes per member), on which the phases are timed:
+
+- config_generator and platform_generator (written to a temporary directory)
+- load: Scheduler of the generated config
+- coschedule:<scenario> for every scenario of run.sh, with its .conf file
+- heuristic: the greedy 'increasing' loop of Scheduler.heuristic(), on the cases with at
+  most HEURISTIC_ANALYSES analyses (it allocates about one in-transit set per analysis)
+- equation25: engine.solve_equation25() for every analysis in transit, per solve
+
+A phase runs `repeat` times (once if it takes longer than a second) and keeps its
+shortest time, then once more under tracemalloc for the peak of the memory it allocates.
+The results are written to a JSON file, and compared with a baseline JSON of the same
+format: a phase regresses when its time or its peak memory exceeds the baseline by more
+than the threshold (and by more than MIN_TIME or MIN_MEMORY, below which differences are
+noise). Runs offline, without SimGrid or WRENCH:
+
+    python3 solver/benchmark.py [--members 1 10 100 1000 10000] [--analyses 1 4 16] [--output <json>] [--baseline <json>] [--threshold <fraction>]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import engine
+import generator
+from scheduler import Scheduler
+
+MEMBERS = [1, 10, 100, 1000, 10000]
+ANALYSES = [1, 4, 16]
+SCENARIOS = [('ideal', None), ('transit', None)] + [(scenario, ratio) for scenario in ['increasing', 'decreasing'] for ratio in [0.25, 0.5, 0.75]]
+NODES_PER_MEMBER = 4
+# Largest number of analyses of a case whose greedy heuristic is timed
+HEURISTIC_ANALYSES = 4000
+# Time (s) and memory (bytes) differences that never count as regressions
+MIN_TIME = 0.01
+MIN_MEMORY = 1 << 20
+
+
+def measure(function, repeat=3):
+    """
+    Shortest time of `repeat` calls of a function (a single one if it takes longer than a
+    second) and peak memory allocated by one more call.
+
+    Returns:
+        {'time': seconds, 'memory': bytes}
+
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+        if best > 1:
+            break
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return {'time': best, 'memory': peak}
+
+
+def run_case(members, analyses, directory, repeat=3, topology='star', seed=0):
+    """
+    Results of every phase of a case, {phase: measure()}.
+    """
+    spec = generator.load_spec(seed=seed, nodes=NODES_PER_MEMBER * members, simulations=members, analyses=analyses)
+    config_file = os.path.join(directory, 'config.yml')
+    platform_file = os.path.join(directory, 'platform.xml')
+    results = {}
+    results['config_generator'] = measure(lambda: generator.config_generator(config_file, spec), repeat)
+    results['platform_generator'] = measure(lambda: generator.platform_generator(platform_file, topology, spec), repeat)
+    results['load'] = measure(lambda: Scheduler.from_file(config_file), repeat)
+    scheduler = Scheduler.from_file(config_file)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for scenario, ratio in SCENARIOS:
+                results[f'coschedule:{scenario}{ratio or ""}'] = measure(lambda: scheduler.coschedule(scenario, ratio), repeat)
+            if members * analyses <= HEURISTIC_ANALYSES:
+                results['heuristic'] = measure(lambda: scheduler.heuristic('increasing', log_prefix=None), repeat)
+    finally:
+        os.chdir(cwd)
+
+    ensemble = scheduler.ensemble
+    time_nc_sum = engine.sequential_sum(ensemble.ana_time_seq)
+    # Enough solves for a measurable time
+    solves = max(1, int(1e5 // max(1, len(ensemble.analyses))))
+
+    def equation25():
+        for _ in range(solves):
+            engine.solve_equation25(ensemble.ana_time_seq, ensemble.ana_data, ensemble.bandwidth, ensemble.cores, time_nc_sum)
+
+    result = measure(equation25, repeat)
+    results['equation25'] = {'time': result['time'] / solves, 'memory': result['memory']}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Regressions of some results over a baseline.
+
+    Returns:
+        list of (case, phase, metric, baseline value, value)
+
+    """
+    regressions = []
+    for case, phases in results.items():
+        for phase, result in phases.items():
+            base = baseline.get(case, {}).get(phase)
+            if base is None:
+                continue
+            for metric, floor in [('time', MIN_TIME), ('memory', MIN_MEMORY)]:
+                if result[metric] > base[metric] * (1 + threshold) and result[metric] - base[metric] > floor:
+                    regressions.append((case, phase, metric, base[metric], result[metric]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage='python3 benchmark.py [--members <counts>] [--analyses <counts>] [--output <json>] [--baseline <json>] [--threshold <fraction>]')
+    parser.add_argument('--members', nargs='+', type=int, default=MEMBERS, help='numbers of members of the cases')
+    parser.add_argument('--analyses', nargs='+', type=int, default=ANALYSES, help='numbers of analyses per member of the cases')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of every phase, the shortest is kept')
+    parser.add_argument('--topology', choices=['full', 'star'], default='star', help='topology of the generated platforms')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated ensembles')
+    parser.add_argument('--output', help='JSON file of the results')
+    parser.add_argument('--baseline', help='JSON file of the results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='relative increase of a time or a peak memory that fails the comparison')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for members in args.members:
+            for analyses in args.analyses:
+                case = f'{members}x{analyses}'
+                results[case] = run_case(members, analyses, directory, args.repeat, args.topology, args.seed)
+                for phase, result in results[case].items():
+                    print(f'{case:>10} {phase:<28} {result["time"]:12.6f} s {result["memory"] / 2**20:10.2f} MiB', flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'numpy': np.__version__, 'machine': platform.machine(),
+                       'processor': platform.processor(), 'results': results}, file, indent=1)
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for case, phase, metric, base, value in regressions:
+            print(f'Regression of {case} {phase}: {metric} {base:.6g} -> {value:.6g} ({100 * (value / base - 1):+.1f}%)')
+        if regressions:
+            sys.exit(1)
+        print(f'No regression over {args.baseline} (threshold {100 * args.threshold:.0f}%)')
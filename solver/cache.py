@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of allocations.
+
+An allocation only depends on the ensemble and its platform, on the in-transit analyses
+in scheduling order (the even split of the in-transit cores and the ties of the rounding
+follow it) and on the node and core heuristics, so it is stored under a hash of
+(Ensemble.digest, in-transit index array, node heuristic, core heuristic). The solution
+u of Equation 25 only depends on the ensemble and the in-transit analyses and is shared
+by the four heuristic pairs. Entries are kept in memory with least recently used eviction and,
+optionally, in a directory shared between runs.
+"""
+import os
+import copy
+import pickle
+import hashlib
+import threading
+import collections
+import numpy as np
+import engine
+import instrument
+
+
+class AllocationCache:
+    """
+    Cache of engine.allocate().
+
+    allocate() returns a deep copy of the cached allocation, arrays included, so that
+    callers never share an allocation. Cached allocations are not sent with their
+    ensemble: they are attached to the ensemble of the caller, whose digest is part of
+    the key.
+    """
+
+    def __init__(self, maxsize=256, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Worker processes start with an empty memory cache and share the directory
+        state = dict(self.__dict__)
+        state['entries'] = collections.OrderedDict()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(ensemble, in_transit, *heuristics):
+        """
+        Key of in-transit analyses (index array in scheduling order, or mask in index order),
+        with or without heuristics.
+        """
+        in_transit = np.asarray(in_transit)
+        if in_transit.dtype == bool:
+            in_transit = np.flatnonzero(in_transit)
+        digest = hashlib.sha256(ensemble.digest.encode())
+        digest.update(in_transit.astype(np.int64).tobytes())
+        digest.update(repr(heuristics).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Cached value of a key, None if it is not cached.
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                return value
+        if self.directory is not None:
+            try:
+                with open(self.path(key), 'rb') as file:
+                    value = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                return None
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory is not None:
+            path = self.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so that concurrent runs never read a partial entry
+            temporary_file = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_file, 'wb') as file:
+                pickle.dump(value, file)
+            os.replace(temporary_file, path)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def allocate(self, ensemble, in_transit, node_heuristic='model', core_heuristic='model'):
+        """
+        Cached engine.allocate().
+        """
+        in_transit = np.asarray(in_transit)
+        if in_transit.dtype != bool:
+            in_transit = in_transit.astype(int)
+        key = self.key(ensemble, in_transit, node_heuristic, core_heuristic)
+        allocation = self.get(key)
+        if allocation is None:
+            self.misses += 1
+            instrument.count('cache_misses')
+            u_key = self.key(ensemble, in_transit)
+            allocation = engine.allocate(ensemble, in_transit, node_heuristic, core_heuristic, u=self.get(u_key))
+            if allocation.u is not None:
+                self.put(u_key, allocation.u)
+            self.put(key, allocation)
+        else:
+            self.hits += 1
+            instrument.count('cache_hits')
+        # Copied without its ensemble (see engine.Allocation.__getstate__())
+        allocation = copy.deepcopy(allocation)
+        allocation.ensemble = ensemble
+        # Keep the scheduling order of the caller
+        allocation.in_transit = np.flatnonzero(in_transit) if in_transit.dtype == bool else in_transit
+        return allocation
@@ -0,0 +1,1475 @@
+#!/usr/bin/env python3
+"""
+Vectorized allocation engine.
+
+The ensemble is stored as flat arrays (one entry per simulation and one entry per
+analysis) and the in-transit set as an index array, so that t(S), t(P^C), t(P^NC),
+core shares and node shares are computed with batched array operations instead of
+walking the nested config['simulations'][sim]['coupling'][ana] dictionaries.
+allocate() (and IncrementalAllocator for growing in-transit sets) computes the
+allocation model step by step, and Allocation.to_config() writes its fields into the
+configuration, so its output can be fed to insitu-ensemble-simulator unchanged.
+"""
+import sys
+import math
+import heapq
+import hashlib
+import functools
+import numpy as np
+import instrument
+from network import node_partitions
+
+# Allocations repeated at most by _allocate() with a network model
+MAX_NETWORK_ITERATIONS = 20
+# Members of the slowest partition that _allocate_partitions() tries to move at every step
+PARTITION_CANDIDATES = 8
+
+
+def sequential_sum(values):
+    """
+    Sum values left to right (as a Python loop would) to get bitwise identical results.
+    """
+    if len(values) == 0:
+        return 0
+    return float(np.cumsum(values)[-1])
+
+
+@instrument.timed('equation25')
+def solve_equation25(time_seqs, data_sizes, bandwidth, cores, time_nc_sum, max_iter=100, guess=None):
+    """
+    Solve Equation 25 for u numerically.
+
+        sum_A t(A) / (B * t(P^NC) + u - c * d(A)) = 1 / B
+
+    The left-hand side has a pole at u = c * d(A) - B * t(P^NC) for every in-transit
+    analysis A. To the right of the largest pole it decreases monotonically and convexly
+    from +inf to 0, so the equation has exactly one root there, which is also the largest
+    real root of the equation (the one picked by solveset). The root lies in
+    [max(p_max, p_min + B * t), p_max + B * t] with t = sum_A t(A), which is searched with
+    Newton's method safeguarded by bisection.
+
+    Args:
+        time_seqs: sequential time t(A) of each in-transit analysis
+        data_sizes: data size d(A) read by each in-transit analysis
+        bandwidth: bandwidth B
+        cores: number of cores per node c
+        time_nc_sum: t(P^NC)
+        max_iter: maximum number of iterations
+        guess: starting point (e.g. the root of a neighbouring in-transit set), used if
+            it lies inside the bracket
+
+    Returns:
+        The largest real root u
+
+    """
+    time_seqs = np.asarray(time_seqs, dtype=float)
+    offsets = bandwidth * time_nc_sum - cores * np.asarray(data_sizes, dtype=float)
+    time_sum = sequential_sum(time_seqs)
+    pole = -float(offsets.min())
+    lo = max(pole, -float(offsets.max()) + bandwidth * time_sum)
+    hi = pole + bandwidth * time_sum
+    if hi <= lo:
+        return hi
+
+    u = guess if guess is not None and lo < guess < hi else hi
+    for _ in range(max_iter):
+        ratio = time_seqs / (offsets + u)
+        value = sequential_sum(ratio) - 1 / bandwidth
+        if value == 0:
+            return u
+        if value > 0:
+            lo = u
+        else:
+            hi = u
+        slope = -float(np.dot(ratio, 1 / (offsets + u)))
+        step = u - value / slope
+        # Fall back to bisection when the Newton step leaves the bracket
+        if not lo < step < hi:
+            step = lo + (hi - lo) / 2
+        if abs(step - u) <= 4 * sys.float_info.epsilon * abs(u) or step in (lo, hi):
+            return step
+        u = step
+    return u
+
+
+@instrument.timed('rounding')
+def apportion(shares, capacity, groups=None, minimum=1):
+    """
+    Turn fractional shares into integers that sum up to a capacity (largest remainder).
+
+    Every component first gets the integer part of its share, and the units left in its
+    group go to the components with the largest fractional parts (ties go to the larger
+    share, then to the first component). Positive shares below `minimum` are raised to
+    it and the other shares of their group are scaled down so that the group still sums
+    up to its capacity, while zero shares stay zero. Shares are expected to sum up to
+    the capacity of their group; otherwise they are scaled to it. Runs in O(n log n).
+
+    Args:
+        shares: fractional shares
+        capacity: number of resources per group (scalar or one per group)
+        groups: group index of each share (all shares form one group if None)
+        minimum: minimum number of resources per component
+
+    Returns:
+        (integer shares, feasibility of each group)
+
+    """
+    shares = np.asarray(shares, dtype=float)
+    n = len(shares)
+    if groups is None:
+        groups = np.zeros(n, dtype=int)
+    groups = np.asarray(groups, dtype=int)
+    num_groups = int(groups.max()) + 1 if n else 0
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=float), (num_groups,))
+    positive = shares > 0
+    size = np.bincount(groups, weights=positive, minlength=num_groups)
+    feasible = minimum * size <= capacity
+
+    total = np.bincount(groups, weights=shares, minlength=num_groups)
+    if not np.allclose(total, capacity, rtol=1e-12, atol=0):
+        scale = np.divide(capacity, total, out=np.zeros(num_groups), where=total > 0)
+        shares = shares * scale[groups]
+    # Pin shares below the minimum and rescale the others until none falls below it
+    quota = shares
+    pinned = positive & (shares < minimum)
+    while pinned.any():
+        free_capacity = capacity - minimum * np.bincount(groups, weights=pinned, minlength=num_groups)
+        free_total = np.bincount(groups, weights=np.where(pinned, 0, shares), minlength=num_groups)
+        scale = np.divide(free_capacity, free_total, out=np.zeros(num_groups), where=free_total > 0)
+        quota = np.where(pinned, minimum, shares * scale[groups])
+        below = positive & ~pinned & (quota < minimum)
+        if not below.any():
+            break
+        pinned |= below
+
+    floor = np.floor(quota)
+    remainder = quota - floor
+    left = np.round(capacity - np.bincount(groups, weights=floor, minlength=num_groups)).astype(int)
+    # Rank of every component within its group by decreasing remainder
+    order = np.lexsort((np.arange(n), -shares, -remainder, groups))
+    sorted_groups = groups[order]
+    starts = np.searchsorted(sorted_groups, np.arange(num_groups))
+    rank = np.empty(n, dtype=int)
+    rank[order] = np.arange(n) - starts[sorted_groups]
+    rounded = floor + ((remainder > 0) & (rank < left[groups]))
+    return rounded.astype(int), feasible
+
+
+@instrument.timed('rounding')
+def min_max_counts(weights, capacity, groups=None, offsets=0.0, limits=math.inf):
+    """
+    Integer resources of every component that minimize the largest time
+    weights / min(counts, limits) + offsets within each group, with at least one resource
+    per component and the whole capacity of the group given out, unless its slowest
+    component has reached its limit.
+
+    Every time decreases with the count of its component, so handing the resources out one
+    at a time to the slowest component of the group is optimal (marginal allocation).
+    Once the slowest component of a group is at its limit, no resource lowers the largest
+    time of the group and the rest of its capacity is left out.
+    Runs in O(capacity log n).
+
+    Args:
+        weights: time of each component with one resource, without its offset
+        capacity: number of resources per group (scalar or one per group)
+        groups: group index of each component (all components form one group if None)
+        offsets: time of each component that does not decrease with its resources
+        limits: resources of each component beyond which its time does not decrease
+
+    Returns:
+        (integer counts, feasibility of each group)
+
+    """
+    weights = np.asarray(weights, dtype=float)
+    n = len(weights)
+    if groups is None:
+        groups = np.zeros(n, dtype=int)
+    groups = np.asarray(groups, dtype=int)
+    num_groups = int(groups.max()) + 1 if n else 0
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=int), (num_groups,))
+    left = capacity - np.bincount(groups, minlength=num_groups)
+    feasible = left >= 0
+    weights = weights.tolist()
+    offsets = np.broadcast_to(np.asarray(offsets, dtype=float), (n,)).tolist()
+    limits = np.broadcast_to(np.asarray(limits, dtype=float), (n,)).tolist()
+    groups = groups.tolist()
+    left = left.tolist()
+    counts = [1] * n
+    heap = [(-(weights[k] + offsets[k]), k) for k in range(n) if left[groups[k]] > 0]
+    heapq.heapify(heap)
+    while heap:
+        _, k = heapq.heappop(heap)
+        if left[groups[k]] <= 0:
+            continue
+        if counts[k] >= limits[k]:
+            # The slowest component of the group is saturated
+            left[groups[k]] = 0
+            continue
+        counts[k] += 1
+        left[groups[k]] -= 1
+        heapq.heappush(heap, (-(weights[k] / min(counts[k], limits[k]) + offsets[k]), k))
+    return np.array(counts, dtype=int), feasible
+
+
+def min_max_shares(weights, capacity, groups=None, offsets=0.0, limits=np.inf):
+    """
+    Continuous counterpart of min_max_counts(): fractional resources of every component
+    that equalize the times weights / min(shares, limits) + offsets within each group.
+
+    The shares at time T are min(limits, weights / (T - offsets)), which decreases with T,
+    so T is found by bisection where they sum up to the capacity of the group. If the
+    components of a group cannot use its capacity before their limits, T is the time of
+    its slowest saturated component and the shares sum up to less than the capacity.
+
+    Args:
+        weights: time of each component with one resource, without its offset
+        capacity: number of resources per group (scalar or one per group)
+        groups: group index of each component (all components form one group if None)
+        offsets: time of each component that does not decrease with its resources
+        limits: resources of each component beyond which its time does not decrease
+
+    Returns:
+        (fractional shares, time T of each group)
+
+    """
+    weights = np.asarray(weights, dtype=float)
+    n = len(weights)
+    if groups is None:
+        groups = np.zeros(n, dtype=int)
+    groups = np.asarray(groups, dtype=int)
+    num_groups = int(groups.max()) + 1 if n else 0
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=float), (num_groups,))
+    offsets = np.broadcast_to(np.asarray(offsets, dtype=float), (n,))
+    limits = np.broadcast_to(np.asarray(limits, dtype=float), (n,))
+
+    def shares(time):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(weights > 0, weights / (time[groups] - offsets), 0.0)
+        return np.where(share >= 0, np.minimum(share, limits), limits)
+
+    def total(time):
+        return np.bincount(groups, weights=shares(time), minlength=num_groups)
+
+    # No group is faster than its slowest component at its limit, nor than its largest
+    # offset; with capacity / size resources each, every group is at least as fast as hi
+    size = np.bincount(groups, minlength=num_groups)
+    lo = np.full(num_groups, -np.inf)
+    np.maximum.at(lo, groups, offsets + weights / limits)
+    hi = np.full(num_groups, -np.inf)
+    np.maximum.at(hi, groups, offsets + weights * size[groups] / capacity[groups])
+    hi = np.maximum(hi, lo)
+    search = total(lo) > capacity
+    for _ in range(200):
+        if not search.any():
+            break
+        middle = lo + (hi - lo) / 2
+        search &= (lo < middle) & (middle < hi)
+        above = total(middle) > capacity
+        lo = np.where(search & above, middle, lo)
+        hi = np.where(search & ~above, middle, hi)
+    time = np.where(total(lo) > capacity, hi, lo)
+    return shares(time), time
+
+
+def speedup(cores, serial, saturation):
+    """
+    Speedup of components on some cores of a node under Amdahl's law with a serial
+    fraction, where cores beyond the saturation (of the memory bandwidth) add nothing.
+    Without serial fraction nor saturation, it is the number of cores.
+    """
+    cores = np.minimum(cores, saturation)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(cores > 0, cores / (serial * cores + 1 - serial), 0.0)
+
+
+def pipelined_makespan(ensemble, sim_time, read_time, analyze_time):
+    """
+    Critical path of the step DAG that insitu-ensemble-simulator runs for an allocation.
+
+    Every step of a member computes (t(S)) and writes its data, then every analysis A
+    reads (t(R_A)) and analyzes (t(A)) it. The write of step s waits for the compute of
+    step s and the reads of step s - 1, the compute of step s + 1 for that write and the
+    read of step s + 1 for the analysis of step s, so steps overlap. Writes are not part of
+    the model, so the end times W of the writes and R of the reads follow the max-plus
+    recurrence
+
+        W(s) = max(W(s - 1) + t(S), max_A R_A(s - 1))
+        R_A(s) = max(W(s), R_A(s - 1) + t(A)) + t(R_A)
+
+    whose longest path has a closed form: the simulation advances by
+    p = max(t(S), max_A t(R_A)) per step, and the path through analysis A enters its chain
+    at the first or the last step, so over n steps
+
+        T = t(S) + max((n - 1) p, max_A ((n - 1) max(p, t(R_A) + t(A)) + t(R_A) + t(A)))
+
+    An analysis that runs every k steps only reads and analyzes steps 0, k, 2k, ..., the
+    read of a run waiting for the analysis of the previous run, and only delays the writes
+    of the steps that follow its runs. The recurrence is then run step by step.
+
+    Args:
+        ensemble: Ensemble
+        sim_time: compute time of every simulation per step
+        read_time: read time of every analysis per run
+        analyze_time: analysis time of every analysis per run
+
+    Returns:
+        The makespan
+
+    """
+    steps = ensemble.steps
+    sim_time = np.asarray(sim_time, dtype=float)
+    read_time = np.asarray(read_time, dtype=float)
+    if (ensemble.frequency > 1).any():
+        return _bursty_makespan(ensemble, sim_time, read_time, np.asarray(analyze_time, dtype=float))
+    chain = read_time + np.asarray(analyze_time, dtype=float)
+    period = sim_time.copy()
+    np.maximum.at(period, ensemble.member, read_time)
+    # Longest path ending at the simulation, then through every analysis
+    end = (steps - 1) * period
+    np.maximum.at(end, ensemble.member, (steps - 1) * np.maximum(period[ensemble.member], chain) + chain)
+    return float((sim_time + end).max(initial=0.0))
+
+
+def _bursty_makespan(ensemble, sim_time, read_time, analyze_time):
+    """
+    pipelined_makespan() of analyses that run every `frequency` steps, from the max-plus
+    recurrence step by step: the end of every write W, of the last read R_A and of the
+    last analysis E_A of every analysis.
+    """
+    num_sims = len(sim_time)
+    frequency = ensemble.frequency
+    member = ensemble.member
+    write = np.zeros(num_sims)
+    read = np.zeros(len(member))
+    done = np.zeros(len(member))
+    # Slowest read of the previous step of every member
+    last_read = np.zeros(num_sims)
+    for step in range(ensemble.steps):
+        write = np.maximum(write + sim_time, last_read)
+        active = np.flatnonzero(step % frequency == 0)
+        read[active] = np.maximum(write[member[active]], done[active]) + read_time[active]
+        done[active] = read[active] + analyze_time[active]
+        last_read = np.zeros(num_sims)
+        np.maximum.at(last_read, member[active], read[active])
+    end = write.copy()
+    np.maximum.at(end, member, done)
+    return float(end.max(initial=0.0))
+
+
+@instrument.timed('equation25')
+def solve_amdahl(time_seqs, data_sizes, bandwidth, cores, time_nc_sum, serial, saturation):
+    """
+    Counterpart of solve_equation25() for in-transit analyses with serial fractions and
+    saturated cores.
+
+    Equation 25 equalizes the times t(A) / c(A) + d(A) / B of the in-transit analyses on
+    one node at (B t(P^NC) + u) / (B c). Here the times are
+    s t(A) + (1 - s) t(A) / min(c(A), saturation) + d(A) / B, equalized by min_max_shares(),
+    and u is given by the same relation, so that n^{NC} follows from it unchanged.
+
+    Returns:
+        u
+
+    """
+    time_seqs = np.asarray(time_seqs, dtype=float)
+    _, time = min_max_shares(time_seqs * (1 - serial), cores, offsets=time_seqs * serial + np.asarray(data_sizes) / bandwidth, limits=saturation)
+    return bandwidth * cores * float(time[0]) - bandwidth * time_nc_sum
+
+
+class Ensemble:
+    """
+    Flat-array description of an ensemble and its platform.
+
+    Simulation arrays are indexed by member, analysis arrays by analysis in the order of
+    the config file; `member` maps every analysis to the index of its simulation.
+    """
+
+    def __init__(self, config, network=None):
+        self.config = config
+        simulations_config = config['simulations']
+        self.nodes = config['nodes']
+        # network.NetworkModel of the platform, None to give every in-transit node the bandwidth of the config
+        self.network = network
+        if network is not None and network.nodes < self.nodes:
+            raise ValueError(f'The platform has {network.nodes} nodes, the config {self.nodes}')
+        self.cores = config['cores']
+        self.bandwidth = config['bandwidth']
+        self.speed = config['speed']
+        self.memory = config['memory']
+        # Partitions of identical nodes (nodes, speed, cores, memory) in node order; the
+        # speed of the config is the one of the sequential times
+        self.partitions = node_partitions(config, network)
+        self.heterogeneous = self.partitions != [(self.nodes, self.speed, self.cores, self.memory)]
+        # Number of staging partitions the in-transit analyses are split into
+        self.staging = config.get('staging', 1)
+        if self.staging < 1:
+            raise ValueError(f'The number of staging partitions must be positive, not {self.staging}')
+        if self.heterogeneous and self.staging > 1:
+            raise ValueError('Several staging partitions are not supported on platforms with different nodes')
+        self.steps = config['steps']
+        self.simulations = list(simulations_config)
+        self.analyses = []
+        member = []
+        for i, sim in enumerate(self.simulations):
+            for ana in simulations_config[sim]['coupling']:
+                self.analyses.append((sim, ana))
+                member.append(i)
+        self.index = {sim_ana: i for i, sim_ana in enumerate(self.analyses)}
+        self.member = np.array(member, dtype=int)
+        self.time_seq = np.array([simulations_config[sim]['time_seq'] for sim in self.simulations], dtype=float)
+        self.flop = np.array([simulations_config[sim]['flop'] for sim in self.simulations], dtype=float)
+        self.data = np.array([simulations_config[sim]['data'] for sim in self.simulations])
+        # Every analysis runs on one step out of `frequency` (the first one, then every
+        # frequency steps), `runs` times in all; it is allocated for its sequential time
+        # and its data amortized over the steps between two runs
+        self.frequency = np.array([simulations_config[sim]['coupling'][ana].get('frequency', 1) for sim, ana in self.analyses], dtype=int)
+        if (self.frequency < 1).any():
+            raise ValueError('Analysis frequencies must be positive')
+        self.runs = -(-self.steps // self.frequency)
+        # Share of the steps on which every analysis runs, so that steps times its time per
+        # run times this share is the time of all its runs
+        self.duty = self.runs / self.steps
+        self.ana_time_seq = np.array([simulations_config[sim]['coupling'][ana]['time_seq'] for sim, ana in self.analyses], dtype=float) / self.frequency
+        self.ana_flop = np.array([simulations_config[sim]['coupling'][ana]['flop'] for sim, ana in self.analyses], dtype=float)
+        self.mem = np.array([simulations_config[sim].get('mem', 0) for sim in self.simulations], dtype=float)
+        self.ana_mem = np.array([simulations_config[sim]['coupling'][ana].get('mem', 0) for sim, ana in self.analyses], dtype=float)
+        self.ana_data = self.data[self.member] / self.frequency
+        # Serial fraction (Amdahl's law) and cores per node beyond which the memory bandwidth
+        # is saturated of every component, by default perfectly parallel up to every core
+        components = [simulations_config[sim] for sim in self.simulations] + [simulations_config[sim]['coupling'][ana] for sim, ana in self.analyses]
+        serial = np.array([component.get('serial_fraction', 0) for component in components], dtype=float)
+        saturation = np.array([component.get('saturation_cores', math.inf) for component in components], dtype=float)
+        if ((serial < 0) | (serial > 1)).any():
+            raise ValueError('Serial fractions must lie between 0 and 1')
+        if (saturation < 1).any():
+            raise ValueError('Saturation core counts must be at least 1')
+        self.serial, self.ana_serial = serial[:len(self.simulations)], serial[len(self.simulations):]
+        self.saturation, self.ana_saturation = saturation[:len(self.simulations)], saturation[len(self.simulations):]
+        self.amdahl = bool(serial.any() or np.isfinite(saturation).any())
+        # Position of every analysis inside its member, used to pad per-member arrays
+        self.position = np.arange(len(self.analyses)) - np.searchsorted(self.member, self.member)
+        self.max_analyses = int(self.position.max()) + 1 if len(self.analyses) else 0
+        # Analyses of member i are analyses[first[i]:last[i]]
+        self.first = np.searchsorted(self.member, np.arange(len(self.simulations)))
+        self.last = np.searchsorted(self.member, np.arange(len(self.simulations)), side='right')
+        for array in (self.member, self.time_seq, self.flop, self.data, self.ana_time_seq, self.ana_flop, self.mem, self.ana_mem,
+                      self.frequency, self.runs, self.duty, self.ana_data, self.serial, self.ana_serial, self.saturation,
+                      self.ana_saturation, self.position, self.first, self.last):
+            array.flags.writeable = False
+
+    def in_transit(self, scheduling_config):
+        """
+        Index array of in-transit analyses in the order of a 'non-co-scheduling' mapping.
+        """
+        return np.array([self.index[(sim, ana)] for sim in scheduling_config for ana in scheduling_config[sim]], dtype=int)
+
+    def scheduling(self, in_transit):
+        """
+        'non-co-scheduling' mapping of an index array (or a mask) of in-transit analyses.
+        """
+        in_transit = np.asarray(in_transit)
+        if in_transit.dtype == bool:
+            in_transit = np.flatnonzero(in_transit)
+        scheduling_config = {sim: [] for sim in self.simulations}
+        for i in in_transit.tolist():
+            sim, ana = self.analyses[i]
+            scheduling_config[sim].append(ana)
+        return scheduling_config
+
+    def mask(self, in_transit):
+        """
+        In-transit mask from an index array (or a mask).
+        """
+        in_transit = np.asarray(in_transit)
+        if in_transit.dtype == bool:
+            return in_transit
+        mask = np.zeros(len(self.analyses), dtype=bool)
+        mask[in_transit] = True
+        return mask
+
+    @functools.cached_property
+    def digest(self):
+        """
+        Content hash of the ensemble and its platform, the same for equal ensembles
+        loaded from different files.
+        """
+        digest = hashlib.sha256(repr((self.nodes, self.cores, self.bandwidth, self.speed, self.memory, self.steps,
+                                      self.simulations, self.analyses)).encode())
+        for array in (self.time_seq, self.flop, self.data, self.ana_time_seq, self.ana_flop, self.mem, self.ana_mem):
+            digest.update(np.ascontiguousarray(array, dtype=float).tobytes())
+        if self.network is not None:
+            digest.update(self.network.digest.encode())
+        if self.heterogeneous:
+            digest.update(repr(self.partitions).encode())
+        if self.staging > 1:
+            digest.update(repr(self.staging).encode())
+        if self.amdahl:
+            for array in (self.serial, self.ana_serial, self.saturation, self.ana_saturation):
+                digest.update(np.ascontiguousarray(array, dtype=float).tobytes())
+        if (self.frequency > 1).any():
+            digest.update(np.ascontiguousarray(self.frequency, dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def member_sum(self, values):
+        """
+        t(M) of every member: the simulation time plus the given analysis times, summed
+        left to right for each member.
+        """
+        padded = np.zeros((len(self.simulations), self.max_analyses))
+        padded[self.member, self.position] = values
+        total = self.time_seq.copy()
+        for k in range(self.max_analyses):
+            total += padded[:, k]
+        return total
+
+    def platform_config(self):
+        """
+        Config of the ensemble with the partitions read from the platform (if the config
+        does not list them), from which Ensemble() rebuilds the same partitions without
+        the platform.
+        """
+        if self.heterogeneous and not self.config.get('partitions'):
+            return dict(self.config, partitions=[{'nodes': nodes, 'speed': speed, 'cores': cores, 'memory': memory}
+                                                 for nodes, speed, cores, memory in self.partitions])
+        return self.config
+
+
+class Allocation:
+    """
+    Result of Ensemble allocation with one entry per simulation or analysis.
+    """
+
+    def __init__(self, ensemble, in_transit, node_heuristic, core_heuristic):
+        self.ensemble = ensemble
+        self.mask = ensemble.mask(in_transit)
+        self.in_transit = np.flatnonzero(self.mask) if in_transit.dtype == bool else in_transit
+        self.node_heuristic = node_heuristic
+        self.core_heuristic = core_heuristic
+        self.feasible = False
+        self.message = None
+        num_anas = len(ensemble.analyses)
+        self.ana_core_nr = np.full(num_anas, np.nan)
+        # Bandwidth of the read of every in-transit analysis (GB/s, over all its nodes)
+        self.read_bandwidth = np.full(num_anas, np.nan)
+        self.ana_time_k = None
+        self.node_nr = None
+        self.sim_core_nr = None
+        self.nc_node_nr = None
+        # Staging partition of every in-transit analysis (-1 if co-scheduled), nodes of
+        # every partition and their first node; nc_node is their total
+        self.staging = np.full(num_anas, -1)
+        self.stage_node = np.zeros(0, dtype=int)
+        self.stage_node_nr = None
+        self.stage_start = np.zeros(0, dtype=int)
+        self.makespan = None
+        self.makespans = None
+        self.makespan_pipelined = None
+        self.u = None
+
+    def __getstate__(self):
+        # The ensemble is shared by every allocation, do not send it between processes
+        state = dict(self.__dict__)
+        state['ensemble'] = None
+        return state
+
+    @instrument.timed('serialize')
+    def to_config(self):
+        """
+        Build the same configuration allocate() writes into config.
+        """
+        ensemble = self.ensemble
+        simulations_config = ensemble.config['simulations']
+        # Partitions read from the platform are written for the simulator
+        config = {key: value for key, value in ensemble.platform_config().items() if key != 'simulations'}
+        config['non-co-scheduling'] = ensemble.scheduling(self.in_transit)
+
+        allocations = {}
+        stage_node = self.stage_node.tolist() or [int(self.nc_node)]
+        for k, count in enumerate(stage_node):
+            name = staging_name(k)
+            allocations[name] = {'node': count}
+            if self.stage_node_nr is not None and len(stage_node) > 1:
+                allocations[name]['node_nr'] = float(self.stage_node_nr[k])
+            elif self.nc_node_nr is not None:
+                allocations[name]['node_nr'] = self.nc_node_nr
+            if count > 0:
+                allocations[name]['start'] = int(self.stage_start[k])
+                allocations[name]['end'] = int(self.stage_start[k]) + count - 1
+        node = self.node.tolist()
+        start = self.start.tolist()
+        for i, sim in enumerate(ensemble.simulations):
+            allocations[sim] = {'node': node[i]}
+            if self.node_nr is not None:
+                allocations[sim]['node_nr'] = float(self.node_nr[i])
+            if node[i] > 0:
+                allocations[sim]['start'] = start[i]
+                allocations[sim]['end'] = start[i] + node[i] - 1
+        config['allocations'] = allocations
+
+        sim_core = self.sim_core.tolist()
+        sim_time = self.sim_time.tolist()
+        time_sum = self.time_sum.tolist()
+        ana_core = self.ana_core.tolist()
+        ana_core_nr = self.ana_core_nr.tolist()
+        ana_time = self.ana_time.tolist()
+        read_bandwidth = self.read_bandwidth.tolist()
+        mask = self.mask.tolist()
+        staging = self.staging.tolist()
+        config['simulations'] = {}
+        for i, sim in enumerate(ensemble.simulations):
+            sim_config = dict(simulations_config[sim])
+            sim_config['alloc'] = sim
+            sim_config['time_sum'] = time_sum[i]
+            sim_config['core_per_node'] = sim_core[i]
+            if self.sim_core_nr is not None:
+                sim_config['core_per_node_nr'] = float(self.sim_core_nr[i])
+            sim_config['time'] = sim_time[i]
+            sim_config['coupling'] = {ana: dict(ana_config) for ana, ana_config in simulations_config[sim]['coupling'].items()}
+            config['simulations'][sim] = sim_config
+        for j, (sim, ana) in enumerate(ensemble.analyses):
+            ana_config = config['simulations'][sim]['coupling'][ana]
+            ana_config['alloc'] = staging_name(staging[j]) if mask[j] else sim
+            ana_config['core_per_node'] = ana_core[j]
+            if not np.isnan(ana_core_nr[j]):
+                ana_config['core_per_node_nr'] = ana_core_nr[j]
+            ana_config['time'] = ana_time[j]
+            if mask[j] and not np.isnan(read_bandwidth[j]):
+                ana_config['read_bandwidth'] = read_bandwidth[j]
+            if mask[j] and self.ana_time_k is not None:
+                for k in range(3):
+                    ana_config['time_' + str(k + 1)] = float(self.ana_time_k[k][j])
+
+        config['makespan'] = self.makespan
+        for k in range(3):
+            config['makespan_' + str(k + 1)] = self.makespans[k]
+        if self.makespan_pipelined is not None:
+            config['makespan_pipelined'] = self.makespan_pipelined
+        return config
+
+
+class MemberCores:
+    """
+    Core allocation of the simulation and the co-scheduled analyses of every member.
+
+    The cores of a member only depend on its own components and t(M), so they are kept
+    between allocations and only recomputed for the members whose co-scheduled analyses
+    changed.
+    """
+
+    def __init__(self, ensemble, core_heuristic='model'):
+        self.ensemble = ensemble
+        self.core_heuristic = core_heuristic
+        num_sims = len(ensemble.simulations)
+        num_anas = len(ensemble.analyses)
+        self.sim_core = np.zeros(num_sims, dtype=int)
+        self.sim_core_nr = np.zeros(num_sims) if core_heuristic == 'model' else None
+        self.ana_core = np.zeros(num_anas, dtype=int)
+        self.ana_core_nr = np.full(num_anas, np.nan)
+        self.feasible = np.zeros(num_sims, dtype=bool)
+
+    def update(self, mask, time_sum, members=None):
+        """
+        Recompute the cores of some members.
+
+        Args:
+            mask: in-transit mask
+            time_sum: t(M) of every member
+            members: sorted index array of the members to update (all if None)
+
+        """
+        ensemble = self.ensemble
+        cores = ensemble.cores
+        if members is None:
+            members = np.arange(len(ensemble.simulations))
+            index = np.arange(len(ensemble.analyses))
+        else:
+            members = np.asarray(members, dtype=int)
+            index = np.concatenate([np.arange(ensemble.first[i], ensemble.last[i]) for i in members.tolist()] + [np.zeros(0, dtype=int)])
+        num_members = len(members)
+        self.ana_core[index] = 0
+        self.ana_core_nr[index] = np.nan
+        c_index = index[~mask[index]]
+        # Members renumbered from 0 to num_members - 1
+        c_group = np.searchsorted(members, ensemble.member[c_index])
+        # Every member is a group made of its simulation and its co-scheduled analyses
+        groups = np.concatenate((np.arange(num_members), c_group))
+        if self.core_heuristic == 'model' and ensemble.amdahl:
+            # Shares that equalize the Amdahl times of the components, no more than their
+            # saturation (and the cores past the saturation of every component left out)
+            serial = np.concatenate((ensemble.serial[members], ensemble.ana_serial[c_index]))
+            limits = np.concatenate((ensemble.saturation[members], ensemble.ana_saturation[c_index]))
+            time_seq = np.concatenate((ensemble.time_seq[members], ensemble.ana_time_seq[c_index]))
+            shares, _ = min_max_shares(time_seq * (1 - serial), cores, groups, time_seq * serial, limits)
+            shares = np.maximum(shares, 1)
+            capacity = np.minimum(cores, np.bincount(groups, weights=np.minimum(np.ceil(limits), cores), minlength=num_members))
+            rounded, feasible = apportion(shares, capacity, groups)
+            self.sim_core_nr[members] = shares[:num_members]
+            self.ana_core_nr[c_index] = shares[num_members:]
+            self.feasible[members] = feasible
+            self.sim_core[members] = rounded[:num_members]
+            self.ana_core[c_index] = rounded[num_members:]
+        elif self.core_heuristic == 'model':
+            sim_core = ensemble.time_seq[members] * cores / time_sum[members]
+            c_core = ensemble.ana_time_seq[c_index] * cores / time_sum[ensemble.member[c_index]]
+            rounded, feasible = apportion(np.concatenate((sim_core, c_core)), cores, groups)
+            self.sim_core_nr[members] = sim_core
+            self.ana_core_nr[c_index] = c_core
+            self.feasible[members] = feasible
+            self.sim_core[members] = rounded[:num_members]
+            self.ana_core[c_index] = rounded[num_members:]
+        elif self.core_heuristic == 'exact':
+            # Smallest max(t(S) / c(S), t(A) / c(A)) over integer cores of every member, with
+            # the serial part s t of every time that does not decrease with the cores
+            serial = np.concatenate((ensemble.serial[members], ensemble.ana_serial[c_index]))
+            time_seq = np.concatenate((ensemble.time_seq[members], ensemble.ana_time_seq[c_index]))
+            counts, feasible = min_max_counts(time_seq * (1 - serial), cores, groups, time_seq * serial,
+                                              np.concatenate((ensemble.saturation[members], ensemble.ana_saturation[c_index])))
+            self.feasible[members] = feasible
+            self.sim_core[members] = counts[:num_members]
+            self.ana_core[c_index] = counts[num_members:]
+        else:
+            num_comps = 1 + np.bincount(c_group, minlength=num_members)
+            even_cores = cores // num_comps
+            num_comps_rd = num_comps - (cores - even_cores * num_comps) - 1
+            # Rank of every co-scheduled analysis among the co-scheduled analyses of its member
+            rank = np.arange(len(c_index)) - np.searchsorted(c_group, c_group)
+            self.feasible[members] = True
+            self.sim_core[members] = even_cores
+            self.ana_core[c_index] = np.where(rank < num_comps_rd[c_group], even_cores[c_group], even_cores[c_group] + 1)
+
+
+@instrument.timed('allocate')
+def allocate(ensemble, in_transit, node_heuristic='model', core_heuristic='model', u=None):
+    """
+    Compute the resource allocation for each simulation and analysis.
+
+    Args:
+        ensemble: Ensemble to allocate
+        in_transit: index array (in scheduling order) or mask of in-transit analyses
+        node_heuristic: either 'model', 'even' or 'exact'
+        core_heuristic: either 'model', 'even' or 'exact'
+        u: solution of Equation 25 for this in-transit set if it is already known
+
+    Returns:
+        Allocation, whose `feasible` flag tells whether it is feasible to compute
+        integer resource allocation
+
+    """
+    in_transit = np.asarray(in_transit)
+    if in_transit.dtype != bool:
+        in_transit = in_transit.astype(int)
+    result = Allocation(ensemble, in_transit, node_heuristic, core_heuristic)
+    mask = result.mask
+    ana_time_seq = ensemble.ana_time_seq
+
+    # t(S), t(P^C), t(P^NC)
+    time_s_sum = sequential_sum(ensemble.time_seq)
+    time_c_sum = sequential_sum(ana_time_seq[~mask])
+    time_nc_sum = sequential_sum(ana_time_seq[mask])
+    result.time_sum = ensemble.member_sum(np.where(mask, 0.0, ana_time_seq))
+    member_cores = MemberCores(ensemble, core_heuristic)
+    member_cores.update(mask, result.time_sum)
+    return _allocate(result, time_s_sum, time_c_sum, time_nc_sum, member_cores, u=u)
+
+
+def _member_weights(ensemble, mask, member_cores):
+    """
+    Time of every member on one node: the slowest of its simulation and co-scheduled
+    analyses with the cores of member_cores.
+    """
+    with np.errstate(divide='ignore'):
+        weights = ensemble.time_seq / speedup(member_cores.sim_core, ensemble.serial, ensemble.saturation)
+        c_index = np.flatnonzero(~mask)
+        c_speedup = speedup(member_cores.ana_core[c_index], ensemble.ana_serial[c_index], ensemble.ana_saturation[c_index])
+        np.maximum.at(weights, ensemble.member[c_index], ensemble.ana_time_seq[c_index] / c_speedup)
+    return weights
+
+
+def staging_name(k):
+    """
+    Name of staging partition k in the allocations of a configuration: sim0, then
+    sim0_1, sim0_2, ... (members are named sim1, sim2, ...).
+    """
+    return 'sim0' if k == 0 else 'sim0_' + str(k)
+
+
+def _staging_groups(ensemble, nc_index, nc_time_seq, nc_data):
+    """
+    Split the members into ensemble.staging groups of consecutive members, whose
+    in-transit analyses share a staging partition placed right after them.
+
+    A member weighs t(A) + c d(A) / B over its in-transit analyses A (the share of n^{NC}
+    they need in Equation 25) and groups cut the members at the quantiles of the weight,
+    or of the number of in-transit analyses if a group would hold more of them than the
+    cores of a node. Every group holds at least one member with in-transit analyses, so
+    there are fewer groups if fewer members have some.
+
+    Returns:
+        (group of every member, group of every in-transit analysis)
+
+    """
+    num_sims = len(ensemble.simulations)
+    nc_member = ensemble.member[nc_index]
+    count = np.bincount(nc_member, minlength=num_sims)
+    owners = np.flatnonzero(count)
+    num_groups = min(ensemble.staging, len(owners))
+    if num_groups <= 1:
+        return np.zeros(num_sims, dtype=int), np.zeros(len(nc_index), dtype=int)
+    weight = np.bincount(nc_member, weights=nc_time_seq + ensemble.cores * nc_data / ensemble.bandwidth, minlength=num_sims)
+    for values in (weight[owners], count[owners]):
+        cumulative = np.cumsum(values)
+        # Number of owners in the first k groups
+        cuts = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, num_groups) / num_groups) + 1
+        for k in range(num_groups - 1):
+            cuts[k] = min(max(cuts[k], cuts[k - 1] + 1 if k else 1), len(owners) - (num_groups - 1 - k))
+        owner_group = np.searchsorted(cuts, np.arange(len(owners)), side='right')
+        if np.bincount(owner_group, weights=count[owners]).max() <= ensemble.cores:
+            break
+    # Members without in-transit analyses join the group of the previous owner
+    member_group = owner_group[np.maximum(np.searchsorted(owners, np.arange(num_sims), side='right') - 1, 0)]
+    return member_group, member_group[nc_member]
+
+
+def _in_transit_cores(nc_time_seq, nc_data, bandwidth, cores, time_nc_sum, u, core_heuristic, serial=0.0, saturation=math.inf):
+    """
+    Cores of every in-transit analysis on every in-transit node, for their serial
+    fractions and saturation core counts.
+
+    Returns:
+        (cores, continuous cores of the 'model' heuristic or None, feasible)
+
+    """
+    amdahl = bool(np.any(serial) or np.isfinite(saturation).any())
+    if core_heuristic == 'model' and amdahl:
+        core, _ = min_max_shares(nc_time_seq * (1 - serial), cores, offsets=nc_time_seq * serial + nc_data / bandwidth, limits=saturation)
+        core = np.maximum(core, 1)
+        capacity = min(cores, float(np.minimum(np.ceil(np.broadcast_to(saturation, core.shape)), cores).sum()))
+        nc_core, feasible = apportion(core, capacity)
+        return nc_core, core, bool(feasible.all())
+    if core_heuristic == 'model':
+        core = bandwidth * cores * nc_time_seq / (bandwidth * time_nc_sum + u - cores * nc_data)
+        nc_core, feasible = apportion(core, cores)
+        return nc_core, core, bool(feasible.all())
+    if core_heuristic == 'exact':
+        nc_core, feasible = min_max_counts(nc_time_seq * (1 - serial), cores, offsets=nc_time_seq * serial + nc_data / bandwidth, limits=saturation)
+        return nc_core, None, bool(feasible.all())
+    num_nc_anas = len(nc_time_seq)
+    even_cores = math.floor(cores / num_nc_anas)
+    num_anas_rd = num_nc_anas - (cores - even_cores * num_nc_anas)
+    return np.where(np.arange(num_nc_anas) < num_anas_rd, even_cores, even_cores + 1), None, even_cores >= 1
+
+
+def _allocate(result, time_s_sum, time_c_sum, time_nc_sum, member_cores, guess=None, u=None):
+    """
+    Node allocation and in-transit allocation of allocate(), given t(S), t(P^C), t(P^NC),
+    t(M) (in result.time_sum) and the core allocation of the members. Equation 25 is
+    solved from `guess` unless its solution `u` is given.
+
+    With a network model, an in-transit analysis whose read is slowed down by the links
+    of the platform is allocated as if it read more data: d'(A) = max(d(A), n^{NC} B r(A))
+    with r(A) the read time per step that the links allow, so that its read takes
+    d'(A) / (n^{NC} B) = max(d(A) / (n^{NC} B), r(A)) in Equation 25 and in its time.
+    Both are amortized over the steps between two runs of the analysis.
+    r(A) depends on the placement of the allocation, which depends on d'(A): the
+    allocation is repeated from the model's own until the placement does not change.
+    """
+    network = result.ensemble.network
+    place = _allocate_partitions if result.ensemble.heterogeneous else _allocate_placement
+    if network is None or len(result.in_transit) == 0:
+        return place(result, time_s_sum, time_c_sum, time_nc_sum, member_cores, guess, u)
+    nc_data = None
+    placements = set()
+    for _ in range(MAX_NETWORK_ITERATIONS):
+        attempt = Allocation(result.ensemble, result.in_transit, result.node_heuristic, result.core_heuristic)
+        attempt.time_sum = result.time_sum
+        place(attempt, time_s_sum, time_c_sum, time_nc_sum, member_cores, guess, nc_data=nc_data)
+        if not attempt.feasible:
+            break
+        placement = (tuple(attempt.stage_start.tolist()), tuple(attempt.stage_node.tolist()), tuple(attempt.start.tolist()), tuple(attempt.node.tolist()))
+        if placement in placements:
+            break
+        placements.add(placement)
+        guess = attempt.u
+        ensemble = result.ensemble
+        nc_data = ensemble.ana_data[result.in_transit]
+        nc_nodes = attempt.stage_node[attempt.staging[result.in_transit]]
+        read_times = network.read_times(attempt)[result.in_transit] / ensemble.frequency[result.in_transit]
+        nc_data = np.maximum(nc_data, nc_nodes * ensemble.bandwidth * read_times)
+    result.__dict__.update(attempt.__dict__)
+    return result
+
+
+def _allocate_placement(result, time_s_sum, time_c_sum, time_nc_sum, member_cores, guess=None, u=None, nc_data=None):
+    """
+    _allocate() for the data d'(A) read by every in-transit analysis (their data if None).
+    """
+    ensemble = result.ensemble
+    node_heuristic = result.node_heuristic
+    core_heuristic = result.core_heuristic
+    mask = result.mask
+    nc_index = result.in_transit
+    nodes = ensemble.nodes
+    cores = ensemble.cores
+    bandwidth = ensemble.bandwidth
+    num_sims = len(ensemble.simulations)
+    num_nc_anas = len(nc_index)
+    ana_time_seq = ensemble.ana_time_seq
+    ana_data = ensemble.ana_data
+
+    ana_core = np.zeros(len(ensemble.analyses), dtype=int)
+    # Time of every analysis per run
+    ana_time = np.zeros(len(ensemble.analyses))
+    # Read and analysis parts of the analysis time, separate stages of the DAG
+    read_time = np.zeros(len(ensemble.analyses))
+    analyze_time = np.zeros(len(ensemble.analyses))
+    round_nc_nodes = 0
+    stage_node = np.zeros(0, dtype=int)
+    member_group = np.zeros(num_sims, dtype=int)
+    if num_nc_anas:
+        bandwidths = np.array([
+            bandwidth / num_nc_anas,
+            bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes),
+            bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes * num_nc_anas)])
+        nc_time_seq = ana_time_seq[nc_index]
+        nc_serial = ensemble.ana_serial[nc_index]
+        nc_saturation = ensemble.ana_saturation[nc_index]
+        if nc_data is None:
+            nc_data = ana_data[nc_index]
+        # Staging partition of every in-transit analysis
+        member_group, group = _staging_groups(ensemble, nc_index, nc_time_seq, nc_data)
+        num_groups = int(group.max()) + 1
+        result.staging[nc_index] = group
+        # Resource allocation for P^NC, Equation 25 being solved for every partition
+        nc_core = np.zeros(num_nc_anas, dtype=int)
+        group_u = np.zeros(num_groups)
+        group_time = np.zeros(num_groups)
+        group_weight = np.zeros(num_groups)
+        for g in range(num_groups):
+            index = np.flatnonzero(group == g)
+            time_g = time_nc_sum if num_groups == 1 else sequential_sum(nc_time_seq[index])
+            if (num_groups > 1 or u is None) and ensemble.amdahl:
+                group_u[g] = solve_amdahl(nc_time_seq[index], nc_data[index], bandwidth, cores, time_g, nc_serial[index], nc_saturation[index])
+            elif num_groups > 1 or u is None:
+                group_u[g] = solve_equation25(nc_time_seq[index], nc_data[index], bandwidth, cores, time_g, guess=guess if num_groups == 1 else None)
+            else:
+                group_u[g] = u
+            group_time[g] = time_g
+            nc_core[index], core, feasible = _in_transit_cores(nc_time_seq[index], nc_data[index], bandwidth, cores, time_g, group_u[g], core_heuristic,
+                                                               nc_serial[index], nc_saturation[index])
+            if core is not None:
+                result.ana_core_nr[nc_index[index]] = core
+            if not feasible:
+                result.message = 'Not sufficient resource for core allocation in non-co-scheduling'
+                return result
+            with np.errstate(divide='ignore'):
+                group_weight[g] = (nc_time_seq[index] / speedup(nc_core[index], nc_serial[index], nc_saturation[index]) + nc_data[index] / bandwidth).max()
+        # Sum of the solutions of every partition
+        u = sequential_sum(group_u)
+        result.u = u
+        if node_heuristic == 'model':
+            # Compute n^{NC}; with serial fractions or saturated cores, the work of the
+            # members is c times the sum of their times on one node instead of t(S) + t(P^C)
+            member_work = time_s_sum + time_c_sum
+            if ensemble.amdahl:
+                member_work = cores * sequential_sum(_member_weights(ensemble, mask, member_cores))
+            time_sum = member_work + time_nc_sum
+            nc_nodes = nodes * (bandwidth * time_nc_sum + u) / (bandwidth * time_sum + u)
+            result.nc_node_nr = nc_nodes
+            round_nc_nodes = math.ceil(nc_nodes)
+            if nc_nodes > nodes - 1:
+                round_nc_nodes = math.floor(nc_nodes)
+            elif nc_nodes >= 1:
+                diff_up = max(member_work / (nodes - math.ceil(nc_nodes)), (bandwidth * time_nc_sum + u) / (bandwidth * math.ceil(nc_nodes)))
+                diff_down = max(member_work / (nodes - math.floor(nc_nodes)), (bandwidth * time_nc_sum + u) / (bandwidth * math.floor(nc_nodes)))
+                if diff_down < diff_up:
+                    round_nc_nodes = math.floor(nc_nodes)
+            # Every partition needs B t(P^NC_k) + u_k of the B t(P^NC) + u
+            stage_share = (bandwidth * group_time + group_u) / (bandwidth * time_nc_sum + u)
+            result.stage_node_nr = nc_nodes * stage_share
+        elif node_heuristic == 'exact':
+            # Nodes of the partitions in the best integer split of the nodes between the members and the partitions
+            weights = np.append(_member_weights(ensemble, mask, member_cores), group_weight)
+            round_nc_nodes = int(min_max_counts(weights, nodes)[0][-num_groups:].sum())
+        else:
+            round_nc_nodes = nodes - math.floor(nodes / (num_sims + num_groups)) * num_sims
+
+        if nodes - round_nc_nodes < num_sims:
+            round_nc_nodes = nodes - num_sims
+
+        if num_groups == 1:
+            stage_node = np.array([round_nc_nodes])
+        else:
+            if node_heuristic == 'model':
+                stage_node, feasible = apportion(stage_share * round_nc_nodes, round_nc_nodes)
+            elif node_heuristic == 'exact':
+                stage_node, feasible = min_max_counts(group_weight, round_nc_nodes)
+            else:
+                stage_node = np.where(np.arange(num_groups) < round_nc_nodes % num_groups, 1, 0) + round_nc_nodes // num_groups
+                feasible = stage_node >= 1
+            if not feasible.all():
+                result.message = 'Cannot assign zero node for non-co-scheduling'
+                return result
+        nc_nodes = stage_node[group]
+        # Amortized times per step, then per run
+        time_a = nc_time_seq / (nc_nodes * speedup(nc_core, nc_serial, nc_saturation))
+        nc_read = nc_data / (nc_nodes * bandwidth)
+        nc_frequency = ensemble.frequency[nc_index]
+        ana_core[nc_index] = nc_core
+        read_time[nc_index] = nc_read * nc_frequency
+        analyze_time[nc_index] = time_a * nc_frequency
+        ana_time[nc_index] = (time_a + nc_read) * nc_frequency
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result.read_bandwidth[nc_index] = ana_data[nc_index] / nc_read
+        result.ana_time_k = np.zeros((3, len(ensemble.analyses)))
+        result.ana_time_k[:, nc_index] = (time_a + nc_data / (nc_nodes * bandwidths[:, None])) * nc_frequency
+
+    result.nc_node = round_nc_nodes
+    # Compute n^{C}
+    c_nodes = nodes - round_nc_nodes
+    if c_nodes < 1:
+        result.message = 'Cannot assign zero node for co-scheduling'
+        return result
+
+    # Co-scheduling
+    if node_heuristic == 'model':
+        node = result.time_sum * c_nodes / (time_s_sum + time_c_sum)
+        if ensemble.amdahl:
+            # Shares of the times of the members on one node
+            weights = _member_weights(ensemble, mask, member_cores)
+            node = weights * c_nodes / sequential_sum(weights)
+        result.node_nr = node
+        node, feasible = apportion(node, c_nodes)
+        if not feasible.all():
+            result.message = 'Not sufficient resource for node allocation in co-scheduling'
+            return result
+    elif node_heuristic == 'exact':
+        node, feasible = min_max_counts(_member_weights(ensemble, mask, member_cores), c_nodes)
+        if not feasible.all():
+            result.message = 'Not sufficient resource for node allocation in co-scheduling'
+            return result
+    else:
+        even_nodes = math.floor(c_nodes / num_sims)
+        num_allocs_rd = num_sims - (c_nodes - even_nodes * num_sims)
+        node = np.where(np.arange(num_sims) < num_allocs_rd, even_nodes, even_nodes + 1)
+    result.node = node
+
+    if core_heuristic == 'model':
+        result.sim_core_nr = member_cores.sim_core_nr.copy()
+        result.ana_core_nr[~mask] = member_cores.ana_core_nr[~mask]
+    if core_heuristic in ['model', 'exact'] and not member_cores.feasible.all():
+        result.message = 'Not sufficient resource for core allocations in co-scheduling'
+        return result
+    sim_core = member_cores.sim_core.copy()
+    c_index = np.flatnonzero(~mask)
+    c_member = ensemble.member[c_index]
+    c_core = member_cores.ana_core[c_index]
+    result.sim_core = sim_core
+    result.sim_time = ensemble.time_seq / (node * speedup(sim_core, ensemble.serial, ensemble.saturation))
+    ana_core[c_index] = c_core
+    ana_time[c_index] = ana_time_seq[c_index] / (node[c_member] * speedup(c_core, ensemble.ana_serial[c_index], ensemble.ana_saturation[c_index])) * ensemble.frequency[c_index]
+    analyze_time[c_index] = ana_time[c_index]
+    result.ana_core = ana_core
+    result.ana_time = ana_time
+
+    # The members of every group, then its staging partition
+    before = np.concatenate(([0], np.cumsum(stage_node)))
+    result.start = np.cumsum(node) - node + before[member_group]
+    result.stage_node = stage_node
+    result.stage_start = np.cumsum(np.bincount(member_group, weights=node, minlength=len(stage_node))[:len(stage_node)]).astype(int) + before[:-1]
+    result.nc_start = int(result.stage_start[0]) if len(stage_node) else int(node.sum())
+
+    _makespans(result, read_time, analyze_time)
+    result.feasible = True
+    return result
+
+
+def _makespans(result, read_time, analyze_time):
+    """
+    Makespans of an allocation from the times of its components: the number of steps times
+    the slowest simulation or the slowest analysis over its share of the steps, with the
+    bandwidth of the config and with the three other bandwidths of ana_time_k, and the
+    pipelined makespan of the read and analysis times per run.
+    """
+    ensemble = result.ensemble
+    sim_time = result.sim_time.max(initial=float('-inf'))
+    makespan = max(sim_time, (result.ana_time * ensemble.duty).max(initial=float('-inf')))
+    result.makespan = float(makespan) * ensemble.steps
+    result.makespans = []
+    for k in range(3):
+        time_k = result.ana_time if result.ana_time_k is None else np.where(result.mask, result.ana_time_k[k], result.ana_time)
+        makespan_k = max(sim_time, (time_k * ensemble.duty).max(initial=float('-inf')))
+        result.makespans.append(float(makespan_k) * ensemble.steps)
+    # Writes and local reads are not part of the model
+    result.makespan_pipelined = pipelined_makespan(ensemble, result.sim_time, read_time, analyze_time)
+
+
+def _partition_ensemble(ensemble, members, mask, p, nodes):
+    """
+    Ensemble of some members (a sorted tuple) and their co-scheduled analyses on `nodes`
+    nodes of partition p, with their sequential times at the speed of its nodes. It is
+    sliced from the arrays of the ensemble and has no config.
+    """
+    _, speed, cores, memory = ensemble.partitions[p]
+    scale = ensemble.speed / speed
+    members = np.array(members, dtype=int)
+    selected = np.zeros(len(ensemble.simulations), dtype=bool)
+    selected[members] = True
+    index = np.flatnonzero(selected[ensemble.member] & ~mask)
+    sub = Ensemble.__new__(Ensemble)
+    sub.config = None
+    sub.network = None
+    sub.nodes = nodes
+    sub.cores = cores
+    sub.bandwidth = ensemble.bandwidth
+    sub.speed = speed
+    sub.memory = memory
+    sub.partitions = [(nodes, speed, cores, memory)]
+    sub.heterogeneous = False
+    sub.steps = ensemble.steps
+    sub.simulations = [ensemble.simulations[i] for i in members.tolist()]
+    sub.analyses = [ensemble.analyses[j] for j in index.tolist()]
+    sub.member = np.searchsorted(members, ensemble.member[index])
+    sub.time_seq = ensemble.time_seq[members] * scale
+    sub.flop = ensemble.flop[members]
+    sub.data = ensemble.data[members]
+    sub.mem = ensemble.mem[members]
+    sub.ana_time_seq = ensemble.ana_time_seq[index] * scale
+    sub.ana_flop = ensemble.ana_flop[index]
+    sub.ana_mem = ensemble.ana_mem[index]
+    sub.frequency = ensemble.frequency[index]
+    sub.runs = ensemble.runs[index]
+    sub.duty = ensemble.duty[index]
+    sub.ana_data = ensemble.ana_data[index]
+    sub.serial = ensemble.serial[members]
+    sub.ana_serial = ensemble.ana_serial[index]
+    sub.saturation = ensemble.saturation[members]
+    sub.ana_saturation = ensemble.ana_saturation[index]
+    sub.amdahl = ensemble.amdahl
+    sub.position = np.arange(len(index)) - np.searchsorted(sub.member, sub.member)
+    sub.max_analyses = int(sub.position.max()) + 1 if len(index) else 0
+    sub.first = np.searchsorted(sub.member, np.arange(len(members)))
+    sub.last = np.searchsorted(sub.member, np.arange(len(members)), side='right')
+    return sub
+
+
+def _allocate_partitions(result, time_s_sum, time_c_sum, time_nc_sum, member_cores, guess=None, u=None, nc_data=None):
+    """
+    _allocate_placement() on a platform whose partitions have different nodes.
+
+    Every member and sim0 run within a single partition, where nodes are identical, and
+    the members of a partition are allocated by allocate() with the cores of its nodes
+    and their sequential times scaled by the speed of the config over the speed of its
+    nodes. sim0 gets the cores of the core heuristic on the nodes of its partition and
+    n^{NC} of its nodes: an even share with the 'even' node heuristic, otherwise the
+    fewest nodes on which it is not slower than the members on the rest.
+
+    Members are spread over the partitions in decreasing order of t(M), each to the
+    partition with the least load per compute capacity (nodes x cores x speed), then
+    moved one at a time out of the partition that sets the makespan as long as this
+    lowers it (only its PARTITION_CANDIDATES slowest members are tried). Every partition
+    is tried for sim0 and the best placement is kept.
+    """
+    ensemble = result.ensemble
+    mask = result.mask
+    nc_index = result.in_transit
+    bandwidth = ensemble.bandwidth
+    partitions = ensemble.partitions
+    num_sims = len(ensemble.simulations)
+    num_parts = len(partitions)
+    first_node = np.cumsum([0] + [run[0] for run in partitions]).tolist()
+    ana_time_seq = ensemble.ana_time_seq
+    ana_data = ensemble.ana_data
+    if nc_data is None:
+        nc_data = ana_data[nc_index]
+    nc_serial = ensemble.ana_serial[nc_index]
+    nc_saturation = ensemble.ana_saturation[nc_index]
+    c_analyses = [np.flatnonzero(~mask[ensemble.first[i]:ensemble.last[i]]) + ensemble.first[i] for i in range(num_sims)]
+
+    @functools.lru_cache(maxsize=None)
+    def in_transit(p):
+        # Cores of the in-transit analyses on the nodes of partition p, its time per step
+        # on a single node and the solution of Equation 25
+        _, speed, cores, _ = partitions[p]
+        nc_time_seq = ana_time_seq[nc_index] * (ensemble.speed / speed)
+        time_nc = sequential_sum(nc_time_seq)
+        u_p = None
+        if result.core_heuristic == 'model' and ensemble.amdahl:
+            u_p = solve_amdahl(nc_time_seq, nc_data, bandwidth, cores, time_nc, nc_serial, nc_saturation)
+        elif result.core_heuristic == 'model':
+            u_p = solve_equation25(nc_time_seq, nc_data, bandwidth, cores, time_nc)
+        nc_core, core, feasible = _in_transit_cores(nc_time_seq, nc_data, bandwidth, cores, time_nc, u_p, result.core_heuristic, nc_serial, nc_saturation)
+        time = float((nc_time_seq / speedup(nc_core, nc_serial, nc_saturation) + nc_data / bandwidth).max()) if feasible else math.inf
+        return nc_time_seq, nc_core, core, u_p, time
+
+    @functools.lru_cache(maxsize=None)
+    def members_time(p, members, nodes):
+        # Time per step of some members on `nodes` nodes of partition p, and their allocation
+        if not members:
+            return 0.0, None
+        sub = allocate(_partition_ensemble(ensemble, members, mask, p, nodes), np.zeros(0, dtype=int), result.node_heuristic, result.core_heuristic)
+        if not sub.feasible:
+            return math.inf, sub
+        return float(max(sub.sim_time.max(), (sub.ana_time / sub.ensemble.frequency).max(initial=0.0))), sub
+
+    @functools.lru_cache(maxsize=None)
+    def partition_time(p, members, hosts_nc):
+        # Time per step of partition p, the nodes of sim0 and the allocation of its members
+        nodes = partitions[p][0]
+        if not hosts_nc:
+            return members_time(p, members, nodes) + (0,)
+        nc_time = in_transit(p)[4]
+        num_members = len(members)
+        if nodes - num_members < 1 or nc_time == math.inf:
+            return math.inf, None, 0
+        if not members:
+            return nc_time / nodes, None, nodes
+        if result.node_heuristic == 'even':
+            candidates = [nodes - nodes // (num_members + 1) * num_members]
+        else:
+            # Fewest nodes on which sim0 is not slower than the members on the others
+            low, high = 1, nodes - num_members
+            while low < high:
+                middle = (low + high) // 2
+                if nc_time / middle <= members_time(p, members, nodes - middle)[0]:
+                    high = middle
+                else:
+                    low = middle + 1
+            candidates = [low - 1, low] if low > 1 else [low]
+        best = None
+        for nc_node in candidates:
+            time, sub = members_time(p, members, nodes - nc_node)
+            time = max(time, nc_time / nc_node)
+            if best is None or time < best[0]:
+                best = (time, sub, nc_node)
+        return best
+
+    def slowest_members(p, members, hosts_nc):
+        # The members of partition p that are the slowest in its allocation
+        sub = partition_time(p, members, hosts_nc)[1]
+        if sub is None or not sub.feasible:
+            order = np.argsort(-result.time_sum[list(members)], kind='stable')
+        else:
+            member_time = sub.sim_time.copy()
+            np.maximum.at(member_time, sub.ensemble.member, sub.ana_time)
+            order = np.argsort(-member_time, kind='stable')
+        return [members[k] for k in order[:PARTITION_CANDIDATES].tolist()]
+
+    capacity = [nodes * cores * speed / ensemble.speed for nodes, speed, cores, _ in partitions]
+    order = np.argsort(-result.time_sum, kind='stable').tolist()
+    best = None
+    for p0 in (range(num_parts) if len(nc_index) else [None]):
+        if p0 is not None and in_transit(p0)[4] == math.inf:
+            continue
+        # Spread the members, with the load of sim0 already on its partition
+        load = [0.0] * num_parts
+        count = [0] * num_parts
+        assigned = [[] for _ in range(num_parts)]
+        if p0 is not None:
+            load[p0] = time_nc_sum + ensemble.cores * sequential_sum(nc_data) / bandwidth
+            count[p0] = 1
+        for i in order:
+            room = [p for p in range(num_parts) if count[p] < partitions[p][0]]
+            if not room:
+                break
+            p = min(room, key=lambda q: (load[q] + result.time_sum[i]) / capacity[q])
+            load[p] += result.time_sum[i]
+            count[p] += 1
+            assigned[p].append(i)
+        if sum(count) - (p0 is not None) < num_sims:
+            continue
+        times = [partition_time(p, tuple(sorted(assigned[p])), p == p0)[0] for p in range(num_parts)]
+        # Move members out of the slowest partition while it lowers the makespan
+        improved = True
+        while improved:
+            improved = False
+            slowest = int(np.argmax(times))
+            for i in slowest_members(slowest, tuple(sorted(assigned[slowest])), slowest == p0):
+                rest = tuple(sorted(set(assigned[slowest]) - {i}))
+                for q in range(num_parts):
+                    if q == slowest or len(assigned[q]) + (q == p0) >= partitions[q][0]:
+                        continue
+                    moved = tuple(sorted(assigned[q] + [i]))
+                    new_times = list(times)
+                    new_times[slowest] = partition_time(slowest, rest, slowest == p0)[0]
+                    new_times[q] = partition_time(q, moved, q == p0)[0]
+                    if max(new_times) < max(times):
+                        assigned[slowest] = list(rest)
+                        assigned[q] = list(moved)
+                        times = new_times
+                        improved = True
+                        break
+                if improved:
+                    break
+        if best is None or max(times) < best[0]:
+            best = (max(times), p0, [tuple(sorted(members)) for members in assigned])
+
+    if best is None:
+        result.message = 'Not sufficient resource for node allocation in co-scheduling'
+        return result
+    _, p0, assigned = best
+    details = [partition_time(p, assigned[p], p == p0) for p in range(num_parts)]
+    if best[0] == math.inf:
+        failed = [sub for _, sub, _ in details if sub is not None and not sub.feasible]
+        if failed:
+            result.message = failed[0].message
+        elif in_transit(p0)[4] == math.inf:
+            result.message = 'Not sufficient resource for core allocation in non-co-scheduling'
+        else:
+            result.message = 'Cannot assign zero node for co-scheduling'
+        return result
+
+    node = np.zeros(num_sims, dtype=int)
+    start = np.zeros(num_sims, dtype=int)
+    sim_core = np.zeros(num_sims, dtype=int)
+    sim_time = np.zeros(num_sims)
+    ana_core = np.zeros(len(ensemble.analyses), dtype=int)
+    ana_time = np.zeros(len(ensemble.analyses))
+    read_time = np.zeros(len(ensemble.analyses))
+    analyze_time = np.zeros(len(ensemble.analyses))
+    node_nr = np.zeros(num_sims) if result.node_heuristic == 'model' else None
+    sim_core_nr = np.zeros(num_sims) if result.core_heuristic == 'model' else None
+    for p, (_, sub, _) in enumerate(details):
+        if sub is None:
+            continue
+        members = np.array(assigned[p], dtype=int)
+        c_index = np.concatenate([c_analyses[i] for i in assigned[p]])
+        node[members] = sub.node
+        start[members] = first_node[p] + sub.start
+        sim_core[members] = sub.sim_core
+        sim_time[members] = sub.sim_time
+        ana_core[c_index] = sub.ana_core
+        ana_time[c_index] = sub.ana_time
+        analyze_time[c_index] = sub.ana_time
+        if node_nr is not None:
+            node_nr[members] = sub.node_nr
+        if sim_core_nr is not None:
+            sim_core_nr[members] = sub.sim_core_nr
+            result.ana_core_nr[c_index] = sub.ana_core_nr
+    result.node = node
+    result.start = start
+    result.node_nr = node_nr
+    result.sim_core = sim_core
+    result.sim_core_nr = sim_core_nr
+    result.sim_time = sim_time
+
+    result.nc_node = 0
+    result.nc_start = 0
+    if p0 is not None:
+        nc_node = details[p0][2]
+        nc_time_seq, nc_core, core, result.u, _ = in_transit(p0)
+        result.nc_node = nc_node
+        result.nc_start = first_node[p0] + int(node[list(assigned[p0])].sum())
+        result.staging[nc_index] = 0
+        result.stage_node = np.array([nc_node])
+        result.stage_start = np.array([result.nc_start])
+        if core is not None:
+            result.ana_core_nr[nc_index] = core
+        # Amortized times per step, then per run
+        time_a = nc_time_seq / (nc_node * speedup(nc_core, nc_serial, nc_saturation))
+        nc_read = nc_data / (nc_node * bandwidth)
+        nc_frequency = ensemble.frequency[nc_index]
+        ana_core[nc_index] = nc_core
+        read_time[nc_index] = nc_read * nc_frequency
+        analyze_time[nc_index] = time_a * nc_frequency
+        ana_time[nc_index] = (time_a + nc_read) * nc_frequency
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result.read_bandwidth[nc_index] = ana_data[nc_index] / nc_read
+        bandwidths = np.array([
+            bandwidth / len(nc_index),
+            bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * ensemble.nodes),
+            bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * ensemble.nodes * len(nc_index))])
+        result.ana_time_k = np.zeros((3, len(ensemble.analyses)))
+        result.ana_time_k[:, nc_index] = (time_a + nc_data / (nc_node * bandwidths[:, None])) * nc_frequency
+    result.ana_core = ana_core
+    result.ana_time = ana_time
+
+    _makespans(result, read_time, analyze_time)
+    result.feasible = True
+    return result
+
+
+class IncrementalAllocator:
+    """
+    Allocation of an in-transit set that changes a few analyses at a time.
+
+    t(S), t(P^C) and t(P^NC) are updated with the time of every analysis moved in or out
+    of transit, t(M) and the member core allocation are only recomputed for the members
+    whose co-scheduled analyses changed, and Equation 25 is solved starting from the root
+    of the previous step. A step then costs O(k) for its k moved analyses plus the array
+    passes over the node shares and the in-transit analyses, instead of a full allocate().
+    Results match allocate() up to the rounding of the running sums.
+    """
+
+    def __init__(self, ensemble, node_heuristic='model', core_heuristic='model'):
+        self.ensemble = ensemble
+        self.node_heuristic = node_heuristic
+        self.core_heuristic = core_heuristic
+        self.mask = np.zeros(len(ensemble.analyses), dtype=bool)
+        # In-transit analyses in the order they were added
+        self.added = []
+        self.time_s_sum = sequential_sum(ensemble.time_seq)
+        self.time_c_sum = sequential_sum(ensemble.ana_time_seq)
+        self.time_nc_sum = 0
+        self.time_sum = ensemble.member_sum(ensemble.ana_time_seq)
+        self.member_cores = MemberCores(ensemble, core_heuristic)
+        self.member_cores.update(self.mask, self.time_sum)
+        self.changed = set()
+        self.u = None
+
+    def add(self, indices):
+        """
+        Move analyses in transit.
+        """
+        for i in indices:
+            i = int(i)
+            if self.mask[i]:
+                continue
+            self.mask[i] = True
+            self.added.append(i)
+            time_seq = float(self.ensemble.ana_time_seq[i])
+            self.time_c_sum -= time_seq
+            self.time_nc_sum += time_seq
+            self.changed.add(int(self.ensemble.member[i]))
+
+    def remove(self, indices):
+        """
+        Move analyses back to co-scheduling.
+        """
+        for i in indices:
+            i = int(i)
+            if not self.mask[i]:
+                continue
+            self.mask[i] = False
+            self.added.remove(i)
+            time_seq = float(self.ensemble.ana_time_seq[i])
+            self.time_c_sum += time_seq
+            self.time_nc_sum -= time_seq
+            self.changed.add(int(self.ensemble.member[i]))
+
+    @instrument.timed('allocate')
+    def allocate(self):
+        """
+        Allocation of the current in-transit set, see allocate().
+        """
+        ensemble = self.ensemble
+        if self.changed:
+            members = np.array(sorted(self.changed), dtype=int)
+            self.changed = set()
+            for i in members.tolist():
+                first, last = ensemble.first[i], ensemble.last[i]
+                # Same left to right order as Ensemble.member_sum()
+                total = float(ensemble.time_seq[i])
+                for time_seq in np.where(self.mask[first:last], 0.0, ensemble.ana_time_seq[first:last]).tolist():
+                    total += time_seq
+                self.time_sum[i] = total
+            self.member_cores.update(self.mask, self.time_sum, members)
+
+        added = np.array(self.added, dtype=int)
+        # Group the in-transit analyses by member, as in a 'non-co-scheduling' mapping
+        in_transit = added[np.argsort(ensemble.member[added], kind='stable')]
+        result = Allocation(ensemble, in_transit, self.node_heuristic, self.core_heuristic)
+        result.time_sum = self.time_sum.copy()
+        _allocate(result, self.time_s_sum, self.time_c_sum, self.time_nc_sum, self.member_cores, guess=self.u)
+        if result.u is not None:
+            self.u = result.u
+        return result
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
+"""
+Generate an ensemble configuration and its platform from an ensemble spec.
+
+A spec is a dict (or a YAML file) with the keys of DEFAULT_SPEC. Counts, flops, data
+sizes and memory footprints are either numbers or distributions, e.g.
+
+    analyses: {distribution: integers, low: 1, high: 8}
+    ana_flop: {distribution: uniform, low: 0.5, high: 1.5, relative: true}
+
+(see sample()), and are drawn with a numpy generator seeded with `seed`, so that the
+same spec always gives the same ensemble.
+"""
 import yaml
 import math
-import random
-from lxml import etree 
-from io import StringIO
-import sys
-
-# Name of generated config file
-config_file = sys.argv[1]
-# Name of generated platform file
-platform_file = sys.argv[2]
+import argparse
+import numpy as np
 
 # Ensemble settings
 num_nodes = 2
@@ -36,113 +41,326 @@ shared_bandwidth = 6
 shared_latency = 0
 loopback_bandwidth = 1000
 loopback_latency = 0
-
-compute_speed_str = str(compute_speed) + 'Gf'
-num_cores_str = str(num_cores)
-read_bandwidth_str = str(read_bandwidth) + 'GBps'
-write_bandwidth_str = str(write_bandwidth) + 'GBps'
-disk_capacity_str = str(disk_capacity) + 'GiB'
-memory_capacity_str = str(memory_capacity) + 'GB'
 mount_point = '/'
-shared_bandwidth_str = str(shared_bandwidth) + 'GBps'
-shared_latency_str = str(shared_latency) + 'us'
-loopback_bandwidth_str = str(loopback_bandwidth) + 'GBps'
-loopback_latency_str = str(loopback_latency) + 'us'
 
-def config_generator(config_file):
+DEFAULT_SPEC = {
+    'seed': None,
+    'nodes': num_nodes,
+    # Number of members and number of analyses of every member
+    'simulations': num_simulations,
+    'analyses': num_analyses_per_simulation,
+    'steps': num_steps,
+    # Flop and data size of every member, flop of every analysis (relative to the flop of its member)
+    'sim_flop': sim_flop,
+    'data': data_size,
+    'ana_flop': {'distribution': 'uniform', 'low': 1 - diff_flop, 'high': 1 + diff_flop, 'relative': True},
+    # Memory footprints (GB), not written if None
+    'sim_mem': None,
+    'ana_mem': None,
+    # Serial fractions (Amdahl's law) and cores per node beyond which the memory bandwidth
+    # saturates, not written if None (perfectly parallel up to every core)
+    'sim_serial': None,
+    'ana_serial': None,
+    'sim_saturation': None,
+    'ana_saturation': None,
+    # Every analysis runs on one step out of `ana_frequency`
+    'ana_frequency': 1,
+    'speed': compute_speed,
+    'cores': num_cores,
+    'memory': memory_capacity,
+    # Partitions of different nodes, in node order: list of {nodes, speed, cores, memory}
+    # (missing entries take the values above, which also give the sequential times), None
+    # for identical nodes
+    'partitions': None,
+    'bandwidth': shared_bandwidth,
+    'read_bandwidth': read_bandwidth,
+    'write_bandwidth': write_bandwidth,
+    'disk_capacity': disk_capacity,
+    'shared_latency': shared_latency,
+    'loopback_bandwidth': loopback_bandwidth,
+    'loopback_latency': loopback_latency,
+}
+
+
+def load_spec(spec_file=None, **overrides):
+    """
+    DEFAULT_SPEC updated with a YAML spec file and with the overrides that are not None.
+    """
+    spec = dict(DEFAULT_SPEC)
+    if spec_file:
+        with open(spec_file, 'r') as file:
+            spec.update(yaml.safe_load(file) or {})
+    spec.update({key: value for key, value in overrides.items() if value is not None})
+    unknown = set(spec) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError(f'Unknown spec keys: {", ".join(sorted(unknown))}')
+    return spec
+
+
+def sample(rng, spec, size):
+    """
+    Draw `size` values of a spec entry.
+
+    Args:
+        rng: numpy random generator
+        spec: a number (constant), or a dict with a 'distribution' among 'constant'
+            (value), 'uniform' (low, high), 'normal' (mean, std), 'lognormal' (mean,
+            sigma), 'integers' (low, high, both included), 'poisson' (lam) and 'choice'
+            (values, optional weights), with optional 'min' and 'max' clipping
+        size: number of values
+
+    Returns:
+        array of values
+
+    """
+    if not isinstance(spec, dict):
+        return np.full(size, spec)
+    distribution = spec['distribution']
+    if distribution == 'constant':
+        values = np.full(size, spec['value'])
+    elif distribution == 'uniform':
+        values = rng.uniform(spec['low'], spec['high'], size)
+    elif distribution == 'normal':
+        values = rng.normal(spec['mean'], spec['std'], size)
+    elif distribution == 'lognormal':
+        values = rng.lognormal(spec['mean'], spec['sigma'], size)
+    elif distribution == 'integers':
+        values = rng.integers(spec['low'], spec['high'], size, endpoint=True)
+    elif distribution == 'poisson':
+        values = rng.poisson(spec['lam'], size)
+    elif distribution == 'choice':
+        weights = spec.get('weights')
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float) / sum(weights)
+        values = rng.choice(spec['values'], size, p=weights)
+    else:
+        raise ValueError(f'Unknown distribution {distribution}')
+    if 'min' in spec or 'max' in spec:
+        values = np.clip(values, spec.get('min'), spec.get('max'))
+    return values
+
+
+def generate(spec=None):
+    """
+    Build the configuration of an ensemble.
+
+    Args:
+        spec: ensemble spec (see DEFAULT_SPEC), DEFAULT_SPEC if None
+
+    Returns:
+        configuration dict, as read by scheduler.py
+
+    """
+    spec = spec or DEFAULT_SPEC
+    rng = np.random.default_rng(spec['seed'])
+    num_sims = int(spec['simulations'])
+    speed = spec['speed']
+
+    # Members
+    counts = np.maximum(sample(rng, spec['analyses'], num_sims), 0).astype(int)
+    sim_flops = np.round(sample(rng, spec['sim_flop'], num_sims).astype(float), 3)
+    data = sample(rng, spec['data'], num_sims).tolist()
+    sim_mems = None if spec['sim_mem'] is None else np.round(sample(rng, spec['sim_mem'], num_sims).astype(float), 1).tolist()
+
+    # Analyses, flattened member by member
+    member = np.repeat(np.arange(num_sims), counts)
+    ana_flops = sample(rng, spec['ana_flop'], len(member)).astype(float)
+    if isinstance(spec['ana_flop'], dict) and spec['ana_flop'].get('relative'):
+        ana_flops = ana_flops * sim_flops[member]
+    ana_flops = np.round(ana_flops, 3)
+    ana_mems = None if spec['ana_mem'] is None else np.round(sample(rng, spec['ana_mem'], len(member)).astype(float), 1).tolist()
+    sim_serials = None if spec['sim_serial'] is None else np.round(np.clip(sample(rng, spec['sim_serial'], num_sims).astype(float), 0, 1), 4).tolist()
+    ana_serials = None if spec['ana_serial'] is None else np.round(np.clip(sample(rng, spec['ana_serial'], len(member)).astype(float), 0, 1), 4).tolist()
+    sim_saturations = None if spec['sim_saturation'] is None else np.maximum(np.round(sample(rng, spec['sim_saturation'], num_sims)), 1).astype(int).tolist()
+    ana_saturations = None if spec['ana_saturation'] is None else np.maximum(np.round(sample(rng, spec['ana_saturation'], len(member))), 1).astype(int).tolist()
+    ana_frequencies = np.maximum(np.round(sample(rng, spec['ana_frequency'], len(member))), 1).astype(int).tolist()
+    sim_time_seqs = (sim_flops / speed).tolist()
+    ana_time_seqs = (ana_flops / speed).tolist()
+    sim_flops = sim_flops.tolist()
+    ana_flops = ana_flops.tolist()
+
+    config = {}
+    config['nodes'] = int(spec['nodes'])
+    if spec['partitions']:
+        config['partitions'] = _partitions(spec)
+        config['nodes'] = sum(partition['nodes'] for partition in config['partitions'])
+    config['cores'] = spec['cores']
+    config['memory'] = spec['memory']
+    config['bandwidth'] = spec['bandwidth']
+    config['speed'] = speed
+    config['steps'] = spec['steps']
+    config['simulations'] = {}
+    j = 0
+    for i, count in enumerate(counts.tolist()):
+        sim_config = {'flop': sim_flops[i], 'data': data[i], 'coupling': {}, 'time_seq': sim_time_seqs[i]}
+        if sim_mems is not None:
+            sim_config['mem'] = sim_mems[i]
+        if sim_serials is not None:
+            sim_config['serial_fraction'] = sim_serials[i]
+        if sim_saturations is not None:
+            sim_config['saturation_cores'] = sim_saturations[i]
+        coupling = sim_config['coupling']
+        for k in range(1, count + 1):
+            ana_config = {'flop': ana_flops[j], 'time_seq': ana_time_seqs[j], 'frequency': ana_frequencies[j]}
+            if ana_mems is not None:
+                ana_config['mem'] = ana_mems[j]
+            if ana_serials is not None:
+                ana_config['serial_fraction'] = ana_serials[j]
+            if ana_saturations is not None:
+                ana_config['saturation_cores'] = ana_saturations[j]
+            coupling['ana' + str(k)] = ana_config
+            j += 1
+        config['simulations']['sim' + str(i + 1)] = sim_config
+    return config
+
+
+def _partitions(spec):
+    """
+    Partitions of a spec with every entry filled in.
+    """
+    return [{'nodes': int(partition['nodes']), 'speed': partition.get('speed', spec['speed']),
+             'cores': partition.get('cores', spec['cores']), 'memory': partition.get('memory', spec['memory'])}
+            for partition in spec['partitions']]
+
+
+def config_generator(config_file, spec=None):
     """
     Generate YAML file that contains general structure of ensemble
         
     Args:
         config_file: Name of output yaml config file
+        spec: ensemble spec (see DEFAULT_SPEC), DEFAULT_SPEC if None
 
     Returns: 
 
     """ 
-    config = {}
-    config['nodes'] = num_nodes
-    config['cores'] = num_cores
-    config['memory'] = memory_capacity
-    config['bandwidth'] = shared_bandwidth
-    config['speed'] = compute_speed
-    config['steps'] = num_steps
-    config['simulations'] = {}
-    
-    for i in range(1, num_simulations + 1):
-        sim = 'sim' + str(i)
-        config['simulations'][sim] = {}
-        config['simulations'][sim]['flop'] = sim_flop
-        config['simulations'][sim]['data'] = data_size
-        # config['simulations'][sim]['mem'] = round(random.uniform(10, 60), 1)
-        config['simulations'][sim]['coupling'] = {}
-        config['simulations'][sim]['time_seq'] = config['simulations'][sim]['flop'] / config['speed']
-
-        for j in range(1, num_analyses_per_simulation + 1):
-            ana = 'ana' + str(j)
-            config['simulations'][sim]['coupling'][ana] = {}
-            ana_config = config['simulations'][sim]['coupling'][ana]
-            ana_config['flop'] = round(random.uniform((1-diff_flop)*sim_flop, (1+diff_flop)*sim_flop), 3)
-            # ana_config['mem'] = round(random.uniform(10, 60), 1)
-            ana_config['time_seq'] = ana_config['flop'] / config['speed']
-
+    config = generate(spec)
     with open(config_file, 'w') as file:
-        yaml.dump(config, file)
+        _write_yaml(file, config)
+
+def _write_yaml(file, mapping, indent=''):
+    """
+    Stream a mapping of numbers and mappings as yaml.dump() formats it (sorted keys, block
+    style), much faster than yaml.dump() for large ensembles.
+    """
+    for key in sorted(mapping):
+        value = mapping[key]
+        if isinstance(value, dict):
+            if value:
+                file.write(f'{indent}{key}:\n')
+                _write_yaml(file, value, indent + '  ')
+            else:
+                file.write(f'{indent}{key}: {{}}\n')
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            text = yaml.dump({key: value}, Dumper=getattr(yaml, 'CDumper', yaml.Dumper))
+            file.write(''.join(indent + line for line in text.splitlines(True)))
+        elif isinstance(value, float):
+            file.write(f'{indent}{key}: {_yaml_float(value)}\n')
+        else:
+            file.write(f'{indent}{key}: {value}\n')
+
+def _yaml_float(value):
+    # Same representation as yaml.representer.SafeRepresenter.represent_float()
+    if value != value:
+        return '.nan'
+    if value == math.inf:
+        return '.inf'
+    if value == -math.inf:
+        return '-.inf'
+    text = repr(value).lower()
+    if '.' not in text and 'e' in text:
+        text = text.replace('e', '.0e', 1)
+    return text
 
-def platform_generator(platform_file):
+def platform_generator(platform_file, topology='full', spec=None):
     """
     Generate XML platform file
-        
+
+    The file is written element by element, so memory does not grow with the number of
+    nodes. Hosts communicate with each other through shared_network and with themselves
+    through loopback_network. The 'full' topology lists a route between every pair of
+    hosts, which grows quadratically with the number of nodes. The 'star' topology
+    connects every host to a backbone router instead: a message from a host goes through
+    shared_network to the router and through a FATPIPE link (which shares nothing and is
+    as fast as shared_network) to the other host, so the platform grows linearly.
+    (A SimGrid <cluster> would be as compact, but its hosts cannot hold the disks of
+    the storage services.)
+
     Args:
         platform_file: Name of output xml platform file
+        topology: either 'full' or 'star'
+        spec: ensemble spec (see DEFAULT_SPEC), DEFAULT_SPEC if None
 
-    Returns: 
+    Returns:
 
-    """ 
-    doctype_string = '<!DOCTYPE platform SYSTEM "https://simgrid.org/simgrid.dtd">'
-    xml_header = '<?xml version="1.0"?>'
-    xhtml = xml_header + doctype_string + '<platform version="4.1"></platform>'
-    tree = etree.parse(StringIO(xhtml))
-    platform = tree.getroot()
-    etree.SubElement(platform, 'zone', id='AS0', routing='Full')
-    zone = platform[0]
-    track = 0
-    etree.SubElement(zone, 'host', id='UserHost', speed=compute_speed_str, core='1')
-    track += 1
-    for i in range(1,num_nodes+1):
-        etree.SubElement(zone, 'host', id='ComputeHost' + str(i), speed=compute_speed_str, core=num_cores_str)
-        host = zone[track]
-        etree.SubElement(host, 'disk', id='local_disk', read_bw=read_bandwidth_str, write_bw=write_bandwidth_str)
-        disk = host[0]
-        etree.SubElement(disk, 'prop', id='size', value=disk_capacity_str)
-        etree.SubElement(disk, 'prop', id='mount', value=mount_point)
-        etree.SubElement(host, 'prop', id='ram', value=memory_capacity_str)
-        track += 1
-
-    etree.SubElement(zone, 'link', id='shared_network', bandwidth=shared_bandwidth_str, latency=shared_latency_str)
-    etree.SubElement(zone, 'link', id='loopback_network', bandwidth=loopback_bandwidth_str, latency=loopback_latency_str)
-    track += 2
-    for i in range(1,num_nodes+1):
-        etree.SubElement(zone, 'route', src='UserHost', dst='ComputeHost' + str(i))
-        route = zone[track]
-        etree.SubElement(route, 'link_ctn', id='shared_network')
-        track += 1
-    
-    for i in range(1,num_nodes+1):
-        etree.SubElement(zone, 'route', src='ComputeHost' + str(i), dst='ComputeHost' + str(i))
-        etree.SubElement(zone[track], 'link_ctn', id='loopback_network')
-        track += 1
-        for j in range(i+1, num_nodes+1):
-            etree.SubElement(zone, 'route', src='ComputeHost' + str(i), dst='ComputeHost' + str(j))
-            etree.SubElement(zone[track], 'link_ctn', id='shared_network')
-            track += 1
-
-    # Write platform file
-    with open(platform_file, 'wb') as doc:
-        # doc.write(etree.tostring(tree, pretty_print = True, xml_declaration=True, encoding='utf-8'))
-        tree.write(doc, pretty_print=True, xml_declaration=True, encoding='utf-8')
+    """
+    spec = spec or DEFAULT_SPEC
+    compute_speed_str = str(spec['speed']) + 'Gf'
+    read_bandwidth_str = str(spec['read_bandwidth']) + 'GBps'
+    write_bandwidth_str = str(spec['write_bandwidth']) + 'GBps'
+    disk_capacity_str = str(spec['disk_capacity']) + 'GiB'
+    shared_bandwidth_str = str(spec['bandwidth']) + 'GBps'
+    shared_latency_str = str(spec['shared_latency']) + 'us'
+    loopback_bandwidth_str = str(spec['loopback_bandwidth']) + 'GBps'
+    loopback_latency_str = str(spec['loopback_latency']) + 'us'
+    partitions = _partitions(spec) if spec['partitions'] else [{'nodes': int(spec['nodes']), 'speed': spec['speed'], 'cores': spec['cores'], 'memory': spec['memory']}]
+    hosts = ['ComputeHost' + str(i) for i in range(1, sum(partition['nodes'] for partition in partitions) + 1)]
+    # Speed, cores and memory of every host
+    resources = [(str(partition['speed']) + 'Gf', str(partition['cores']), str(partition['memory']) + 'GB')
+                 for partition in partitions for _ in range(partition['nodes'])]
+    with open(platform_file, 'w') as doc:
+        doc.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        doc.write('<!DOCTYPE platform SYSTEM "https://simgrid.org/simgrid.dtd">\n')
+        doc.write('<platform version="4.1">\n')
+        doc.write(f'  <zone id="AS0" routing="{"Full" if topology == "full" else "DijkstraCache"}">\n')
+        doc.write(f'    <host id="UserHost" speed="{compute_speed_str}" core="1"/>\n')
+        for host, (host_speed_str, num_cores_str, memory_capacity_str) in zip(hosts, resources):
+            doc.write(f'    <host id="{host}" speed="{host_speed_str}" core="{num_cores_str}">\n'
+                      f'      <disk id="local_disk" read_bw="{read_bandwidth_str}" write_bw="{write_bandwidth_str}">\n'
+                      f'        <prop id="size" value="{disk_capacity_str}"/>\n'
+                      f'        <prop id="mount" value="{mount_point}"/>\n'
+                      f'      </disk>\n'
+                      f'      <prop id="ram" value="{memory_capacity_str}"/>\n'
+                      f'    </host>\n')
+        if topology == 'star':
+            doc.write('    <router id="backbone"/>\n')
+        doc.write(f'    <link id="shared_network" bandwidth="{shared_bandwidth_str}" latency="{shared_latency_str}"/>\n')
+        doc.write(f'    <link id="loopback_network" bandwidth="{loopback_bandwidth_str}" latency="{loopback_latency_str}"/>\n')
+        if topology == 'star':
+            doc.write(f'    <link id="backbone_network" bandwidth="{shared_bandwidth_str}" latency="0us" sharing_policy="FATPIPE"/>\n')
+            for host in ['UserHost'] + hosts:
+                _write_route(doc, host, 'backbone', 'shared_network', symmetrical='NO')
+                _write_route(doc, 'backbone', host, 'backbone_network', symmetrical='NO')
+            for host in hosts:
+                _write_route(doc, host, host, 'loopback_network')
+        else:
+            for host in hosts:
+                _write_route(doc, 'UserHost', host, 'shared_network')
+            for i, host in enumerate(hosts):
+                _write_route(doc, host, host, 'loopback_network')
+                for other in hosts[i + 1:]:
+                    _write_route(doc, host, other, 'shared_network')
+        doc.write('  </zone>\n')
+        doc.write('</platform>\n')
+
+def _write_route(doc, src, dst, link, symmetrical=None):
+    symmetrical = f' symmetrical="{symmetrical}"' if symmetrical else ''
+    doc.write(f'    <route src="{src}" dst="{dst}"{symmetrical}>\n'
+              f'      <link_ctn id="{link}"/>\n'
+              f'    </route>\n')
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage='python3 generator.py <config yaml> <platform xml> [--spec <spec yaml>] [--seed <seed>] [--topology full|star]')
+    parser.add_argument('config_file', help='name of generated config file')
+    parser.add_argument('platform_file', help='name of generated platform file')
+    parser.add_argument('--spec', help='YAML ensemble spec, see DEFAULT_SPEC')
+    parser.add_argument('--seed', type=int, help='seed of the random draws (overrides the spec)')
+    parser.add_argument('--nodes', type=int, help='number of nodes (overrides the spec)')
+    parser.add_argument('--simulations', type=int, help='number of members (overrides the spec)')
+    parser.add_argument('--topology', choices=['full', 'star'], default='full', help='routes between every pair of nodes, or through a backbone (linear size)')
+    args = parser.parse_args()
+    spec = load_spec(args.spec, seed=args.seed, nodes=args.nodes, simulations=args.simulations)
     # Generate config file
-    platform_generator(platform_file)
+    config_generator(args.config_file, spec)
     # Generate platform file
-    config_generator(config_file)
+    platform_generator(args.platform_file, args.topology, spec)
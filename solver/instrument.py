@@ -0,0 +1,164 @@
+"""
+Timing spans, counters and leveled logging of the solver.
+
+Recording is off by default, so that the hot paths only pay a flag check: enable() turns
+it on for the current process (the scheduler does it with --profile). While it is on,
+
+- span(name) (a context manager) and timed(name) (a decorator) add the wall-clock time of
+  a phase to its span: number of calls, total and longest time. A phase re-entered by
+  itself (e.g. allocate() of the members of a partition within allocate()) is timed once,
+  by its outermost call
+- count(name, n) adds n to a counter
+
+The spans of the solver are schedule (a step of the greedy heuristics), allocate,
+equation25, rounding (apportion() and min_max_counts()), feasible (the memory check) and
+serialize (Allocation.to_config() and write_config()), its counters candidates
+(in-transit sets evaluated by the heuristics and searches), infeasible (the ones
+rejected), cache_hits and cache_misses. Worker processes return their collect() to the
+parent, which merge()s it. export() writes the record of the run to a JSON file:
+
+    {"argv": [...], "wall_time": seconds, "spans": {name: {"count": calls, "total": seconds, "max": seconds}}, "counters": {name: count}}
+
+Diagnostics go to the 'solver' logger, which is silent below WARNING unless the
+application configures logging (scheduler.py --log-level).
+"""
+import sys
+import json
+import time
+import logging
+import functools
+import contextlib
+
+logger = logging.getLogger('solver')
+
+_enabled = False
+_start = time.perf_counter()
+# {name: [count, total, max]}
+_spans = {}
+_counters = {}
+# Open spans of every name
+_depth = {}
+_null = contextlib.nullcontext()
+
+
+def enable(enabled=True):
+    """
+    Turn recording on (or off) in the current process.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """
+    Forget the spans and counters recorded so far.
+    """
+    global _start
+    _spans.clear()
+    _counters.clear()
+    _depth.clear()
+    _start = time.perf_counter()
+
+
+@contextlib.contextmanager
+def _span(name):
+    depth = _depth.get(name, 0)
+    _depth[name] = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth[name] = depth
+        if depth == 0:
+            elapsed = time.perf_counter() - start
+            record = _spans.get(name)
+            if record is None:
+                _spans[name] = [1, elapsed, elapsed]
+            else:
+                record[0] += 1
+                record[1] += elapsed
+                if elapsed > record[2]:
+                    record[2] = elapsed
+
+
+def span(name):
+    """
+    Context manager that times a phase, see the module documentation.
+    """
+    return _span(name) if _enabled else _null
+
+
+def timed(name):
+    """
+    Decorator that times every call of a function as the span `name`.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """
+    Add n to a counter.
+    """
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot():
+    """
+    Spans and counters recorded so far:
+    {'spans': {name: {'count', 'total', 'max'}}, 'counters': {name: count}}
+    """
+    return {'spans': {name: {'count': record[0], 'total': record[1], 'max': record[2]} for name, record in _spans.items()},
+            'counters': dict(_counters)}
+
+
+def collect():
+    """
+    snapshot() and reset(), for a worker process to return what it recorded since its
+    previous task. None when recording is off.
+    """
+    if not _enabled:
+        return None
+    recorded = snapshot()
+    reset()
+    return recorded
+
+
+def merge(recorded):
+    """
+    Add the spans and counters of a snapshot (e.g. of a worker process) to the record of
+    this process.
+    """
+    if recorded is None:
+        return
+    for name, stats in recorded['spans'].items():
+        record = _spans.get(name)
+        if record is None:
+            _spans[name] = [stats['count'], stats['total'], stats['max']]
+        else:
+            record[0] += stats['count']
+            record[1] += stats['total']
+            record[2] = max(record[2], stats['max'])
+    for name, value in recorded['counters'].items():
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def export(output_file):
+    """
+    Write the record of the run to a JSON file, see the module documentation.
+    """
+    recorded = snapshot()
+    with open(output_file, 'w') as file:
+        json.dump({'argv': sys.argv, 'wall_time': time.perf_counter() - _start, **recorded}, file, indent=1)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Contention of the transfers of an allocation on the links of its platform.
+
+The model of allocate() gives every in-transit node the bandwidth B of the config, while
+the platforms written by generator.py route every transfer between two nodes through a
+single shared_network link (and every transfer within a node through a single
+loopback_network link). A NetworkModel reads the links and the routes of a SimGrid
+platform and, for an allocation, adds up the data every link carries per step: the
+in-transit reads from every simulation node to every in-transit node, the writes of the
+simulations and the reads of the co-scheduled analyses. All the transfers of a step are
+assumed to run together, so a shared link needs (data it carries) / (bandwidth) seconds
+per step and a FATPIPE link (data of its largest transfer) / (bandwidth). The read of an
+in-transit analysis takes at least as long as the slowest link on its routes.
+"""
+import os
+import re
+import hashlib
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+
+# Bandwidth factor of the default network model of SimGrid (LV08)
+BANDWIDTH_FACTOR = 0.97
+
+UNITS = {'': 1, 'k': 1e3, 'K': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12, 'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40}
+
+
+def quantity(text, unit):
+    """
+    Value of a SimGrid quantity such as '36.8Gf' or '6GBps', in G<unit>.
+    """
+    match = re.fullmatch(r'\s*([0-9.eE+-]+)\s*([kKMGT]?i?)' + unit + r'\s*', text)
+    if match is None:
+        raise ValueError(f'Cannot parse {text} as a quantity in {unit}')
+    return float(match.group(1)) * UNITS[match.group(2)] / 1e9
+
+
+def iterparse(platform_file):
+    """
+    ElementTree.iterparse() of a platform file, which SimGrid accepts with blank lines
+    before the XML declaration.
+    """
+    with open(platform_file, 'rb') as file:
+        while file.read(1).isspace():
+            pass
+        file.seek(-1, os.SEEK_CUR)
+        yield from ElementTree.iterparse(file)
+
+
+def node_partitions(config, network=None):
+    """
+    Partitions of identical nodes of a platform, in node order: a list of (nodes, speed,
+    cores, memory) with speed in GFLOP/s per core and memory in GB.
+
+    They are read from the 'partitions' entry of the config (a list of mappings with
+    'nodes' and any of 'speed', 'cores' and 'memory', the others being the values of the
+    config), else from the hosts of the network, else every node has the speed, cores
+    and memory of the config. Consecutive identical partitions are merged.
+    """
+    nodes = config['nodes']
+    default = (config['speed'], config['cores'], config['memory'])
+    if config.get('partitions'):
+        runs = [(entry['nodes'], entry.get('speed', default[0]), entry.get('cores', default[1]), entry.get('memory', default[2]))
+                for entry in config['partitions']]
+    elif network is not None and network.hosts is not None:
+        runs = [(1, speed, cores, default[2] if memory is None else memory) for speed, cores, memory in network.hosts[:nodes]]
+    else:
+        runs = [(nodes,) + default]
+    merged = []
+    for run in runs:
+        if merged and merged[-1][1:] == run[1:]:
+            merged[-1] = (merged[-1][0] + run[0],) + run[1:]
+        elif run[0] > 0:
+            merged.append(run)
+    if sum(run[0] for run in merged) != nodes:
+        raise ValueError(f'The partitions have {sum(run[0] for run in merged)} nodes, the config {nodes}')
+    return merged
+
+
+class NetworkModel:
+    """
+    Links and routes between the compute hosts of a platform.
+
+    Hosts are the nodes of the config in platform order (the user host, which runs no
+    component, is left out). Every distinct sequence of links is a route: route[p, q] is
+    the route from node p to node q and incidence[r, l] tells whether route r crosses
+    link l. hosts[p] is the (speed, cores, memory) of node p, None if unknown.
+    """
+
+    def __init__(self, links, capacity, fatpipe, routes, route, hosts=None):
+        self.links = links
+        self.hosts = hosts
+        self.capacity = np.asarray(capacity, dtype=float)
+        self.fatpipe = np.asarray(fatpipe, dtype=bool)
+        self.route = route
+        self.incidence = np.zeros((len(routes), len(links)), dtype=bool)
+        for r, route_links in enumerate(routes):
+            self.incidence[r, list(route_links)] = True
+        digest = hashlib.sha256(repr((links, self.capacity.tolist(), self.fatpipe.tolist(), routes)).encode())
+        digest.update(np.ascontiguousarray(route, dtype=np.int32).tobytes())
+        if hosts is not None:
+            digest.update(repr(hosts).encode())
+        self.digest = digest.hexdigest()
+
+    @property
+    def nodes(self):
+        return len(self.route)
+
+    @classmethod
+    def from_file(cls, platform_file, bandwidth_factor=BANDWIDTH_FACTOR):
+        """
+        Network of a SimGrid platform with one zone, as written by generator.py: explicit
+        routes between every pair of hosts ('Full' routing), or routes through routers
+        that are followed hop by hop (shortest routing such as 'Dijkstra' or 'Floyd').
+        """
+        hosts = []
+        host_resources = []
+        links = {}
+        # Explicit routes: (src, dst) -> tuple of link ids
+        explicit = {}
+        full = True
+        for _, element in iterparse(platform_file):
+            if element.tag == 'zone':
+                full = element.get('routing') == 'Full'
+            elif element.tag == 'host':
+                if element.get('id') != 'UserHost':
+                    hosts.append(element.get('id'))
+                    ram = {prop.get('id'): prop.get('value') for prop in element.findall('prop')}.get('ram')
+                    host_resources.append((quantity(element.get('speed'), 'f'), int(element.get('core', 1)),
+                                           None if ram is None else quantity(ram, 'B')))
+                element.clear()
+            elif element.tag == 'link':
+                links[element.get('id')] = (quantity(element.get('bandwidth'), 'Bps') * bandwidth_factor, element.get('sharing_policy') == 'FATPIPE')
+            elif element.tag == 'route':
+                src, dst = element.get('src'), element.get('dst')
+                route_links = tuple(link.get('id') for link in element.iter('link_ctn'))
+                explicit[(src, dst)] = route_links
+                if element.get('symmetrical', 'YES').upper() == 'YES':
+                    explicit.setdefault((dst, src), route_links[::-1])
+                element.clear()
+        link_ids = list(links)
+        link_index = {link: l for l, link in enumerate(link_ids)}
+        # Route 0 crosses no link
+        route_index = {(): 0}
+        routes = [()]
+
+        def intern(route_links):
+            r = route_index.get(route_links)
+            if r is None:
+                r = route_index[route_links] = len(routes)
+                routes.append(tuple(link_index[link] for link in route_links))
+            return r
+
+        route = np.zeros((len(hosts), len(hosts)), dtype=np.int32)
+        if full:
+            host_index = {host: p for p, host in enumerate(hosts)}
+            for (src, dst), route_links in explicit.items():
+                if src in host_index and dst in host_index:
+                    route[host_index[src], host_index[dst]] = intern(route_links)
+        else:
+            neighbours = {}
+            for (src, dst), route_links in explicit.items():
+                if src != dst:
+                    neighbours.setdefault(src, []).append((dst, route_links))
+            for p, host in enumerate(hosts):
+                # Breadth-first search from the host, one route at a time
+                reached = {host: ()}
+                frontier = [host]
+                while frontier:
+                    next_frontier = []
+                    for vertex in frontier:
+                        for neighbour, route_links in neighbours.get(vertex, []):
+                            if neighbour not in reached:
+                                reached[neighbour] = reached[vertex] + route_links
+                                next_frontier.append(neighbour)
+                    frontier = next_frontier
+                reached[host] = explicit.get((host, host), ())
+                route[p] = [intern(reached.get(other, ())) for other in hosts]
+        return cls(link_ids, [links[link][0] for link in link_ids], [links[link][1] for link in link_ids], routes, route, host_resources)
+
+    def read_times(self, allocation):
+        """
+        Shortest time per run of the read of every in-transit analysis of an allocation,
+        set by the slowest link on its routes (0 for co-scheduled analyses). An analysis
+        that runs every k steps puts 1 / k of its reads on the links per step.
+        """
+        ensemble = allocation.ensemble
+        mask = allocation.mask
+        staging = allocation.staging
+        node = np.asarray(allocation.node, dtype=int)
+        num_sims = len(node)
+        c_nodes = int(node.sum())
+        row_member = np.repeat(np.arange(num_sims), node)
+        # Simulation nodes member by member
+        rows = allocation.start[row_member] + np.arange(c_nodes) - (np.cumsum(node) - node)[row_member]
+        sim_data = ensemble.data[row_member] / node[row_member]
+        num_c = np.bincount(ensemble.member[~mask], weights=1 / ensemble.frequency[~mask], minlength=num_sims)[row_member]
+        num_routes = len(self.incidence)
+
+        # Every simulation node writes its share and the co-scheduled analyses on it read it
+        local = self.route[rows, rows]
+        volume = np.bincount(local, weights=(1 + num_c) * sim_data, minlength=num_routes)
+        largest = np.zeros(num_routes)
+        np.maximum.at(largest, local, sim_data)
+        # and every node of a staging partition reads 1 / nc_node of it for every
+        # in-transit analysis of the partition
+        blocks = []
+        for k, nc_node in enumerate(allocation.stage_node.tolist()):
+            if not nc_node:
+                continue
+            num_nc = np.bincount(ensemble.member[staging == k], weights=1 / ensemble.frequency[staging == k], minlength=num_sims)[row_member]
+            block = self.route[np.ix_(rows, allocation.stage_start[k] + np.arange(nc_node))]
+            volume += np.bincount(block.ravel(), weights=np.repeat(num_nc * sim_data / nc_node, nc_node), minlength=num_routes)
+            np.maximum.at(largest, block.ravel(), np.repeat(np.where(num_nc > 0, sim_data / nc_node, 0), nc_node))
+            blocks.append((k, block))
+
+        link_volume = volume @ self.incidence
+        link_largest = (self.incidence * largest[:, None]).max(axis=0, initial=0.0)
+        link_time = np.where(self.fatpipe, link_largest, link_volume) / self.capacity
+        route_time = (self.incidence * link_time[None, :]).max(axis=1, initial=0.0)
+        times = np.zeros(len(ensemble.analyses))
+        for k, block in blocks:
+            member_time = np.zeros(num_sims)
+            np.maximum.at(member_time, row_member, route_time[block].max(axis=1))
+            times = np.where(staging == k, member_time[ensemble.member], times)
+        return times
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Columnar store of allocations.
+
+A sweep writes one full configuration per candidate, which repeats the whole ensemble in
+every file. A ResultStore instead keeps the ensemble once, in a base YAML file, and the
+allocations of every candidate as overlays: NPZ columns with one row per candidate and
+one entry per component (simulation, analysis or the in-transit partition sim0). The
+full configuration of a candidate is rebuilt on demand, for instance to run it with
+insitu-ensemble-simulator:
+
+    python3 solver/results.py <store> <candidate> <output config>
+"""
+import sys
+import yaml
+import numpy as np
+import engine
+
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+Dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+
+# Columns of the simulations, the analyses and sim0
+SIM_COLUMNS = ['node', 'node_nr', 'start', 'sim_core', 'sim_core_nr', 'sim_time', 'time_sum']
+ANA_COLUMNS = ['mask', 'ana_core', 'ana_core_nr', 'ana_time', 'read_bandwidth', 'staging']
+NC_COLUMNS = ['nc_node', 'nc_node_nr', 'nc_start', 'u']
+# Columns of every staging partition
+STAGE_COLUMNS = ['stage_node', 'stage_node_nr', 'stage_start']
+
+
+class ResultStore:
+    """
+    Allocations of candidates of one ensemble, stored in <path>.yml (the ensemble) and
+    <path>.npz (the allocations).
+    """
+
+    def __init__(self, ensemble, path):
+        self.ensemble = ensemble
+        self.path = path
+        self.names = []
+        self.allocations = []
+
+    def add(self, name, allocation):
+        """
+        Add the allocation of a candidate, feasible or not.
+        """
+        self.names.append(name)
+        self.allocations.append(allocation)
+
+    def write(self):
+        """
+        Write the base ensemble and the columns of every candidate.
+        """
+        ensemble = self.ensemble
+        num_sims = len(ensemble.simulations)
+        num_anas = len(ensemble.analyses)
+        count = len(self.allocations)
+        columns = {}
+        for column in SIM_COLUMNS:
+            columns[column] = np.full((count, num_sims), np.nan)
+        for column in ANA_COLUMNS:
+            columns[column] = np.full((count, num_anas), np.nan)
+        for column in NC_COLUMNS:
+            columns[column] = np.full(count, np.nan)
+        for column in STAGE_COLUMNS:
+            columns[column] = np.full((count, ensemble.staging), np.nan)
+        columns['ana_time_k'] = np.full((count, 3, num_anas), np.nan)
+        columns['makespan'] = np.full(count, np.nan)
+        columns['makespans'] = np.full((count, 3), np.nan)
+        columns['makespan_pipelined'] = np.full(count, np.nan)
+        columns['feasible'] = np.zeros(count, dtype=bool)
+        in_transit = []
+        for k, allocation in enumerate(self.allocations):
+            columns['feasible'][k] = allocation.feasible
+            columns['mask'][k] = allocation.mask
+            in_transit.append(allocation.in_transit)
+            if not allocation.feasible:
+                continue
+            for column in SIM_COLUMNS + ANA_COLUMNS + NC_COLUMNS:
+                value = getattr(allocation, column)
+                if value is not None:
+                    columns[column][k] = value
+            for column in STAGE_COLUMNS:
+                value = getattr(allocation, column)
+                if value is not None:
+                    columns[column][k, :len(value)] = value
+            if allocation.ana_time_k is not None:
+                columns['ana_time_k'][k] = allocation.ana_time_k
+            columns['makespan'][k] = allocation.makespan
+            columns['makespans'][k] = allocation.makespans
+            columns['makespan_pipelined'][k] = allocation.makespan_pipelined
+        # In-transit analyses of candidate k, in scheduling order: in_transit[offsets[k]:offsets[k + 1]]
+        columns['in_transit'] = np.concatenate(in_transit).astype(int) if in_transit else np.zeros(0, dtype=int)
+        columns['offsets'] = np.cumsum([0] + [len(indices) for indices in in_transit])
+        columns['name'] = np.array(self.names, dtype=str)
+        columns['node_heuristic'] = np.array([allocation.node_heuristic for allocation in self.allocations], dtype=str)
+        columns['core_heuristic'] = np.array([allocation.core_heuristic for allocation in self.allocations], dtype=str)
+        columns['message'] = np.array([allocation.message or '' for allocation in self.allocations], dtype=str)
+        np.savez_compressed(self.path + '.npz', **columns)
+        with open(self.path + '.yml', 'w') as file:
+            # With the partitions of the platform, which read() has no access to
+            yaml.dump(ensemble.platform_config(), file, Dumper=Dumper)
+
+    @classmethod
+    def read(cls, path):
+        """
+        Load a store written by write().
+        """
+        with open(path + '.yml', 'r') as file:
+            store = cls(engine.Ensemble(yaml.load(file, Loader=Loader)), path)
+        with np.load(path + '.npz') as data:
+            columns = {column: data[column] for column in data.files}
+        store.names = columns['name'].tolist()
+        for k in range(len(store.names)):
+            store.allocations.append(_allocation(store.ensemble, columns, k))
+        return store
+
+    def config(self, candidate):
+        """
+        Full configuration of a candidate (index or name), as written by a sweep, None if
+        it is not feasible.
+        """
+        if isinstance(candidate, str):
+            candidate = self.names.index(candidate)
+        allocation = self.allocations[candidate]
+        return allocation.to_config() if allocation.feasible else None
+
+
+def _allocation(ensemble, columns, k):
+    """
+    engine.Allocation of row k of the columns.
+    """
+    in_transit = columns['in_transit'][columns['offsets'][k]:columns['offsets'][k + 1]]
+    allocation = engine.Allocation(ensemble, in_transit, str(columns['node_heuristic'][k]), str(columns['core_heuristic'][k]))
+    allocation.feasible = bool(columns['feasible'][k])
+    allocation.message = str(columns['message'][k]) or None
+    if not allocation.feasible:
+        return allocation
+    for column in SIM_COLUMNS + ANA_COLUMNS + NC_COLUMNS:
+        if column == 'mask':
+            continue
+        value = columns[column][k]
+        if np.isnan(value).all() and column not in ['ana_core_nr', 'ana_time', 'read_bandwidth']:
+            # Not computed by the heuristics of this candidate
+            value = None
+        elif column in ['node', 'start', 'sim_core', 'ana_core', 'staging']:
+            value = value.astype(int)
+        elif value.ndim == 0:
+            value = int(value) if column in ['nc_node', 'nc_start'] else float(value)
+        setattr(allocation, column, value)
+    # Partitions that were allocated
+    used = ~np.isnan(columns['stage_node'][k])
+    allocation.stage_node = columns['stage_node'][k][used].astype(int)
+    allocation.stage_start = columns['stage_start'][k][used].astype(int)
+    if not np.isnan(columns['stage_node_nr'][k][used]).all():
+        allocation.stage_node_nr = columns['stage_node_nr'][k][used]
+    if len(in_transit):
+        allocation.ana_time_k = columns['ana_time_k'][k]
+    allocation.makespan = float(columns['makespan'][k])
+    allocation.makespans = columns['makespans'][k].tolist()
+    allocation.makespan_pipelined = float(columns['makespan_pipelined'][k])
+    return allocation
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print('Usage: python3 results.py <store> <candidate name or index> <output config>')
+        sys.exit()
+    store = ResultStore.read(sys.argv[1])
+    candidate = int(sys.argv[2]) if sys.argv[2].isdigit() else sys.argv[2]
+    config = store.config(candidate)
+    if config is None:
+        print(f'{sys.argv[2]} is not feasible')
+        sys.exit(1)
+    with open(sys.argv[3], 'w') as file:
+        yaml.dump(config, file, Dumper=Dumper)
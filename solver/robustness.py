@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Robustness of allocations to the uncertainty of the costs of their components.
+
+An allocation is planned against the flop of every simulation and analysis, whereas the
+cost of a step varies. A cost distribution gives every component a factor on its flop
+(a spec entry of generator.sample(), e.g. {distribution: lognormal, mean: 0, sigma: 0.2}):
+the `cost` entry of the component in the config, else the entry of an uncertainty spec
+for the simulations or the analyses (see DEFAULT_UNCERTAINTY). Robustness draws the
+factors once, one row per sample and one column per component, and evaluates the
+makespan model of an allocation on every row with batched array operations, by blocks
+of rows: every
+component takes its time multiplied by its factor, except the read of an in-transit
+analysis, and the makespan of a row is the number of steps times its slowest component.
+Every allocation is evaluated on the same rows, so that they are compared on the same
+samples. The makespans of the configurations written by the scheduler are summarized with
+
+    python3 solver/robustness.py <config> [<config> ...] [--uncertainty <spec>] [--samples <number>]
+"""
+import argparse
+import hashlib
+import yaml
+import numpy as np
+import generator
+from results import Loader
+
+# Factors of the flop: the analyses vary as much as the generator spreads them around the
+# flop of their member, the simulations do not
+DEFAULT_UNCERTAINTY = {
+    'simulations': 1.0,
+    'analyses': {'distribution': 'uniform', 'low': 1 - generator.diff_flop, 'high': 1 + generator.diff_flop},
+}
+# Largest number of factors in a block of samples
+MAX_BLOCK = 1 << 22
+# Largest number of factors kept in memory, beyond which the blocks are drawn again at
+# every evaluation
+MAX_FACTORS = 1 << 26
+
+
+def load_uncertainty(uncertainty_file=None, **overrides):
+    """
+    DEFAULT_UNCERTAINTY updated with a YAML uncertainty spec file and with the overrides
+    that are not None.
+    """
+    uncertainty = dict(DEFAULT_UNCERTAINTY)
+    if uncertainty_file is not None:
+        with open(uncertainty_file, 'r') as file:
+            uncertainty.update(yaml.load(file, Loader=Loader) or {})
+    uncertainty.update({key: value for key, value in overrides.items() if value is not None})
+    unknown = set(uncertainty) - set(DEFAULT_UNCERTAINTY)
+    if unknown:
+        raise ValueError(f'Unknown uncertainty keys: {sorted(unknown)}')
+    return uncertainty
+
+
+def allocation_times(allocation):
+    """
+    Times per step of an engine.Allocation: the part of every component (simulations,
+    then analyses) that scales with its cost, and the part that does not. The time per run
+    of an analysis is weighed by the share of the steps on which it runs.
+    """
+    ensemble = allocation.ensemble
+    data = ensemble.data[ensemble.member]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        read = np.where(allocation.mask & (data > 0), data / allocation.read_bandwidth, 0.0)
+    compute = np.concatenate((allocation.sim_time, (allocation.ana_time - read) * ensemble.duty))
+    fixed = np.concatenate((np.zeros(len(ensemble.simulations)), read * ensemble.duty))
+    return compute, fixed
+
+
+def config_times(config):
+    """
+    allocation_times() of a configuration written by the scheduler.
+    """
+    allocations = config['allocations']
+    steps = config['steps']
+    sims, anas = [], []
+    for sim_config in config['simulations'].values():
+        sims.append(sim_config['time'])
+        for ana_config in sim_config['coupling'].values():
+            read = 0.0
+            if ana_config['alloc'] != sim_config['alloc'] and sim_config['data'] > 0:
+                if 'read_bandwidth' in ana_config:
+                    read = sim_config['data'] / ana_config['read_bandwidth']
+                else:
+                    read = sim_config['data'] / (allocations[ana_config['alloc']]['node'] * config['bandwidth'])
+            duty = -(-steps // ana_config.get('frequency', 1)) / steps
+            anas.append(((ana_config['time'] - read) * duty, read * duty))
+    anas = np.array(anas, dtype=float).reshape(-1, 2)
+    compute = np.concatenate((np.array(sims, dtype=float), anas[:, 0]))
+    fixed = np.concatenate((np.zeros(len(sims)), anas[:, 1]))
+    return compute, fixed
+
+
+class Robustness:
+    """
+    Makespans of allocations of an ensemble over sampled costs.
+
+    The objective of a robust search is the `quantile` of the makespan over the samples.
+    Taking the slowest component of every sample can only raise its makespan, so the
+    quantile is at least the number of steps times the largest quantile of the time of a
+    component, and `scale` (the smallest quantile of a factor, at most 1) bounds the ratio
+    of the objective to the makespan of the model from below.
+
+    Block k of samples is drawn with the seed (seed, k), so that the samples do not depend
+    on whether the factors fit in memory (MAX_FACTORS). If they do not, the blocks are
+    drawn again by every evaluation and `scale` falls back to the smallest factor.
+    """
+
+    def __init__(self, config, uncertainty=None, samples=10000, seed=0, quantile=0.95):
+        uncertainty = load_uncertainty(**(uncertainty or {}))
+        self.samples = samples
+        self.seed = seed
+        self.quantile = quantile
+        # Cost distribution of the simulations, then of the analyses
+        simulations_config = config['simulations'].values()
+        components = [sim_config.get('cost', uncertainty['simulations']) for sim_config in simulations_config]
+        components += [ana_config.get('cost', uncertainty['analyses']) for sim_config in simulations_config for ana_config in sim_config['coupling'].values()]
+
+        # Components with the same distribution are drawn at once
+        self.columns = {}
+        for k, spec in enumerate(components):
+            self.columns.setdefault(repr(spec), (spec, []))[1].append(k)
+        self.num_components = len(components)
+        rows = max(1, MAX_BLOCK // max(1, self.num_components))
+        self.blocks = [(start, min(start + rows, samples)) for start in range(0, samples, rows)]
+        self.factors = None
+        if samples * self.num_components <= MAX_FACTORS:
+            self.factors = np.concatenate([self.block(k) for k in range(len(self.blocks))] + [np.zeros((0, self.num_components), dtype=np.float32)])
+        self.low = np.full(self.num_components, np.inf)
+        self.high = np.zeros(self.num_components)
+        for k in range(len(self.blocks)):
+            factors = self.block(k)
+            self.low = np.minimum(self.low, factors.min(axis=0, initial=np.inf))
+            self.high = np.maximum(self.high, factors.max(axis=0, initial=0))
+        if self.factors is not None and samples:
+            self.quantiles = np.quantile(self.factors, quantile, axis=0)
+        else:
+            self.quantiles = self.low
+        self.scale = min(1.0, float(self.quantiles.min(initial=1.0)))
+        self.key = hashlib.sha256(repr((samples, seed, quantile, components)).encode()).hexdigest()
+
+    def block(self, k):
+        """
+        Factors of block k of samples (one row per sample, one column per component).
+        """
+        start, end = self.blocks[k]
+        if self.factors is not None:
+            return self.factors[start:end]
+        rng = np.random.default_rng([self.seed, k])
+        factors = np.empty((end - start, self.num_components), dtype=np.float32)
+        for spec, index in self.columns.values():
+            factors[:, index] = np.maximum(generator.sample(rng, spec, (end - start, len(index))), 0)
+        return factors
+
+    def makespans(self, compute, fixed, steps):
+        """
+        Makespan of every sample.
+
+        Args:
+            compute: time per step of every component that scales with its cost
+            fixed: time per step of every component that does not
+            steps: number of steps
+
+        Returns:
+            array of makespans
+
+        """
+        if len(compute) == 0:
+            return np.zeros(self.samples)
+        # Every sample is at least as slow as the fastest draw of every component, so the
+        # components that are slower in none of their draws never set a makespan
+        slowest = float(np.max(self.low * compute + fixed))
+        columns = np.flatnonzero(self.high * compute + fixed >= slowest)
+        compute = compute[columns]
+        fixed = fixed[columns]
+        result = np.empty(self.samples)
+        for k, (start, end) in enumerate(self.blocks):
+            result[start:end] = (self.block(k)[:, columns] * compute + fixed).max(axis=1)
+        return result * steps
+
+    def summary(self, compute, fixed, steps):
+        """
+        Makespan of the model, mean, p95 and p99 makespans and objective of some times.
+        """
+        makespans = self.makespans(compute, fixed, steps)
+        p95, p99, objective = np.quantile(makespans, [0.95, 0.99, self.quantile])
+        return {'makespan': float(np.max(compute + fixed, initial=0)) * steps, 'mean': float(makespans.mean()),
+                'p95': float(p95), 'p99': float(p99), 'objective': float(objective)}
+
+    def score(self, allocation):
+        """
+        Objective of an engine.Allocation: the quantile of its makespan.
+        """
+        return float(np.quantile(self.makespans(*allocation_times(allocation), allocation.ensemble.steps), self.quantile))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage='python3 robustness.py <config> [<config> ...] [--uncertainty <spec yaml>] [--samples <number>] [--seed <seed>]')
+    parser.add_argument('configs', nargs='+', help='configurations written by the scheduler')
+    parser.add_argument('--uncertainty', help='YAML uncertainty spec, see DEFAULT_UNCERTAINTY')
+    parser.add_argument('--samples', type=int, default=10000, help='number of sampled cost vectors')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the samples')
+    args = parser.parse_args()
+
+    uncertainty = load_uncertainty(args.uncertainty)
+    for config_file in args.configs:
+        with open(config_file, 'r') as file:
+            config = yaml.load(file, Loader=Loader)
+        robustness = Robustness(config, uncertainty, args.samples, args.seed)
+        summary = robustness.summary(*config_times(config), config['steps'])
+        print(f'{config_file}: makespan {summary["makespan"]:.4f}, mean {summary["mean"]:.4f}, p95 {summary["p95"]:.4f}, p99 {summary["p99"]:.4f}')
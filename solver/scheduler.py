@@ -1,967 +1,862 @@
 #!/usr/bin/env python3
 import yaml
-from sympy import solveset, S, Eq
-from sympy.abc import x
-import signal
-import math
 import random
-import itertools
+import argparse
+import multiprocessing
+import copy
+import csv
 import sys
-
-def heuristic_round(number):
-    return round(number) 
-
-# Load yaml config file
-config_file = sys.argv[1]
-output_file = 'result.yml'
-
-with open(config_file, 'r') as file:
-    config = yaml.safe_load(file)
-simulations_config = config['simulations']
-# Computational power per core (GFLOPs)
-speed = config['speed']
-# Number of cores per node
-cores = config['cores']
-# Memory bandwidth per node (GB/s)
-bandwidth_global = config['bandwidth']
-# Number of nodes
-nodes = config['nodes']
-# Memory capacity per node (GB)
-mem = config['memory']
-print('Number of nodes : {}'.format(nodes))
-print('Number of cores per node : {}'.format(cores))
-print('Memory bandwidth per node (GB/s) : {}'.format(bandwidth_global))
-print('Computational power per core (GFLOPs) : {}'.format(speed))
-print('Memory capacity per node (GB) : {}'.format(mem))
-
-def sublist(l):  
-    result = []  
-    for i in range(0, len(l)+1):
-        for subset in itertools.combinations(l, i):
-            result.append(subset)
-    return result
-
-# ac = []
-# for sim in simulations_config:
-#     for ana in simulations_config[sim]['coupling']:
-#         ac.append(sim + '_' + ana)
-# sub_ac = sublist(ac)
-# print(sub_ac) 
-track = 0
-
-
-def schedule(output_file, heuristic="increasing"):
+import time
+import signal
+import logging
+import numpy as np
+import engine
+import search
+import instrument
+from instrument import logger
+from cache import AllocationCache
+from network import NetworkModel
+from robustness import Robustness, allocation_times, load_uncertainty
+from results import ResultStore, Loader, Dumper
+
+@instrument.timed('serialize')
+def write_config(config, output_file):
+    with open(output_file, 'w') as out_file:
+        yaml.dump(config, out_file, Dumper=Dumper)
+
+
+class Scheduler:
     """
-    Continuously co-schedules simulations and analyses following given heuristic.
-        
-    Args:
-        output_file:
-        heuristic: either 'increasing', 'decreasing', 'random', or 'brute-force'
-    
-    Returns: 
-        True if it is feasible to continue co-scheduling
-        False otherwise.
-
-    """ 
-
-    # with open(config_file, 'r') as file:
-    #     config = yaml.safe_load(file)
-    global track
-    print(f'track: {track}')    
-    # simulations_config = config['simulations']
-    if 'unfeasible' not in config:
-        config['unfeasible'] = []
-        config['non-co-scheduling'] = {}
-        for sim in simulations_config:
-            config['non-co-scheduling'][sim] = []
-    # print(simulations_config.keys())
-    # if not config['unfeasible']:
-    #     config['unfeasible'] = list(simulations_config.keys())
-    else:
-        if heuristic == 'brute-force': 
-            # global track
-            if track == len(sub_ac):
-                print('sim0 has no feasible scheduling')
-                return False
-            # print(track, sub_ac[track])
-            for sim in simulations_config:
-                config['non-co-scheduling'][sim] = []
-            for sim_ana in sub_ac[track]:
-                sim, ana = sim_ana.split('_')
-                config['non-co-scheduling'][sim].append(ana)
-            
-        else:
-            if not config['unfeasible'] or config['unfeasible'] == ['sim0']:
-                picked_sim = None
-                picked_ana = None
-                if heuristic == "increasing":
-                    picked_flop = float('inf')
-                elif heuristic == 'decreasing':
-                    picked_flop = float('-inf')
-                else:
-                    picked_anas = []
-                for sim in simulations_config:
-                    for ana in simulations_config[sim]['coupling']:
-                        if ana not in config['non-co-scheduling'][sim]:
-                            ana_flop = simulations_config[sim]['coupling'][ana]['flop']
-                            if heuristic == "increasing":
-                                if ana_flop <= picked_flop:
-                                    picked_sim = sim
-                                    picked_ana = ana
-                                    picked_flop = ana_flop
-                            elif heuristic == "decreasing":
-                                if ana_flop >= picked_flop:
-                                    picked_sim = sim
-                                    picked_ana = ana
-                                    picked_flop = ana_flop
-                            else:
-                                picked_anas.append((sim, ana))
-                
-                if heuristic == "increasing" or heuristic == "decreasing":
-                    if not picked_sim:
-                        print(f'sim0 has no feasible scheduling')
-                        return False
-                else:
-                    if not picked_anas:
-                        print(f'sim0 has no feasible scheduling')
-                        return False
-                    (picked_sim, picked_ana) = random.choice(picked_anas)
-                
-                config['non-co-scheduling'][picked_sim].append(picked_ana)
-            
-            for sim in config['unfeasible']:
-                if sim != 'sim0':
-                    simulations_config[sim]['alloc'] = sim
-                    if heuristic == 'increasing':
-                        sorted_ana = sorted(simulations_config[sim]['coupling'].items(), key=lambda item: item[1]['flop'])
-                    elif heuristic == 'decreasing':
-                        sorted_ana = sorted(simulations_config[sim]['coupling'].items(), key=lambda item: item[1]['flop'], reverse=True)
-                    else:
-                        sorted_ana = list(simulations_config[sim]['coupling'].items())
-                    # print(sorted_ana)
-                    if not config['non-co-scheduling'][sim]:
-                        config['non-co-scheduling'][sim] = []
-                    subset_ana = [k for k, v in sorted_ana if k not in config['non-co-scheduling'][sim]]
-                    if not subset_ana:
-                        print(f'{sim} has no feasible scheduling')
-                        return False
-                    if heuristic == "random":
-                        new_ana = random.choice(subset_ana)
-                    else:
-                        new_ana = subset_ana[0]
-                    config['non-co-scheduling'][sim].append(new_ana)
-    
-    track += 1
-    
-    if output_file:
-        with open(output_file, 'w') as file:
-            yaml.dump(config, file)
-
-    return True
-
-def near_allocate(output_file):
-    scheduling_config = config['non-co-scheduling']
-    config['allocations'] = {}
-    allocation_config = config['allocations']
-    time_sum = 0
-    time_nc_sum = 0
-    
-    for sim in simulations_config:
-        allocation_config[sim] = {}
-        time_s_seq = simulations_config[sim]['time_seq']
-        time_sum += time_s_seq
-        time_c_sum = time_s_seq
-        simulations_config[sim]['alloc'] = sim
-        for ana in simulations_config[sim]['coupling']:
-            ana_config = simulations_config[sim]['coupling'][ana]
-            time_a_seq = ana_config['time_seq']
-            if ana in scheduling_config[sim]:
-                ana_config['alloc'] = 'sim0'
-                time_nc_sum += time_a_seq
-            else:
-                ana_config['alloc'] = sim
-                time_c_sum += time_a_seq
-            time_sum += time_a_seq
-        allocation_config[sim]['time_sum'] = time_c_sum
-        print(time_c_sum)
-    print(f'time_sum = {time_sum}')
-    print(f'time_nc_sum = {time_nc_sum}')
-
-    allocation_config['sim0'] = {}
-    allocation_config['sim0']['time_sum'] = time_nc_sum
-    allocation_config['sim0']['node'] = time_nc_sum * nodes / time_sum
-    num_int_nodes = 0
-    if allocation_config['sim0']['node'].is_integer():
-        num_int_nodes += 1
-    sum_node_rd = math.floor(allocation_config['sim0']['node'])
-    for sim in simulations_config:
-        time_s_seq = simulations_config[sim]['time_seq']
-        time_c_sum = allocation_config[sim]['time_sum']
-        simulations_config[sim]['core'] = time_s_seq * cores / time_c_sum
-        for ana in simulations_config[sim]['coupling']:
-            ana_config = simulations_config[sim]['coupling'][ana]
-            time_a_seq = ana_config['time_seq'] 
-            if ana in scheduling_config[sim]:
-                ana_config['core'] = time_a_seq * cores / time_nc_sum
-            else:
-                ana_config['core'] = time_a_seq * cores / time_c_sum
-        node = time_c_sum * nodes / time_sum
-        if node.is_integer():
-            num_int_nodes += 1
-        sum_node_rd += math.floor(node)
-        allocation_config[sim]['node'] = node
-
-    sorted_alloc = sorted(allocation_config.keys(), key=lambda item: allocation_config[item]['time_sum'])
-    print(sorted_alloc)
-    threshold = len(sorted_alloc) - num_int_nodes - nodes + sum_node_rd
-    print(threshold)
-    track = len(sorted_alloc) - 1
-    for alloc in sorted_alloc:
-        node = allocation_config[alloc]['node']
-        if node.is_integer():
-            round_node = int(node)
-        else:
-            if node < 1: 
-                round_node = math.ceil(node)
-            else:
-                if threshold > 0:
-                    if track > 0:
-                        round_node = math.floor(node)
-                        threshold -= 1
-                    else:
-                        round_node = math.floor(node) - threshold + 1
-                        threshold = 0
-                else:
-                    round_node = math.ceil(node)
-        allocation_config[alloc]['node'] = round_node
-        allocation_config[alloc]['original_node'] = node
-        track -= 1
-    if threshold > 0:
-        print(f'Not sufficient resource for node allocation')
-        config['unfeasible'] = []
-        return False
-
-    for sim in simulations_config:
-        c_dict = {}
-        num_int_cores = 0
-        c_dict[sim + '_'] = simulations_config[sim]['time_seq']
-        core = simulations_config[sim]['core']
-        if core.is_integer():
-            num_int_cores += 1
-        sum_core_rd = math.floor(core)
-        for ana in simulations_config[sim]['coupling']:
-            ana_config = simulations_config[sim]['coupling'][ana]
-            if ana not in scheduling_config[sim]:
-                c_dict[sim + '_' + ana] = ana_config['time_seq']
-                core = ana_config['core']
-                if core.is_integer():
-                    num_int_cores += 1
-                sum_core_rd += math.floor(core)
-
-        sorted_c_dict = sorted(c_dict.items(), key=lambda item: item[1])
-        threshold = len(sorted_c_dict) - num_int_cores - cores + sum_core_rd
-        print(threshold)
-        track = len(sorted_c_dict) - 1
-        for sim_ana, time_seq in sorted_c_dict:
-            sim, ana = sim_ana.split('_')
-            if ana:
-                core_config = simulations_config[sim]['coupling'][ana]
-            else:
-                core_config = simulations_config[sim]
-            core = core_config['core']
-            if core.is_integer():
-                round_core = int(core)
-            else:
-                if core < 1: 
-                    round_core = math.ceil(core)
-                else:
-                    if threshold > 0:
-                        if track > 0:
-                            round_core = math.floor(core)
-                            threshold -= 1
-                        else:
-                            round_core = math.floor(core) - threshold + 1
-                            threshold = 0
-                    else:
-                        round_core = math.ceil(core)
-            core_config['core'] = round_core
-            core_config['original_core'] = core
-            track -= 1
-        if threshold > 0:
-            print(f'Not sufficient resource for core allocation of {sim}')
-            config['unfeasible'] = []
-            return False
-    
-    nc_dict = {}
-    num_int_cores = 0
-    sum_core_rd = 0
-    for sim in scheduling_config:
-        for ana in scheduling_config[sim]:
-            nc_dict[sim + '_' + ana] = simulations_config[sim]['coupling'][ana]['time_seq']
-            core = simulations_config[sim]['coupling'][ana]['core']
-            if core.is_integer():
-                num_int_cores += 1
-            sum_core_rd += math.floor(core)
-    sorted_nc_dict = sorted(nc_dict.items(), key=lambda item: item[1])
-    print(sorted_nc_dict)
-    threshold = len(sorted_nc_dict) - num_int_cores - cores + sum_core_rd
-    print(threshold)
-    track = len(sorted_nc_dict) - 1
-    for sim_ana, time_seq in sorted_nc_dict:
-        sim, ana = sim_ana.split('_')
-        core = simulations_config[sim]['coupling'][ana]['core']
-        if core.is_integer():
-            round_core = int(core)
-        else:
-            if core < 1: 
-                round_core = math.ceil(core)
-            else:
-                if threshold > 0:
-                    if track > 0:
-                        round_core = math.floor(core)
-                        threshold -= 1
-                    else:
-                        round_core = math.floor(core) - threshold + 1
-                        threshold = 0
-                else:
-                    round_core = math.ceil(core)
-        simulations_config[sim]['coupling'][ana]['core'] = round_core
-        simulations_config[sim]['coupling'][ana]['original_core'] = core
-        track -= 1
-    if threshold > 0:
-        print(f'Not sufficient resource for core allocation of sim0')
-        config['unfeasible'] = []
-        return False
-
-    if output_file:
-        with open(output_file, 'w') as out_file:
-            yaml.dump(config, out_file)
-    
-    return True
-        
-
-
-def allocate(output_file, round_up=True, node_heuristic='model', core_heuristic='model'):
+    Co-scheduling and resource allocation of an ensemble.
+
+    The ensemble/platform description is copied and frozen when the scheduler is
+    created. Methods never change it nor their arguments: they return new 'non-co-scheduling'
+    mappings and new allocations, so that one scheduler can evaluate many candidate
+    co-scheduling sets, from several threads or from a process pool.
+
+    With a cache.AllocationCache, allocate() returns the cached allocation of an in-transit
+    set that was already allocated with the same heuristics. With a network.NetworkModel of
+    the platform, the in-transit reads are slowed down by the links they share. With
+    `staging` (or a 'staging' entry in the config), the in-transit analyses are split into
+    that many staging partitions. With a robustness.Robustness in `robustness`, the
+    searches minimize a quantile of the makespan over sampled costs (see score()).
     """
-    Compute the resource allocation for each simulation and analysis.
-        
-    Args:
-        output_file:
-        round_up:
-        node_heuristic:
-        core_heuristic:
-
-    Returns: 
-        True if it is feasible to compute integer resource allocation
-        Otherwise, False.
-
-    """ 
-
-    # with open(config_file, 'r') as file:
-    #     config = yaml.safe_load(file)
-
-    # simulations_config = config['simulations']
-
-    # # Computational power per core (GFLOPs)
-    # speed = config['speed']
-    # # Number of cores per node
-    # cores = config['cores']
-    # # Memory bandwidth per node (GB/s)
-    # bandwidth = config['bandwidth']
-    # # Number of nodes
-    # nodes = config['nodes']
-    # # print('Number of nodes : {}'.format(nodes))
-    # # print('Number of cores per node : {}'.format(cores))
-    # # print('Memory bandwidth per node (GB/s) : {}'.format(bandwidth))
-    # # print('Computational power per core (GFLOPs) : {}'.format(speed))
-
-    ideal_sched = True
-    # if 'non-co-scheduling' not in config:
-    #     ideal_sched = True
-        # config['non-co-scheduling'] = {}
-        # for sim in simulations_config:
-        #     config['non-co-scheduling'][sim] = []
-
-    scheduling_config = config['non-co-scheduling']
-    # print(scheduling_config)
-    for sim in scheduling_config:
-        if len(scheduling_config[sim]):
-            ideal_sched = False
-            break 
-    
-    
-    # t(P^NC)
-    time_nc_sum = 0
-    # t(S)
-    time_s_sum = 0
-    # t(P^C)
-    time_c_sum = 0
-    num_nc_anas = 0
-    # Compute t(S), t(P^C), t(P^NC)
-    for sim in scheduling_config:
-        num_nc_anas += len(scheduling_config[sim])
-        time_s_seq = simulations_config[sim]['time_seq']
-        time_s_sum += time_s_seq
-        simulations_config[sim]['alloc'] = sim
-
-        for ana in simulations_config[sim]['coupling']:
-            ana_config = simulations_config[sim]['coupling'][ana]
-            time_a_seq = ana_config['time_seq'] 
-            if ana in scheduling_config[sim]:
-                ana_config['alloc'] = 'sim0'
-                time_nc_sum += time_a_seq
-            else:
-                ana_config['alloc'] = sim
-                time_c_sum += time_a_seq
-
-    bandwidth = bandwidth_global
-    num_sims = len(simulations_config.keys())
-    round_nc_nodes = 0
-    config['allocations'] = {}
-    config['allocations']['sim0'] = {}
-    if not ideal_sched:
-        print('not ideal scheduling')
-        bandwidths = {}
-        bandwidths[1] = bandwidth / num_nc_anas
-        bandwidths[2] = bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes)
-        bandwidths[3] = bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes * num_nc_anas)
-        # bandwidth = bandwidth_global * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes * num_nc_anas) 
-        # Solve Equation 25
-        equation = - 1/bandwidth
-        for sim in scheduling_config:
-            data_size = simulations_config[sim]['data']
-            for ana in scheduling_config[sim]:
-                ana_config = simulations_config[sim]['coupling'][ana]
-                equation += ana_config['time_seq']/(bandwidth * time_nc_sum + x - cores * data_size)
-        u_sol = solveset(equation, x, domain=S.Reals)
-        # print(u_sol)
-        lu = list(u_sol.args)
-        u = float(lu[-1])
-        # print("U = {}".format(u))
-        if node_heuristic == 'model':
-            # Compute n^{NC}
-            time_sum = time_s_sum + time_c_sum + time_nc_sum
-            nc_nodes = nodes * (bandwidth * time_nc_sum + u) / (bandwidth * time_sum + u)
-            config['allocations']['sim0']['node_nr'] = nc_nodes
-            round_nc_nodes = math.ceil(nc_nodes)
-            if nc_nodes > nodes-1:
-                print(f'Cannot round up num_nodes for non-co-scheduling to {nodes}')
-                round_nc_nodes = math.floor(nc_nodes)
+
+    def __init__(self, config, cache=None, network=None, staging=None):
+        self.config = copy.deepcopy(config)
+        if staging is not None:
+            self.config['staging'] = staging
+        self.ensemble = engine.Ensemble(self.config, network)
+        self.cache = cache
+        # robustness.Robustness whose quantile of the makespan the searches minimize, the
+        # makespan of the model if None
+        self.robustness = None
+        self.simulations_config = self.config['simulations']
+        # Computational power per core (GFLOPs)
+        self.speed = self.config['speed']
+        # Number of cores per node
+        self.cores = self.config['cores']
+        # Memory bandwidth per node (GB/s)
+        self.bandwidth = self.config['bandwidth']
+        # Number of nodes
+        self.nodes = self.config['nodes']
+        # Memory capacity per node (GB)
+        self.mem = self.config['memory']
+        self._member = {sim: i for i, sim in enumerate(self.ensemble.simulations)}
+        # Pick orders of schedule(): by flop, the last analysis first among equal flops
+        # globally, the first one first within a member
+        index = np.arange(len(self.ensemble.analyses))
+        flop = self.ensemble.ana_flop
+        member = self.ensemble.member
+        self._order = {
+            'increasing': np.lexsort((-index, flop)),
+            'decreasing': np.lexsort((-index, -flop))}
+        self._member_order = {
+            'increasing': np.lexsort((index, flop, member)),
+            'decreasing': np.lexsort((index, -flop, member)),
+            'random': index}
+
+    @classmethod
+    def from_file(cls, config_file, cache=None, network=None, staging=None):
+        # Load yaml config file
+        with open(config_file, 'r') as file:
+            return cls(yaml.load(file, Loader=Loader), cache, network, staging)
+
+    def describe(self):
+        print('Number of nodes : {}'.format(self.nodes))
+        print('Number of cores per node : {}'.format(self.cores))
+        print('Memory bandwidth per node (GB/s) : {}'.format(self.bandwidth))
+        print('Computational power per core (GFLOPs) : {}'.format(self.speed))
+        print('Memory capacity per node (GB) : {}'.format(self.mem))
+        if self.ensemble.heterogeneous:
+            for nodes, speed, cores, memory in self.ensemble.partitions:
+                print('Partition : {} nodes, {} cores per node, {} GFLOPs per core, {} GB per node'.format(nodes, cores, speed, memory))
+        if self.ensemble.staging > 1:
+            print('Number of staging partitions : {}'.format(self.ensemble.staging))
+        if self.ensemble.amdahl:
+            ensemble = self.ensemble
+            serial = np.concatenate((ensemble.serial, ensemble.ana_serial))
+            saturation = np.concatenate((ensemble.saturation, ensemble.ana_saturation))
+            print('Components with a serial fraction : {} (largest {})'.format(int(np.count_nonzero(serial)), serial.max()))
+            print('Components with a saturation core count : {}'.format(int(np.isfinite(saturation).sum())))
+        if (self.ensemble.frequency > 1).any():
+            frequency = self.ensemble.frequency
+            print('Analyses run every k > 1 steps : {} (largest k {})'.format(int(np.count_nonzero(frequency > 1)), int(frequency.max())))
+
+    def ideal(self):
+        """
+        'non-co-scheduling' mapping in which every analysis is co-scheduled
+        """
+        return {sim: [] for sim in self.simulations_config}
+
+    def schedule(self, scheduling_config=None, unfeasible=(), heuristic='increasing', rng=random):
+        """
+        Co-schedules one more step of simulations and analyses following given heuristic.
+
+        Args:
+            scheduling_config: current 'non-co-scheduling' mapping, None to start from the ideal scheduling
+            unfeasible: allocations of the current scheduling that cannot be sustained
+            heuristic: either 'increasing', 'decreasing', or 'random'
+            rng: random number generator of the 'random' heuristic
+
+        Returns:
+            The next 'non-co-scheduling' mapping if it is feasible to continue co-scheduling
+            None otherwise.
+
+        """
+        if scheduling_config is None:
+            return self.ideal()
+        mask = self.ensemble.mask(self.ensemble.in_transit(scheduling_config))
+        picked = self._pick(mask, unfeasible, heuristic, rng, {})
+        if picked is None:
+            return None
+        scheduling_config = {sim: list(anas) for sim, anas in scheduling_config.items()}
+        for i in picked:
+            sim, ana = self.ensemble.analyses[i]
+            scheduling_config[sim].append(ana)
+        return scheduling_config
+
+    @instrument.timed('schedule')
+    def _pick(self, mask, unfeasible, heuristic, rng, cursor):
+        """
+        Analyses moved in transit by one step of schedule().
+
+        'increasing' and 'decreasing' walk the analyses in a precomputed flop order
+        (globally, and within every member for unfeasible allocations). The positions
+        reached are kept in cursor, so that a loop whose in-transit set only grows
+        walks every order once.
+
+        Args:
+            mask: current in-transit mask
+            unfeasible: see schedule()
+            heuristic: see schedule()
+            rng: see schedule()
+            cursor: positions reached in the orders by the previous steps, {} to start over
+
+        Returns:
+            list of analysis indices, None if it is not feasible to continue co-scheduling
+
+        """
+        ensemble = self.ensemble
+        picked = []
+        if not unfeasible or list(unfeasible) == ['sim0']:
+            if heuristic == 'increasing' or heuristic == 'decreasing':
+                order = self._order[heuristic]
+                k = cursor.get('sim0', 0)
+                while k < len(order) and mask[order[k]]:
+                    k += 1
+                cursor['sim0'] = k
+                if k == len(order):
+                    logger.info('sim0 has no feasible scheduling')
+                    return None
+                picked.append(int(order[k]))
             else:
-                if nc_nodes < 1:
-                    print(f'Cannot round down num_nodes for non-co-scheduling to 0')
+                picked_anas = np.flatnonzero(~mask).tolist()
+                if not picked_anas:
+                    logger.info('sim0 has no feasible scheduling')
+                    return None
+                picked.append(rng.choice(picked_anas))
+
+        for sim in unfeasible:
+            if sim != 'sim0':
+                i = self._member[sim]
+                order = self._member_order[heuristic][ensemble.first[i]:ensemble.last[i]]
+                if heuristic == 'random':
+                    subset_ana = [j for j in order.tolist() if not mask[j]]
+                    if not subset_ana:
+                        logger.info('%s has no feasible scheduling', sim)
+                        return None
+                    picked.append(rng.choice(subset_ana))
                 else:
-                    diff_up = max((time_s_sum + time_c_sum) / (nodes - math.ceil(nc_nodes)), (bandwidth * time_nc_sum + u) / (bandwidth * math.ceil(nc_nodes)))
-                    # print(f'diff_up = {diff_up}')
-                    diff_down = max((time_s_sum + time_c_sum) / (nodes - math.floor(nc_nodes)), (bandwidth * time_nc_sum + u) / (bandwidth * math.floor(nc_nodes)))
-                    # print(f'diff_down = {diff_down}')
-                    if diff_down < diff_up:
-                        round_nc_nodes = math.floor(nc_nodes)
-            
-            # # Heuristic to round n^{NC}
-            # if round_up:
-            #     round_nc_nodes = math.ceil(nc_nodes)
-            # else:
-            #     if nc_nodes < 1:
-            #         print(f'Cannot round down num_nodes for non-co-scheduling to 0')
-            #         config['unfeasible'] = []
-            #         with open(output_file, 'w') as file:
-            #             yaml.dump(config, file)
-            #         return False 
-            #     round_nc_nodes = math.floor(nc_nodes)
-            # print(f'nc_nodes = {nc_nodes}')
-        else:
-            even_nodes = nodes / (num_sims + 1)
-            # print(f'even_nodes = {even_nodes}')
-            round_nc_nodes = nodes - math.floor(even_nodes) * num_sims
-
-        # print(f'round_nc_nodes = {round_nc_nodes}')
-        if nodes - round_nc_nodes < num_sims:
-            # We probably might want to return False here
-            print(f'Number of nodes for co-scheduling cannot be less than the number of simulations')
-            round_nc_nodes = nodes - num_sims
-
-        # Resource allocation for P^NC
-        if core_heuristic == 'model':
-            nc_seq_dict = {}
-            sum_core_rd = 0
-            num_int_cores = 0
-            for sim in scheduling_config:
-                data_size = simulations_config[sim]['data']
-                for ana in scheduling_config[sim]:
-                    ana_config = simulations_config[sim]['coupling'][ana]
-                    core = bandwidth * cores * ana_config['time_seq']/(bandwidth * time_nc_sum + u - cores * data_size)
-                    nc_seq_dict[sim + '_' + ana] = ana_config['time_seq']
-                    if core.is_integer():
-                        num_int_cores += 1
-                    sum_core_rd += math.floor(core)
-                    ana_config['core_per_node'] = core
-                    time_a = ana_config['time_seq'] / (round_nc_nodes * core)
-                    time_a +=  data_size / (round_nc_nodes * bandwidth)
-                    # ana_config['time_nr'] = time_a 
-            
-            # Heuristic to round c^{NC}: Round up c_A of analyses A with greater t(A)  
-            # Sort by analysis sequential time
-            sorted_nc_seq_dict = sorted(nc_seq_dict.items(), key=lambda item: item[1])
-            # print(nc_seq_dict)
-            # print(sorted_nc_seq_dict)
-            threshold = len(sorted_nc_seq_dict) - num_int_cores - cores + sum_core_rd
-            # print('Number of analyses whose cores are round up : {}'.format(threshold))
-            # sum_cores = 0
-            for sim_ana, time_seq in sorted_nc_seq_dict:
-                sim, ana = sim_ana.split('_')
+                    k = cursor.get(sim, 0)
+                    while k < len(order) and mask[order[k]]:
+                        k += 1
+                    cursor[sim] = k
+                    if k == len(order):
+                        logger.info('%s has no feasible scheduling', sim)
+                        return None
+                    picked.append(int(order[k]))
+
+        return picked
+
+    def allocate(self, scheduling_config, node_heuristic='model', core_heuristic='model'):
+        """
+        Compute the resource allocation for each simulation and analysis.
+
+        Args:
+            scheduling_config: 'non-co-scheduling' mapping, or index array of in-transit analyses
+            node_heuristic: either 'model', 'even' or 'exact'
+            core_heuristic: either 'model', 'even' or 'exact'
+
+        Returns:
+            engine.Allocation, whose feasible flag is True if it is feasible to compute integer
+            resource allocation
+
+        """
+        if isinstance(scheduling_config, dict):
+            scheduling_config = self.ensemble.in_transit(scheduling_config)
+        if self.cache is not None:
+            return self.cache.allocate(self.ensemble, scheduling_config, node_heuristic, core_heuristic)
+        return engine.allocate(self.ensemble, scheduling_config, node_heuristic=node_heuristic, core_heuristic=core_heuristic)
+
+    def allocate_many(self, candidates, node_heuristic='model', core_heuristic='model', processes=None):
+        """
+        Allocate many candidate co-scheduling sets at once with a process pool.
+
+        Args:
+            candidates: list of 'non-co-scheduling' mappings or index arrays
+            node_heuristic: either 'model', 'even' or 'exact'
+            core_heuristic: either 'model', 'even' or 'exact'
+            processes: number of worker processes (number of CPUs if None)
+
+        Returns:
+            list of engine.Allocation, in the order of the candidates
+
+        """
+        tasks = [(candidate, node_heuristic, core_heuristic) for candidate in candidates]
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self, instrument.enabled())) as pool:
+            allocations = []
+            for allocation, recorded in pool.starmap(_allocate, tasks):
+                instrument.merge(recorded)
+                allocations.append(allocation)
+        for allocation in allocations:
+            allocation.ensemble = self.ensemble
+        return allocations
+
+    def near_allocate(self, scheduling_config):
+        """
+        Near allocation: nodes and cores proportional to the sequential times of the
+        whole ensemble.
+
+        Args:
+            scheduling_config: 'non-co-scheduling' mapping
+
+        Returns:
+            New configuration with the allocation, None if it is not feasible
+
+        """
+        config = copy.deepcopy(self.config)
+        simulations_config = config['simulations']
+        nodes = self.nodes
+        cores = self.cores
+        config['non-co-scheduling'] = scheduling_config
+        config['allocations'] = {}
+        allocation_config = config['allocations']
+        time_sum = 0
+        time_nc_sum = 0
+
+        for sim in simulations_config:
+            allocation_config[sim] = {}
+            time_s_seq = simulations_config[sim]['time_seq']
+            time_sum += time_s_seq
+            time_c_sum = time_s_seq
+            simulations_config[sim]['alloc'] = sim
+            for ana in simulations_config[sim]['coupling']:
                 ana_config = simulations_config[sim]['coupling'][ana]
-                core = ana_config['core_per_node']
-                if core.is_integer():
-                    round_core = int(core)
+                time_a_seq = ana_config['time_seq']
+                if ana in scheduling_config[sim]:
+                    ana_config['alloc'] = 'sim0'
+                    time_nc_sum += time_a_seq
                 else:
-                    if core < 1: 
-                        round_core = math.ceil(core)
-                    else:
-                        if threshold > 0:
-                            round_core = math.floor(core)
-                            threshold -= 1
-                        else:
-                            round_core = math.ceil(core)
-                # sum_cores += round_core
-                ana_config['core_per_node'] = round_core
-                ana_config['core_per_node_nr'] = core
-                # Compute execution time
-                time_a = ana_config['time_seq'] / (round_nc_nodes * round_core)
-                ana_config['time'] = time_a + data_size / (round_nc_nodes * bandwidth)
-                for k in bandwidths: 
-                    # bandwidth_bw = bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes * num_nc_anas)
-                    ana_config['time_' + str(k)] = time_a + data_size / (round_nc_nodes * bandwidths[k] )
-                # print(sim, ana, core, round_core, time_a)
-            # print(f'Sum of cores : {sum_cores}')
-            if threshold > 0:
-                print(f'Not sufficient resource for core allocation in non-co-scheduling')
-                config['unfeasible'] = []
-                # with open(output_file, 'w') as file:
-                #     yaml.dump(config, file)
-                return False
-        else:
-            num_nc_anas = 0
-            for sim in scheduling_config:
-                num_nc_anas += len(scheduling_config[sim])
-            even_cores = math.floor(cores / num_nc_anas)
-            num_anas_ru = cores - even_cores * num_nc_anas
-            num_anas_rd = num_nc_anas - num_anas_ru
-            for sim in scheduling_config:
-                data_size = simulations_config[sim]['data']
-                for ana in scheduling_config[sim]:
-                    ana_config = simulations_config[sim]['coupling'][ana]
-                    if num_anas_rd > 0:
-                        ana_config['core_per_node'] = even_cores
-                        num_anas_rd -= 1
-                    else: 
-                        ana_config['core_per_node'] = even_cores + 1
-                    time_a = ana_config['time_seq'] / (round_nc_nodes * ana_config['core_per_node'])
-                    ana_config['time'] = time_a + data_size / (round_nc_nodes * bandwidth)
-                    for k in bandwidths:
-                        # bandwidth_bw = bandwidth * (time_s_sum + time_c_sum + time_nc_sum) / (time_nc_sum * nodes * num_nc_anas)
-                        ana_config['time_' + str(k)] = time_a + data_size / (round_nc_nodes * bandwidths[k] )
-
-            
-
-    print('Number of nodes for non-co-scheduling : {}'.format(round_nc_nodes))
-    # round_nc_nodes = nc_nodes
-    # Compute n^{C}
-    c_nodes = nodes - round_nc_nodes
-    print('Number of nodes for co-scheduling : {} '.format(c_nodes))
-    if c_nodes < 1:
-        print(f'Cannot assign zero node for co-scheduling')
-        config['unfeasible'] = []
-        # with open(output_file, 'w') as file:
-        #     yaml.dump(config, file)
-        return False
-        
-    # Co-scheduling
-    
-    if node_heuristic == 'model':
-        c_seq_dict = {}
-        sum_c_nodes_rd = 0
-        num_int_nodes = 0
+                    ana_config['alloc'] = sim
+                    time_c_sum += time_a_seq
+                time_sum += time_a_seq
+            allocation_config[sim]['time_sum'] = time_c_sum
+        logger.debug('time_sum = %s', time_sum)
+        logger.debug('time_nc_sum = %s', time_nc_sum)
+
+        allocation_config['sim0'] = {}
+        allocation_config['sim0']['time_sum'] = time_nc_sum
+        allocation_config['sim0']['node'] = time_nc_sum * nodes / time_sum
         for sim in simulations_config:
-            # print(sim)
-            numerator = simulations_config[sim]['time_seq']
+            time_s_seq = simulations_config[sim]['time_seq']
+            time_c_sum = allocation_config[sim]['time_sum']
+            simulations_config[sim]['core'] = time_s_seq * cores / time_c_sum
             for ana in simulations_config[sim]['coupling']:
                 ana_config = simulations_config[sim]['coupling'][ana]
-                if ana not in scheduling_config[sim]:
-                    numerator += ana_config['time_seq']
-            c_seq_dict[sim] = numerator
-            simulations_config[sim]['time_sum'] = numerator
-            # Node allocation
-            node = numerator * c_nodes / (time_s_sum + time_c_sum)
-            if node.is_integer():
-                num_int_nodes += 1
-            sum_c_nodes_rd += math.floor(node)
-            config['allocations'][sim] = {}
-            config['allocations'][sim]['node'] = node
-
-        sorted_c_seq_dict = sorted(c_seq_dict.items(), key=lambda item: item[1])
-        # print(c_seq_dict)
-        # print(sorted_c_seq_dict)
-        threshold = len(sorted_c_seq_dict) - num_int_nodes - c_nodes + sum_c_nodes_rd
-        # print(threshold)
-        # sum_nodes = 0
-        for sim, numerator in sorted_c_seq_dict:
-            node = config['allocations'][sim]['node']
-            if node.is_integer():
-                round_node = int(node)
-            else: 
-                if node < 1:
-                    round_node = math.ceil(node)
+                time_a_seq = ana_config['time_seq']
+                if ana in scheduling_config[sim]:
+                    ana_config['core'] = time_a_seq * cores / time_nc_sum
                 else:
-                    if threshold > 0:
-                        round_node = math.floor(node)
-                        threshold -= 1
-                    else:
-                        round_node = math.ceil(node)
-            # sum_nodes += round_node
-            config['allocations'][sim]['node'] = round_node
-            config['allocations'][sim]['node_nr'] = node
-            # config['allocations'][sim]['node_nr'] = node
-            # print(sim, node, round_node)  
-        # print('Sum of nodes: {}'.format(sum_nodes))
-        if threshold > 0:
-            print(f'Not sufficient resource for node allocation in co-scheduling')
-            config['unfeasible'] = []
-            # with open(output_file, 'w') as file:
-            #     yaml.dump(config, file)
-            return False
-    else:
-        # node_heuristic == 'even'
-        even_nodes = math.floor(c_nodes / num_sims)
-        num_allocs_ru = c_nodes - even_nodes * num_sims
-        num_allocs_rd = num_sims - num_allocs_ru
-        for sim in simulations_config:
-            config['allocations'][sim] = {}
-            if num_allocs_rd > 0:
-                config['allocations'][sim]['node'] = even_nodes
-                num_allocs_rd -= 1
-            else:
-                config['allocations'][sim]['node'] = even_nodes + 1
-
-    if core_heuristic == 'model':
-        for sim in simulations_config:
-            num_int_cores = 0
-            numerator = simulations_config[sim]['time_sum']
-            core = simulations_config[sim]['time_seq'] * cores / numerator
-            simulations_config[sim]['core_per_node'] = core
-            if core.is_integer():
-                num_int_cores += 1
-            sim_seq_dict = {}
-            sim_seq_dict[sim + '_'] = (simulations_config[sim]['time_seq'],core)
-            # Core allocation
-            sum_sim_rd = math.floor(core)
+                    ana_config['core'] = time_a_seq * cores / time_c_sum
+            allocation_config[sim]['node'] = time_c_sum * nodes / time_sum
+
+        allocs = list(allocation_config.keys())
+        round_nodes, feasible = engine.apportion([allocation_config[alloc]['node'] for alloc in allocs], nodes)
+        if not feasible.all():
+            logger.warning('Not sufficient resource for node allocation')
+            return None
+        for alloc, round_node in zip(allocs, round_nodes.tolist()):
+            allocation_config[alloc]['original_node'] = allocation_config[alloc]['node']
+            allocation_config[alloc]['node'] = round_node
+
+        # One group of components per co-scheduling allocation, plus one group for sim0
+        core_configs = []
+        groups = []
+        for i, sim in enumerate(simulations_config):
+            core_configs.append(simulations_config[sim])
+            groups.append(i)
             for ana in simulations_config[sim]['coupling']:
                 ana_config = simulations_config[sim]['coupling'][ana]
-                if ana not in scheduling_config[sim]:
-                    core = ana_config['time_seq'] * cores / numerator
-                    if core.is_integer():
-                        num_int_cores += 1
-                    sum_sim_rd += math.floor(core)
-                    ana_config['core_per_node'] = core
-                    sim_seq_dict[sim + '_' + ana] = (ana_config['time_seq'],core)
-                    
-            # print(sim_seq_dict.items())
-            sorted_sim_seq_dict = sorted(sim_seq_dict.items(), key=lambda item: item[1][0])
-            # print(sorted_sim_seq_dict)
-            sub_threshold = len(sorted_sim_seq_dict) - num_int_cores - cores + sum_sim_rd 
-            # print(sub_threshold)
-            # sum_sub_cores = 0
-            for sim_ana, time_seq in sorted_sim_seq_dict:
-                sim, ana = sim_ana.split('_')
-                # print(sim, ana)
-                core = time_seq[1]
-                if not ana:
-                    core_per_node = simulations_config[sim] 
-                    # core = simulations_config[sim]['core_per_node']
+                if ana in scheduling_config[sim]:
+                    groups.append(len(simulations_config))
                 else:
-                    core_per_node = simulations_config[sim]['coupling'][ana]
-                    # core = simulations_config[sim]['coupling'][ana]['core_per_node']
-                if core.is_integer():
-                    round_core = int(core)
+                    groups.append(i)
+                core_configs.append(ana_config)
+        round_cores, feasible = engine.apportion([core_config['core'] for core_config in core_configs], cores, groups)
+        if not feasible.all():
+            logger.warning('Not sufficient resource for core allocation')
+            return None
+        for core_config, round_core in zip(core_configs, round_cores.tolist()):
+            core_config['original_core'] = core_config['core']
+            core_config['core'] = round_core
+
+        return config
+
+    @instrument.timed('feasible')
+    def feasible(self, allocation):
+        """
+        Check whether a resource allocation is feasible
+
+        Args:
+            allocation: feasible engine.Allocation
+
+        Returns:
+            list of co-scheduling allocations that cannot be sustained
+
+        """
+        ensemble = self.ensemble
+        mask = allocation.mask
+        # Check if the memory of every allocation is sufficient
+        mem_remain_c = self.mem * allocation.node - ensemble.mem - np.bincount(ensemble.member, weights=np.where(mask, 0, ensemble.ana_mem), minlength=len(ensemble.simulations))
+        # and of every staging partition
+        mem_remain_nc = [nc_node * self.mem - engine.sequential_sum(ensemble.ana_mem[mask & (allocation.staging == k)])
+                         for k, nc_node in enumerate(allocation.stage_node.tolist())]
+
+        uf_allocs = [sim for sim, remain in zip(ensemble.simulations, mem_remain_c.tolist()) if remain < 0]
+        if any(remain < 0 for remain in mem_remain_nc):
+            uf_allocs.append('sim0')
+        return uf_allocs
+
+    def checkpoint_key(self, *search):
+        """
+        Key of the checkpoints of a search: its mode and parameters, and the ensemble.
+        """
+        if self.robustness is not None:
+            search += (self.robustness.key,)
+        return search + (self.ensemble.digest,)
+
+    def score(self, allocation):
+        """
+        Objective of the searches for a feasible allocation: its makespan, or the quantile
+        of its makespan over the cost samples of `robustness`.
+        """
+        if self.robustness is None:
+            return allocation.makespan
+        return self.robustness.score(allocation)
+
+    def report(self, allocation):
+        """
+        Print the mean, p95 and p99 makespans of an allocation over the cost samples.
+        """
+        if self.robustness is not None:
+            summary = self.robustness.summary(*allocation_times(allocation), self.ensemble.steps)
+            print(f'Sampled makespan: mean {summary["mean"]}, p95 {summary["p95"]}, p99 {summary["p99"]}')
+
+    def heuristic(self, heuristic='increasing', node_heuristic='model', core_heuristic='model', log_prefix='log.', rng=random, budget=None):
+        """
+        Perform co-scheduling various heuristics. From schedule -> allocate -> feasible
+
+        Args:
+            heuristic: either 'increasing' or 'decreasing' or 'random' or 'brute-force' (see exact())
+                or 'annealing' (see local_search())
+            node_heuristic: either 'model', 'even' or 'exact'
+            core_heuristic: either 'model', 'even' or 'exact'
+            log_prefix: every feasible scheduling is written to <log_prefix><heuristic><count>, None to disable
+            rng: random number generator of the 'random' heuristic
+            budget: search.Budget, the search stops with the best scheduling found so far when
+                it expires and resumes from its checkpoint (unlimited if None)
+
+        Returns:
+            feasible engine.Allocation with the minimal makespan, None if there is none
+
+        """
+        budget = budget or search.Budget()
+        if heuristic == 'brute-force':
+            return self.exact(node_heuristic, core_heuristic, log_prefix, budget)
+        if heuristic == 'annealing':
+            return self.local_search(node_heuristic, core_heuristic, log_prefix=log_prefix, budget=budget)
+        # The in-transit set only grows: allocate it incrementally
+        allocator = engine.IncrementalAllocator(self.ensemble, node_heuristic, core_heuristic)
+        cursor = None
+        unfeasible = []
+        best = None
+        count = 1
+
+        def state():
+            return {'added': list(allocator.added), 'cursor': cursor, 'unfeasible': unfeasible, 'count': count,
+                    'best': best.in_transit.tolist() if best else None, 'rng': rng.getstate()}
+
+        key = self.checkpoint_key(heuristic, node_heuristic, core_heuristic)
+        saved = budget.load(key)
+        if saved is not None:
+            allocator.add(saved['added'])
+            cursor, unfeasible, count = saved['cursor'], saved['unfeasible'], saved['count']
+            if saved['best'] is not None:
+                best = self.allocate(np.array(saved['best'], dtype=int), node_heuristic, core_heuristic)
+            rng.setstate(saved['rng'])
+            print(f'Resumed from {budget.checkpoint_file}')
+        while True :
+            if budget.expired():
+                budget.checkpoint(key, state, force=True)
+                print(f'Time limit reached')
+                break
+            budget.checkpoint(key, state)
+            allocation = None
+            if cursor is None:
+                # Start from the ideal scheduling
+                cursor = {}
+                allocation = allocator.allocate()
+            else:
+                picked = self._pick(allocator.mask, unfeasible, heuristic, rng, cursor)
+                if picked is not None:
+                    allocator.add(picked)
+                    allocation = allocator.allocate()
+            if allocation is None:
+                print(f'Not able to schedule further')
+                budget.clear()
+                break
+
+            instrument.count('candidates')
+            unfeasible = []
+            if allocation.feasible:
+                unfeasible = self.feasible(allocation)
+                logger.debug('Unfeasible allocations: %s', unfeasible)
+                if not unfeasible:
+                    makespan = allocation.makespan
+                    logger.info('Schedule is feasible, makespan: %s', makespan)
+                    self.report(allocation)
+                    if log_prefix:
+                        config = allocation.to_config()
+                        config['unfeasible'] = unfeasible
+                        write_config(config, log_prefix + heuristic + str(count))
+                    count += 1
+                    if best is None or self.score(allocation) < self.score(best):
+                        best = allocation
                 else:
-                    if core < 1:
-                        round_core = math.ceil(core)
-                    else:
-                        if sub_threshold > 0:
-                            round_core = math.floor(core)
-                            sub_threshold -= 1
-                        else:   
-                            round_core = math.ceil(core)
-                # print(sub_threshold)
-                
-                # sum_sub_cores += round_core
-                core_per_node['core_per_node'] = round_core
-                core_per_node['core_per_node_nr'] = core
-                core_per_node['time'] = core_per_node['time_seq'] / (config['allocations'][core_per_node['alloc']]['node'] * round_core)
-                # core_per_node['time_nrc'] = core_per_node['time_seq'] / (config['allocations'][core_per_node['alloc']]['node'] * core)
-                # core_per_node['time_nrnc'] = core_per_node['time_seq'] / (config['allocations'][core_per_node['alloc']]['node_nr'] * core)
-            # print(f'Sum of cores of allocation {sim}: {sum_sub_cores}')
-            if sub_threshold > 0:
-                print(f'Not sufficient resource for core allocations in co-scheduling')
+                    instrument.count('infeasible')
+            else:
+                instrument.count('infeasible')
+                logger.debug('%s', allocation.message)
+
+        print(f'Minimal makespan: {best.makespan if best else float("inf")}')
+        if best:
+            self.report(best)
+        return best
+
+    def exact(self, node_heuristic='model', core_heuristic='model', log_prefix='log.', budget=None):
+        """
+        Find the in-transit set with the minimal makespan with a branch-and-bound search
+        (see search.branch_and_bound()), seeded with the co-scheduling scenarios.
+
+        Args:
+            node_heuristic: either 'model', 'even' or 'exact'
+            core_heuristic: either 'model', 'even' or 'exact'
+            log_prefix: every improving scheduling is written to <log_prefix>brute-force<count>, None to disable
+            budget: search.Budget, see heuristic()
+
+        Returns:
+            feasible engine.Allocation with the minimal makespan, None if there is none
+
+        """
+        count = 1
+
+        def log(allocation):
+            nonlocal count
+            print(f'Schedule is feasible, makespan: {allocation.makespan}')
+            self.report(allocation)
+            if log_prefix:
+                config = allocation.to_config()
                 config['unfeasible'] = []
-                # with open(output_file, 'w') as file:
-                #     yaml.dump(config, file)
-                return False
-    else:
-        # core_heuristic == 'even'
-        for sim in simulations_config:
-            num_comps = 1 + len(simulations_config[sim]['coupling'].keys()) - len(scheduling_config[sim])
-            # print(f'num_comps of {sim} = {num_comps}')
-            even_cores = math.floor(cores / num_comps)
-            num_comps_ru = cores - even_cores * num_comps
-            num_comps_rd = num_comps - num_comps_ru - 1
-            simulations_config[sim]['core_per_node'] = even_cores
-            simulations_config[sim]['time'] = simulations_config[sim]['time_seq'] / (config['allocations'][sim]['node'] * even_cores)
-            for ana in simulations_config[sim]['coupling']:
-                ana_config = simulations_config[sim]['coupling'][ana]
-                if ana not in scheduling_config[sim]:
-                    if num_comps_rd > 0:
-                        ana_config['core_per_node'] = even_cores
-                        num_comps_rd -= 1
+                write_config(config, log_prefix + 'brute-force' + str(count))
+            count += 1
+
+        budget = budget or search.Budget()
+        key = self.checkpoint_key('brute-force', node_heuristic, core_heuristic)
+        result = search.branch_and_bound(self, node_heuristic, core_heuristic, self.scenarios(), on_improve=log, budget=budget, key=key)
+        print(f'Explored {result.nodes} nodes, pruned {result.pruned}, allocated {result.evaluated} in-transit sets')
+        if budget.expired():
+            print(f'Time limit reached')
+        else:
+            budget.clear()
+        label = 'makespan' if self.robustness is None else f'{self.robustness.quantile} quantile of the makespan'
+        if result.optimal:
+            print(f'Minimal {label}: {self.score(result.best)} (optimal)')
+        elif result.best is not None:
+            print(f'Minimal {label}: {self.score(result.best)} (lower bound {result.bound})')
+        if result.best is not None:
+            self.report(result.best)
+        else:
+            print('sim0 has no feasible scheduling')
+            print(f'Minimal makespan: {float("inf")}')
+        return result.best
+
+    def local_search(self, node_heuristic='model', core_heuristic='model', restarts=None, iterations=2000, seed=0, processes=None, log_prefix='log.', budget=None):
+        """
+        Search the in-transit set with the minimal makespan by simulated annealing (see
+        search.anneal()), with restarts in a process pool. Restart k starts from one of
+        the co-scheduling scenarios and uses the seed seed + k.
+
+        Args:
+            node_heuristic: either 'model', 'even' or 'exact'
+            core_heuristic: either 'model', 'even' or 'exact'
+            restarts: number of restarts (number of CPUs if None)
+            iterations: number of moves per restart
+            seed: seed of the first restart
+            processes: number of worker processes (number of CPUs if None)
+            log_prefix: the best scheduling is written to <log_prefix>annealing1, None to disable
+            budget: search.Budget, restarts stop at its deadline and the completed ones are
+                checkpointed (see heuristic())
+
+        Returns:
+            feasible engine.Allocation with the minimal makespan, None if there is none
+
+        """
+        budget = budget or search.Budget()
+        if restarts is None:
+            restarts = multiprocessing.cpu_count()
+        key = self.checkpoint_key('annealing', node_heuristic, core_heuristic, restarts, iterations, seed)
+        # Results of the completed restarts
+        completed = budget.load(key) or {}
+        if completed:
+            print(f'Resumed from {budget.checkpoint_file}')
+        results = dict(completed)
+        starts = self.scenarios()
+        tasks = [(k, starts[k % len(starts)], node_heuristic, core_heuristic, iterations, seed + k, budget.deadline) for k in range(restarts) if k not in completed]
+        if tasks and not budget.expired():
+            with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self, instrument.enabled())) as pool:
+                for k, in_transit, makespan, finished, recorded in pool.imap_unordered(_anneal, tasks):
+                    instrument.merge(recorded)
+                    results[k] = (in_transit, makespan)
+                    if finished:
+                        completed[k] = (in_transit, makespan)
+                        budget.checkpoint(key, lambda: completed, force=True)
+                    if budget.expired():
+                        break
+        if len(completed) == restarts:
+            budget.clear()
+        else:
+            print(f'Time limit reached')
+        if not results:
+            print(f'Minimal makespan: {float("inf")}')
+            return None
+        for k, (in_transit, makespan) in sorted(results.items()):
+            print(f'Restart {k}: {"makespan" if self.robustness is None else "objective"} {makespan}')
+        in_transit, makespan = min(results.values(), key=lambda result: result[1])
+        if makespan == float('inf'):
+            print(f'Minimal makespan: {float("inf")}')
+            return None
+        # Same allocation as the one the restart scored (see search.anneal())
+        best = self.allocate(in_transit, node_heuristic, core_heuristic)
+        if not best.feasible or self.feasible(best):
+            print(f'Minimal makespan: {float("inf")}')
+            return None
+        print(f'Minimal makespan: {best.makespan}')
+        self.report(best)
+        if log_prefix:
+            config = best.to_config()
+            config['unfeasible'] = []
+            write_config(config, log_prefix + 'annealing1')
+        return best
+
+    def scenarios(self):
+        """
+        In-transit sets of the ideal, transit, increasing and decreasing scenarios, used to
+        seed the searches.
+        """
+        scenarios = [('ideal', None), ('transit', None)] + [(scenario, ratio) for scenario in ['increasing', 'decreasing'] for ratio in [0.25, 0.5, 0.75]]
+        return [self.ensemble.in_transit(self.pick_analyses(scenario, ratio)) for scenario, ratio in scenarios]
+
+    def pick_analyses(self, scenario='ideal', ratio=None):
+        """
+        Pick the analyses that are not co-scheduled in a co-scheduling scenario
+
+        Args:
+            scenario: either 'ideal', 'transit', 'increasing' or 'decreasing'
+            ratio: fraction of analyses picked by 'increasing' and 'decreasing'
+
+        Returns:
+            'non-co-scheduling' mapping from simulations to their in-transit analyses,
+            None if the ratio is missing
+
+        """
+        simulations_config = self.simulations_config
+        scheduling_config = self.ideal()
+        if scenario != 'ideal':
+            if (scenario == 'increasing' or scenario == 'decreasing') and ratio is None:
+                print(f'Please specify the ratio for {scenario}')
+                return None
+            anas = []
+            for sim in simulations_config:
+                for ana in simulations_config[sim]['coupling']:
+                    anas.append((sim, ana))
+            # print(anas)
+            if scenario == 'transit':
+                picked_anas = anas
+            if scenario == 'increasing':
+                k = int(len(anas) * float(ratio))
+                picked_anas = sorted(anas, key=lambda x: simulations_config[x[0]]['coupling'][x[1]]['flop'])[:k]
+
+            if scenario == 'decreasing':
+                k = int(len(anas) * float(ratio))
+                picked_anas = sorted(anas, key=lambda x: simulations_config[x[0]]['coupling'][x[1]]['flop'], reverse=True)[:k]
+
+            for sim,ana in picked_anas:
+                scheduling_config[sim].append(ana)
+        return scheduling_config
+
+    def coschedule(self, scenario='ideal', ratio=None, heuristics=('model',), near=False, output=True, exact=False):
+        """
+        Generate full configurations for a co-scheduling scenario
+
+        Args:
+            scenario: see pick_analyses()
+            ratio: see pick_analyses()
+            heuristics: node and core heuristics
+            near: also compute the near allocation
+            output: write <scenario><ratio>_<node_heuristic>_<core_heuristic>.conf files
+            exact: also compute the integer allocation with the minimal makespan
+                ('exact' node and core heuristics) and report its gain over the heuristics
+
+        Returns:
+            dict mapping (node_heuristic, core_heuristic) to engine.Allocation
+
+        """
+        scheduling_config = self.pick_analyses(scenario, ratio)
+        if scheduling_config is None:
+            return {}
+        in_transit = self.ensemble.in_transit(scheduling_config)
+
+        output_file = scenario
+        if ratio:
+            output_file += str(ratio)
+        allocations = {}
+        for node_heuristic in heuristics:
+            for core_heuristic in heuristics:
+                print(f'node_heuristic = {node_heuristic}, core_heuristic = {core_heuristic}')
+                allocation = self.allocate(in_transit, node_heuristic, core_heuristic)
+                allocations[(node_heuristic, core_heuristic)] = allocation
+                if allocation.feasible:
+                    if output:
+                        write_config(allocation.to_config(), f'{output_file}_{node_heuristic}_{core_heuristic}.conf')
+                    print('Feasible to allocate')
+                    print(f'Makespan: {allocation.makespan} (pipelined: {allocation.makespan_pipelined})')
+                    self.report(allocation)
+                else:
+                    print(allocation.message)
+        if exact:
+            allocation = self.allocate(in_transit, 'exact', 'exact')
+            allocations[('exact', 'exact')] = allocation
+            if allocation.feasible:
+                if output:
+                    write_config(allocation.to_config(), f'{output_file}_exact_exact.conf')
+                print(f'Exact allocation makespan: {allocation.makespan} (pipelined: {allocation.makespan_pipelined})')
+                for (node_heuristic, core_heuristic), other in allocations.items():
+                    if (node_heuristic, core_heuristic) == ('exact', 'exact'):
+                        continue
+                    if other.feasible:
+                        gain = other.makespan - allocation.makespan
+                        print(f'Gain over {node_heuristic}/{core_heuristic}: {gain} ({100 * gain / other.makespan:.2f}%)')
                     else:
-                        ana_config['core_per_node'] = even_cores + 1
-                    ana_config['time'] = ana_config['time_seq'] / (config['allocations'][ana_config['alloc']]['node'] * ana_config['core_per_node'])
-
-    start_node = 0
-    for sim in simulations_config:
-        allocation_config = config['allocations'][sim]
-        round_node = allocation_config['node']
-        if round_node > 0:
-            allocation_config['start'] = start_node
-            start_node += round_node
-            allocation_config['end'] = start_node - 1
-
-    # Need to fix start and end node when rounding heristic is finalized
-    # config['allocations']['sim0'] = {}
-    config['allocations']['sim0']['node'] = round_nc_nodes
-    if round_nc_nodes > 0:
-        config['allocations']['sim0']['start'] = start_node
-        config['allocations']['sim0']['end'] = start_node + round_nc_nodes - 1
-
-    # # Execution time and makespan
-    makespan = float('-inf')
-    makespans = {k:float('-inf') for k in [1,2,3]}
-    for sim in simulations_config:
-    #     time_s = simulations_config[sim]['time_seq'] / (config['allocations'][sim]['node'] * simulations_config[sim]['core_per_node'])
-        time_s = simulations_config[sim]['time']
-    #     data_size = simulations_config[sim]['data']
-        if time_s > makespan:
-            makespan = time_s
-        for k in makespans:
-            if time_s > makespans[k]:
-                makespans[k] = time_s
-        for ana in simulations_config[sim]['coupling']:
-            ana_config = simulations_config[sim]['coupling'][ana]
-    #         ana_alloc = ana_config['alloc']
-    #         time_a = ana_config['time_seq'] / (config['allocations'][ana_alloc]['node'] * ana_config['core_per_node'])
-    #         if ana_alloc == 'sim0':
-    #             time_a +=  data_size / (config['allocations'][ana_alloc]['node'] * bandwidth)
-            time_a = ana_config['time']
-            if time_a > makespan:
-                makespan = time_a
-            for k in makespans:
-                if 'time_' + str(k) in ana_config:
-                    time_a = ana_config['time_' + str(k)]
-                if time_a > makespans[k]:
-                    makespans[k] = time_a
-            
-    config['makespan'] = makespan * config['steps']
-    for k in makespans:
-        config['makespan_' + str(k)] = makespans[k] * config['steps']
-
-    # print(simulations_config)
-    if output_file:
-        with open(output_file, 'w') as out_file:
-            yaml.dump(config, out_file)
-    
-    return True
-
-def feasible(output_file): 
-    """
-    Returns: list of co-scheduling allocations that cannot be sustained
-
-    Check whether a resource allocation is feasible
-        
-    Parameter config_file:
-    Parameter output_file:
-    """ 
-
-    # with open(config_file, 'r') as file:
-    #     config = yaml.safe_load(file)
-    # simulations_config = config['simulations']
-    scheduling_config = config['non-co-scheduling']
-    allocations_config = config['allocations']
-    # mem = config['memory']
-
-    # Check if the configuration is feasible  
-    uf_allocs = []
-    mem_remain_nc = allocations_config['sim0']['node'] * mem
-    for sim in simulations_config:
-        
-        sim_alloc = simulations_config[sim]['alloc']
-        node = allocations_config[sim_alloc]['node']
-        mem_remain_c = mem * node - simulations_config[sim]['mem']
-        for ana in simulations_config[sim]['coupling']:
-            ana_config = simulations_config[sim]['coupling'][ana]
-            if ana_config['alloc'] == sim_alloc:
-                mem_remain_c -= ana_config['mem']
+                        print(f'Gain over {node_heuristic}/{core_heuristic}: feasible while the heuristic allocation is not')
             else:
-                mem_remain_nc -= ana_config['mem']
-        if mem_remain_c < 0:
-            uf_allocs.append(sim)
-    if mem_remain_nc < 0:
-        uf_allocs.append('sim0')
-
-    config['unfeasible'] = uf_allocs
-    if output_file:
-        with open(output_file, 'w') as file:
-            yaml.dump(config, file)
-    
-    print(uf_allocs)
-    return uf_allocs, config['makespan']
-
-def heuristic(heuristic='increasing'):
-    """
-    Perform co-scheduling various heuristics. From schedule -> allocate -> feasible
-        
-    Parameter heuristic: either 'increasing' or 'decreasing' or 'random' or 'brute-force'
-    """
-
-    k = 1
-    output_fn = 'log.schedule' + str(k)  
-    min_makespan = float('inf')
-    count = 1
-    while True :
-        # print(f'schedule : {input_fn} -> {output_fn}')
-        if not schedule(None, heuristic):
-            print(f'Not able to schedule further')
-            break
-
-        output_fn = 'log.allocate' + str(k)
-        # print(f'allocate {method}: {input_fn} -> {output_fn}')
-        if allocate(None):
-            # print(f'feasible: ')
-            unfeasible, makespan = feasible(None)
-            if not unfeasible:
-                print(f'Schedule is feasible, makespan: {makespan}')
-                with open('log.' + heuristic + str(count), 'w') as file:
-                    yaml.dump(config, file)
-                count += 1
-                if makespan < min_makespan:
-                    min_makespan = makespan
-                # break
-
-        k += 1
-        output_fn = 'log.schedule' + str(k)
-        print('\n')
-
-    print(f'Minimal makespan: {min_makespan}')  
-
-def test(cosched_config):
+                print(allocation.message)
+        if near:
+            config = self.near_allocate(scheduling_config)
+            if config is not None:
+                if output:
+                    write_config(config, output_file + 'near.conf')
+                print(f'Feasible to near allocate')
+        return allocations
+
+    def sweep(self, scenarios=('ideal', 'transit', 'increasing', 'decreasing'), ratios=(0.25, 0.5, 0.75), heuristics=('model', 'even'), processes=None, summary_file='summary.csv', store=None):
+        """
+        Schedule various co-scheduling scenarios in parallel
+
+        Every (scenario, ratio, node_heuristic, core_heuristic) cell of the grid is allocated
+        in a process pool, which writes <scenario><ratio>_<node_heuristic>_<core_heuristic>.conf
+        for every feasible cell. Cells with the same in-transit analyses in the same scheduling
+        order and the same heuristics are allocated once. With a store, the
+        allocations of every cell are written to a results.ResultStore instead of .conf files.
+
+        Args:
+            scenarios: co-scheduling scenarios, see pick_analyses()
+            ratios: ratios of the 'increasing' and 'decreasing' scenarios
+            heuristics: node and core heuristics
+            processes: number of worker processes (number of CPUs if None)
+            summary_file: CSV table of the makespans of every cell
+            store: path of the results.ResultStore (<store>.yml and <store>.npz), None to
+                write .conf files
+
+        Returns:
+            list of summary rows
+
+        """
+        # Cells grouped by the key of their allocation
+        tasks = {}
+        cells = []
+        for scenario in scenarios:
+            for ratio in (ratios if scenario in ['increasing', 'decreasing'] else [None]):
+                in_transit = self.ensemble.in_transit(self.pick_analyses(scenario, ratio))
+                name = scenario + (str(ratio) if ratio else '')
+                for node_heuristic in heuristics:
+                    for core_heuristic in heuristics:
+                        key = AllocationCache.key(self.ensemble, in_transit, node_heuristic, core_heuristic)
+                        task = tasks.setdefault(key, (in_transit, [], node_heuristic, core_heuristic, store is None))
+                        task[1].append(f'{name}_{node_heuristic}_{core_heuristic}.conf')
+                        cells.append((scenario, ratio, node_heuristic, core_heuristic, key, in_transit))
+        print(f'Allocating {len(tasks)} distinct in-transit sets for {len(cells)} cells')
+
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self, instrument.enabled())) as pool:
+            results = {}
+            for key, result in zip(tasks, pool.map(_sweep_allocate, tasks.values())):
+                # The last entry is what the worker recorded
+                instrument.merge(result[-1])
+                results[key] = result[:-1]
+
+        rows = []
+        if store is not None:
+            result_store = ResultStore(self.ensemble, store)
+        for scenario, ratio, node_heuristic, core_heuristic, key, in_transit in cells:
+            feasible, makespan, makespans, makespan_pipelined, message, allocation = results[key]
+            if store is not None:
+                allocation = copy.copy(allocation)
+                allocation.ensemble = self.ensemble
+                allocation.in_transit = in_transit
+                result_store.add(f'{scenario}{ratio if ratio else ""}_{node_heuristic}_{core_heuristic}', allocation)
+            if not feasible:
+                print(f'{scenario} {ratio} {node_heuristic} {core_heuristic}: {message}')
+                makespan = ''
+                makespans = ['', '', '']
+                makespan_pipelined = ''
+            rows.append([scenario, ratio if ratio else '', node_heuristic, core_heuristic, feasible, makespan] + makespans + [makespan_pipelined])
+        if summary_file:
+            with open(summary_file, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['scenario', 'ratio', 'node_heuristic', 'core_heuristic', 'feasible', 'makespan', 'makespan_1', 'makespan_2', 'makespan_3', 'makespan_pipelined'])
+                writer.writerows(rows)
+        if store is not None:
+            result_store.write()
+        return rows
+
+
+def _init_worker(scheduler, profile=False):
+    global worker_scheduler
+    # Workers are forked with the handlers of search.Budget: let the pool terminate them and
+    # leave interruptions to the main process
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_scheduler = scheduler
+    # Every task returns what it recorded (see instrument.collect()) for the parent to merge
+    instrument.enable(profile)
+    instrument.reset()
+
+def _allocate(scheduling_config, node_heuristic, core_heuristic):
+    return worker_scheduler.allocate(scheduling_config, node_heuristic, core_heuristic), instrument.collect()
+
+def _anneal(task):
+    k, start, node_heuristic, core_heuristic, iterations, seed, deadline = task
+    in_transit, makespan = search.anneal(worker_scheduler, start, node_heuristic, core_heuristic, iterations, seed, deadline=deadline)
+    # A restart stopped by the deadline is not completed
+    return k, in_transit, makespan, deadline is None or time.time() < deadline, instrument.collect()
+
+def _sweep_allocate(task):
     """
-    Test
+    Allocate cells of the sweep grid with the same in-transit analyses in a worker process
+    and write their configurations
     """
-    config['non-co-scheduling'] = cosched_config
-
-    if allocate(None, None):
-        # print(f'feasible: ')
-        unfeasible, makespan = feasible(None, None)
-        if not unfeasible:
-            print(f'Schedule is feasible, makespan: {makespan}')
-            with open('log.test', 'w') as file:
-                yaml.dump(config, file)
-
-def coschedule(scenario='ideal', ratio=None, heuristics=['model'], near=False):
-    """
-    Generate full configurations for a co-scheduling scenario
-        
-    Args:
-        scenario:
-        ratio:
-        heuristics:
-        near:
-
-    Returns: 
-
-    """ 
-
-    config['non-co-scheduling'] = {}
-    for sim in simulations_config:
-        config['non-co-scheduling'][sim] = []
-    if scenario != 'ideal':
-        if (scenario == 'increasing' or scenario == 'decreasing') and ratio is None:
-            print(f'Please specify the ratio for {scenario}')
-            return    
-        anas = []
-        for sim in simulations_config:
-            for ana in simulations_config[sim]['coupling']:
-                ana_config = simulations_config[sim]['coupling'][ana]
-                anas.append((sim, ana))
-        # print(anas)
-        if scenario == 'transit':
-            picked_anas = anas
-        if scenario == 'increasing':
-            k = int(len(anas) * float(ratio))
-            picked_anas = sorted(anas, key=lambda x: simulations_config[x[0]]['coupling'][x[1]]['flop'])[:k]
-            
-        if scenario == 'decreasing':
-            k = int(len(anas) * float(ratio))
-            picked_anas = sorted(anas, key=lambda x: simulations_config[x[0]]['coupling'][x[1]]['flop'], reverse=True)[:k]
-        
-        for sim,ana in picked_anas:
-            config['non-co-scheduling'][sim].append(ana)
-
-    output_file = scenario
-    if ratio: 
-        output_file += ratio
-    # heuristics = ['model','even']
-    for node_heuristic in heuristics:
-        for core_heuristic in heuristics:
-            print(f'node_heuristic = {node_heuristic}, core_heuristic = {core_heuristic}')
-            if allocate(f'{output_file}_{node_heuristic}_{core_heuristic}.conf', node_heuristic=node_heuristic, core_heuristic=core_heuristic):
-                print('Feasible to allocate')
-                print(f'Makespan: {config["makespan"]}')
-                # with open(output_file, 'w') as file:
-                #     yaml.dump(config, file)
-            if near:
-                output_file += 'near'
-                if near_allocate(output_file + '.conf'):
-                    print(f'Feasible to near allocate')
-
-def schedule():
-    """
-    Schedule various co-scheduling scenarios
-        
-    Args: 
-
-    Returns: 
-
-    """ 
-    scenarios = ['ideal', 'increasing', 'decreasing', 'transit']
-    ratios = [0.25, 0.5, 0.75]
-    heuristics = ['model', 'even']
-    for scenario in scenarios:
-        if scenario in ['increasing', 'decreasing']:
-            for ratio in ratios:
-                print(f'{scenario} {ratio}')
-                coschedule(scenario, ratio, heuristics=heuristics)
-        else:
-            print(f'{scenario}')
-            coschedule(scenario, heuristics=heuristics)
-    print('\n')
+    in_transit, output_files, node_heuristic, core_heuristic, write = task
+    allocation = worker_scheduler.allocate(in_transit, node_heuristic, core_heuristic)
+    if not write:
+        return allocation.feasible, allocation.makespan, allocation.makespans, allocation.makespan_pipelined, allocation.message, allocation, instrument.collect()
+    if allocation.feasible:
+        config = allocation.to_config()
+        for output_file in output_files:
+            write_config(config, output_file)
+    return allocation.feasible, allocation.makespan, allocation.makespans, allocation.makespan_pipelined, allocation.message, None, instrument.collect()
 
 if __name__ == "__main__":
     # schedule
-    if len(sys.argv) == 3:
-        coschedule(sys.argv[2])
-    elif len(sys.argv) == 4:
-        coschedule(sys.argv[2], sys.argv[3])
+    parser = argparse.ArgumentParser(usage='python3 scheduler.py <config yaml> <scenario> <ratio> (optional)> | <config yaml> --sweep [options] | <config yaml> --heuristic <heuristic>')
+    parser.add_argument('config')
+    parser.add_argument('scenario', nargs='?')
+    parser.add_argument('ratio', nargs='?')
+    parser.add_argument('--heuristic', choices=['increasing', 'decreasing', 'random', 'brute-force', 'annealing'], help='search a feasible co-scheduling with a heuristic')
+    parser.add_argument('--restarts', type=int, help='number of restarts of annealing')
+    parser.add_argument('--iterations', type=int, default=2000, help='number of moves per restart of annealing')
+    parser.add_argument('--seed', type=int, default=0, help='seed of annealing and of the cost samples')
+    parser.add_argument('--time-limit', type=float, help='wall-clock budget of the heuristic in seconds, the best scheduling found so far is returned when it expires')
+    parser.add_argument('--checkpoint', help='file where the state of the heuristic is saved periodically and resumed from')
+    parser.add_argument('--checkpoint-interval', type=float, default=60, help='seconds between two checkpoints')
+    parser.add_argument('--sweep', action='store_true', help='allocate every scenario, ratio and heuristic in parallel')
+    parser.add_argument('--scenarios', nargs='+', default=['ideal', 'transit', 'increasing', 'decreasing'])
+    parser.add_argument('--ratios', nargs='+', type=float, default=[0.25, 0.5, 0.75])
+    parser.add_argument('--heuristics', nargs='+', default=['model', 'even'], help='node and core heuristics of the sweep (model, even or exact)')
+    parser.add_argument('--exact', action='store_true', help='also compute the exact integer allocation of the scenario and its gain over the model heuristics')
+    parser.add_argument('--processes', type=int, help='number of worker processes of the sweep and annealing')
+    parser.add_argument('--summary', default='summary.csv', help='makespan table written by the sweep')
+    parser.add_argument('--store', help='write the sweep to <store>.yml (ensemble) and <store>.npz (allocations) instead of .conf files')
+    parser.add_argument('--cache', help='directory of the allocation cache shared between runs')
+    parser.add_argument('--platform', help='platform file whose links and routes slow down the in-transit reads')
+    parser.add_argument('--staging', type=int, help='number of staging partitions of the in-transit analyses (sim0, sim0_1, ...)')
+    parser.add_argument('--robust', type=float, nargs='?', const=0.95, help='minimize this quantile of the makespan over sampled costs (0.95 if omitted)')
+    parser.add_argument('--uncertainty', help='YAML spec of the cost distributions of --robust, see robustness.DEFAULT_UNCERTAINTY')
+    parser.add_argument('--samples', type=int, default=10000, help='number of sampled cost vectors')
+    parser.add_argument('--log-level', default='warning', choices=['debug', 'info', 'warning', 'error'], help='level of the diagnostics of the solver written to standard error')
+    parser.add_argument('--profile', help='JSON file of the timing spans and counters of the run (see instrument.py)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(levelname)s %(name)s: %(message)s')
+    if args.profile:
+        instrument.enable()
+
+    network = NetworkModel.from_file(args.platform) if args.platform else None
+    scheduler = Scheduler.from_file(args.config, AllocationCache(directory=args.cache) if args.cache else None, network, args.staging)
+    if args.robust is not None:
+        scheduler.robustness = Robustness(scheduler.config, load_uncertainty(args.uncertainty), args.samples, args.seed, args.robust)
+    scheduler.describe()
+    if args.sweep:
+        scheduler.sweep(args.scenarios, args.ratios, args.heuristics, args.processes, args.summary, args.store)
+    elif args.heuristic:
+        with search.Budget(args.time_limit, args.checkpoint, args.checkpoint_interval) as budget:
+            if args.heuristic == 'annealing':
+                scheduler.local_search(restarts=args.restarts, iterations=args.iterations, seed=args.seed, processes=args.processes, budget=budget)
+            else:
+                scheduler.heuristic(args.heuristic, budget=budget)
+    elif args.scenario:
+        scheduler.coschedule(args.scenario, args.ratio, exact=args.exact)
     else:
-        print('python3 scheduler.py <config yaml> <scenario> <ratio> (optional)>')
+        parser.print_usage()
         sys.exit()
-    
+    if args.profile:
+        instrument.export(args.profile)
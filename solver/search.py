@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Search of the in-transit analyses with the minimal makespan.
+
+branch_and_bound() decides which analyses run in transit in decreasing order of
+sequential time and prunes a partial in-transit set as soon as no completion of it can
+beat the best feasible allocation found so far under any integer allocation of nodes
+and cores. anneal() is a simulated annealing local search for ensembles that are too
+large for an exact search. Both stop within a Budget with the best allocation found so
+far and can resume from a checkpoint.
+"""
+import os
+import math
+import time
+import pickle
+import random
+import signal
+import threading
+import numpy as np
+import engine
+import instrument
+
+
+class Budget:
+    """
+    Wall-clock budget and checkpoints of a search.
+
+    A search polls expired() and stops with the best allocation found so far once the
+    deadline passes, or once SIGTERM or SIGINT is received while the budget is used as a
+    context manager. It hands its state to checkpoint(), which pickles it to the
+    checkpoint file every `interval` seconds and when the search stops, so that an
+    interrupted search resumes from load().
+    """
+
+    def __init__(self, seconds=None, checkpoint_file=None, interval=60):
+        self.deadline = time.time() + seconds if seconds is not None else None
+        self.checkpoint_file = checkpoint_file
+        self.interval = interval
+        self.saved = time.time()
+        self.stopped = False
+        self.handlers = {}
+
+    def __enter__(self):
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                self.handlers[signum] = signal.signal(signum, self.stop)
+        return self
+
+    def __exit__(self, *exc_info):
+        for signum, handler in self.handlers.items():
+            signal.signal(signum, handler)
+        self.handlers = {}
+
+    def stop(self, signum=None, frame=None):
+        self.stopped = True
+
+    def expired(self):
+        return self.stopped or (self.deadline is not None and time.time() >= self.deadline)
+
+    def checkpoint(self, key, state, force=False):
+        """
+        Save the state of a search, at most every `interval` seconds unless forced.
+
+        Args:
+            key: identifies the search (mode, parameters, ensemble)
+            state: function returning the picklable state of the search, only called when saving
+            force: save even if the last checkpoint is recent
+
+        """
+        if self.checkpoint_file is None or (not force and time.time() - self.saved < self.interval):
+            return
+        state = state()
+        # Write to a temporary file first so that an interruption never leaves a truncated checkpoint
+        temporary_file = self.checkpoint_file + '.tmp'
+        with open(temporary_file, 'wb') as file:
+            pickle.dump({'key': key, 'state': state}, file)
+        os.replace(temporary_file, self.checkpoint_file)
+        self.saved = time.time()
+
+    def load(self, key):
+        """
+        State saved by the same search, None if there is none.
+        """
+        if self.checkpoint_file is None or not os.path.exists(self.checkpoint_file):
+            return None
+        with open(self.checkpoint_file, 'rb') as file:
+            checkpoint = pickle.load(file)
+        return checkpoint['state'] if checkpoint['key'] == key else None
+
+    def clear(self):
+        """
+        Remove the checkpoint of a finished search.
+        """
+        if self.checkpoint_file is not None and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+
+class SearchResult:
+    """
+    Outcome of a search over in-transit sets.
+
+    `bound` is a lower bound on the makespan (the objective of a robust search) of every
+    feasible allocation. When `optimal` is True the search covered every in-transit set,
+    so `bound` equals the makespan of `best`: every pruned set was proven to have a larger
+    makespan. A search stopped by its budget is not optimal and only reports the lower
+    bound of the whole ensemble.
+    """
+
+    def __init__(self):
+        self.best = None
+        self.bound = 0
+        self.optimal = False
+        # Search nodes visited, subtrees pruned by the bound and allocations computed
+        self.nodes = 0
+        self.pruned = 0
+        self.evaluated = 0
+
+
+def cores_needed(time_seq, serial, saturation, room, impossible):
+    """
+    Fewest cores (at least one) of a node on which a component of sequential time
+    `time_seq` takes at most `room` under Amdahl's law, `impossible` if no count does.
+    """
+    parallel = room - serial * time_seq
+    if parallel <= 0:
+        return impossible
+    need = max(1, math.ceil((1 - serial) * time_seq / parallel))
+    return need if need <= saturation else impossible
+
+
+class MakespanBound:
+    """
+    Whether a partial in-transit set may reach a time T per step.
+
+    A member with n nodes runs its simulation and co-scheduled analyses within T only if
+    every component j gets c_j >= max(1, t(j) / (T n)) cores with sum c_j <= c, and n *
+    memory covers their memory. An in-transit analysis A on n^NC nodes likewise needs
+    c_A >= max(1, t(A) / (T n^NC - d(A) / B)) of the c in-transit cores. With a serial
+    fraction s, the cores c_j >= (1 - s) t(j) / (T n - s t(j)) must not exceed its
+    saturation count (see cores_needed()).
+
+    For every member and every node count n, a knapsack over the cores of its undecided
+    analyses gives the fewest in-transit cores the member has to ship to fit in n nodes.
+    Members are then combined by their partial sums of shipped cores: F[q, r] is the
+    fewest nodes of a group of members that ship at most q cores to r in-transit nodes.
+    T is reachable only if some r leaves enough nodes. Member tables are memoized by the
+    decisions of their analyses, so a search node only recomputes the member it decides.
+    On a platform with different nodes, every node is taken as fast and as large as the
+    fastest and largest ones, which keeps T a lower bound. With K staging partitions the
+    in-transit analyses share K c cores: an analysis of a partition of n_k <= n^NC nodes
+    needs at least the cores it would need on n^NC nodes. An analysis that runs every k
+    steps takes its time and data amortized over k steps: its runs on one step out of k take
+    at least the number of steps times its amortized time, which keeps T a lower bound.
+    """
+
+    def __init__(self, ensemble):
+        self.ensemble = ensemble
+        self.nodes = ensemble.nodes
+        self.cores = max(cores for _, _, cores, _ in ensemble.partitions)
+        # In-transit cores of every in-transit node, over all the staging partitions
+        self.nc_capacity = self.cores * ensemble.staging
+        self.bandwidth = ensemble.bandwidth
+        self.memory = max(memory for _, _, _, memory in ensemble.partitions)
+        scale = ensemble.speed / max(speed for _, speed, _, _ in ensemble.partitions)
+        num_sims = len(ensemble.simulations)
+        self.num_sims = num_sims
+        # Every member takes at least one node
+        self.nc_nodes = np.arange(max(0, self.nodes - num_sims) + 1)
+        self.max_member_nodes = self.nodes - num_sims + 1
+        self.time_seq = (ensemble.time_seq * scale).tolist()
+        self.mem = ensemble.mem.tolist()
+        self.ana_times = ensemble.ana_time_seq * scale
+        self.ana_time_seq = self.ana_times.tolist()
+        self.ana_mem = ensemble.ana_mem.tolist()
+        self.ana_data = ensemble.ana_data
+        self.serial = ensemble.serial.tolist()
+        self.saturation = ensemble.saturation.tolist()
+        self.ana_serial = ensemble.ana_serial.tolist()
+        self.ana_saturation = ensemble.ana_saturation.tolist()
+        self.shares = np.arange(self.nc_capacity + 1)[:, None]
+        self.columns = np.arange(len(self.nc_nodes))[None, :]
+        # Analyses of every member, by decreasing sequential time
+        self.member_analyses = [sorted(range(first, last), key=lambda j: -self.ana_time_seq[j])
+                                for first, last in zip(ensemble.first.tolist(), ensemble.last.tolist())]
+        # Order in which the member tables are combined
+        self.members = list(range(num_sims))
+        self.time_step = None
+
+    def set_order(self, order):
+        """
+        Combine the members in the order in which a search decides the last of their
+        analyses, so that the decisions that change most often only recompute the last
+        combinations.
+        """
+        last = [-1] * self.num_sims
+        for depth, j in enumerate(order):
+            last[int(self.ensemble.member[j])] = depth
+        self.members = sorted(range(self.num_sims), key=lambda i: last[i])
+        self.combined = [self.empty()]
+        self.combined_keys = []
+
+    def set_time_step(self, time_step):
+        """
+        Prepare the tables of a time per step.
+        """
+        self.time_step = time_step
+        capacity = self.nc_capacity
+        ensemble = self.ensemble
+        room = time_step * self.nc_nodes[None, :] - self.ana_data[:, None] / self.bandwidth
+        room = room - (ensemble.ana_serial * self.ana_times)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            need = np.ceil(((1 - ensemble.ana_serial) * self.ana_times)[:, None] / room)
+        # In-transit cores of every analysis for every number of in-transit nodes, capacity + 1 if it does not fit
+        fits = (room > 0) & (need <= ensemble.ana_saturation[:, None])
+        self.nc_cores = np.where(fits, np.clip(need, 1, capacity + 1), capacity + 1).astype(int)
+        self.tables = [{} for _ in range(self.num_sims)]
+        # Combined tables of members 0..k-1 and the decisions they were combined with
+        self.combined = [self.empty()]
+        self.combined_keys = []
+
+    def empty(self):
+        """
+        Table of no member.
+        """
+        return np.zeros((self.nc_capacity + 1, len(self.nc_nodes)), dtype=int)
+
+    def member_table(self, i, decisions):
+        """
+        Memoized _member_table().
+        """
+        key = tuple(decisions)
+        table = self.tables[i].get(key)
+        if table is None:
+            table = self._member_table(i, decisions)
+            self.tables[i][key] = table
+        return table
+
+    def _member_table(self, i, decisions):
+        """
+        Node counts of member i and the fewest in-transit cores it ships for each of them.
+
+        Args:
+            i: member index
+            decisions: for every analysis of member_analyses[i], True (in transit), False
+                (co-scheduled) or None (undecided)
+
+        Returns:
+            (list of node counts, array of shipped cores per node count and in-transit node count)
+
+        """
+        cores = self.cores
+        time_step = self.time_step
+        kept = [(self.time_seq[i], self.serial[i], self.saturation[i])]
+        kept_mem = self.mem[i]
+        shipped = np.zeros(len(self.nc_nodes), dtype=int)
+        free = []
+        for j, decision in zip(self.member_analyses[i], decisions):
+            if decision is None:
+                free.append(j)
+            elif decision:
+                shipped += self.nc_cores[j]
+            else:
+                kept.append((self.ana_time_seq[j], self.ana_serial[j], self.ana_saturation[j]))
+                kept_mem += self.ana_mem[j]
+        free_nc_cores = self.nc_cores[free]
+        free_total = free_nc_cores.sum(axis=0)
+
+        node_counts = []
+        rows = []
+        n = max(1, math.ceil(sum(time_seq for time_seq, _, _ in kept) / (time_step * cores)), math.ceil(kept_mem / self.memory))
+        while n <= self.max_member_nodes:
+            capacity = cores - sum(cores_needed(time_seq, serial, saturation, time_step * n, cores + 1) for time_seq, serial, saturation in kept)
+            if capacity >= 0:
+                need = [cores_needed(self.ana_time_seq[j], self.ana_serial[j], self.ana_saturation[j], time_step * n, cores + 1) for j in free]
+                if sum(need) <= capacity:
+                    node_counts.append(n)
+                    rows.append(np.minimum(shipped, self.nc_capacity + 1))
+                    break
+                # 0/1 knapsack: the most in-transit cores the member can keep within its capacity
+                best = np.zeros((capacity + 1, len(self.nc_nodes)), dtype=int)
+                for k, size in enumerate(need):
+                    if size <= capacity:
+                        candidate = best[:capacity + 1 - size] + free_nc_cores[k]
+                        best[size:] = np.maximum(best[size:], candidate)
+                node_counts.append(n)
+                rows.append(np.minimum(shipped + free_total - best[capacity], self.nc_capacity + 1))
+            n += 1
+        return node_counts, rows
+
+    def combine(self, table, member):
+        """
+        Add a member to a table of members.
+        """
+        node_counts, rows = member
+        infinity = self.nodes + 1
+        if not node_counts:
+            return np.full_like(table, infinity)
+        # Every node count of the member at once: (node counts, shipped cores, in-transit nodes)
+        index = self.shares[None, :, :] - np.array(rows)[:, None, :]
+        nodes = table[np.maximum(index, 0), self.columns[None, :, :]] + np.array(node_counts)[:, None, None]
+        nodes[index < 0] = infinity
+        return np.minimum(nodes.min(axis=0), infinity)
+
+    def fits(self, decisions, nc_mem):
+        """
+        Whether some completion of the decisions of every member fits in the platform.
+        """
+        keys = [tuple(decisions[i]) for i in self.members]
+        k = 0
+        while k < len(self.combined_keys) and self.combined_keys[k] == keys[k]:
+            k += 1
+        del self.combined_keys[k:]
+        del self.combined[k + 1:]
+        for k in range(k, len(keys)):
+            i = self.members[k]
+            self.combined.append(self.combine(self.combined[k], self.member_table(i, decisions[i])))
+            self.combined_keys.append(keys[k])
+        nodes = self.combined[-1][-1] + self.nc_nodes
+        nodes[self.nc_nodes * self.memory < nc_mem] = self.nodes + 1
+        return bool((nodes <= self.nodes).any())
+
+    def lower_bound(self, upper, tolerance=1e-6):
+        """
+        Lower bound on the makespan of every allocation of the ensemble (bisection on the
+        time per step), below an upper bound.
+        """
+        steps = self.ensemble.steps
+        decisions = [[None] * len(analyses) for analyses in self.member_analyses]
+        lo = 0
+        hi = upper / steps
+        while hi - lo > tolerance * hi:
+            mid = lo + (hi - lo) / 2
+            self.set_time_step(mid)
+            if self.fits(decisions, 0):
+                hi = mid
+            else:
+                lo = mid
+        return lo * steps
+
+
+def branch_and_bound(scheduler, node_heuristic='model', core_heuristic='model', initial=(), on_improve=None, budget=None, key=None):
+    """
+    Find the feasible in-transit set with the minimal makespan, or the minimal objective
+    scheduler.score() with a robust objective: a set is then pruned when its makespan
+    cannot get below the best objective over the scale of scheduler.robustness.
+
+    Args:
+        scheduler: scheduler.Scheduler of the ensemble
+        node_heuristic: either 'model', 'even' or 'exact'
+        core_heuristic: either 'model', 'even' or 'exact'
+        initial: in-transit sets (index arrays or masks) whose allocations seed the search
+        on_improve: function called with every allocation that improves the best one
+        budget: Budget of the search (unlimited if None)
+        key: checkpoint key of the search
+
+    Returns:
+        SearchResult
+
+    """
+    budget = budget or Budget()
+    ensemble = scheduler.ensemble
+    steps = ensemble.steps
+    num_anas = len(ensemble.analyses)
+    result = SearchResult()
+    bound = MakespanBound(ensemble)
+    decisions = [[None] * len(analyses) for analyses in bound.member_analyses]
+    position = {}
+    for i, analyses in enumerate(bound.member_analyses):
+        for p, j in enumerate(analyses):
+            position[j] = (i, p)
+    order = sorted(range(num_anas), key=lambda j: -bound.ana_time_seq[j])
+    bound.set_order(order)
+    mask = [False] * num_anas
+    nc_mem = 0
+    # Relative margin so that rounding errors never prune an optimal set
+    margin = 1 + 1e-9
+    # Objective of the best allocation, and lowest ratio of the objective to the makespan
+    best_score = float('inf')
+    scale = scheduler.robustness.scale if scheduler.robustness is not None else 1
+
+    def evaluate(in_transit):
+        nonlocal best_score
+        result.evaluated += 1
+        instrument.count('candidates')
+        allocation = engine.allocate(ensemble, in_transit, node_heuristic, core_heuristic)
+        if allocation.feasible and not scheduler.feasible(allocation):
+            score = scheduler.score(allocation)
+            if result.best is None or score < best_score:
+                result.best = allocation
+                best_score = score
+                if on_improve:
+                    on_improve(allocation)
+        else:
+            instrument.count('infeasible')
+
+    def decide(depth, decision):
+        nonlocal nc_mem
+        j = order[depth]
+        i, p = position[j]
+        if mask[j]:
+            nc_mem -= bound.ana_mem[j]
+        decisions[i][p] = decision
+        mask[j] = bool(decision)
+        if decision:
+            nc_mem += bound.ana_mem[j]
+
+    def state():
+        return {'path': list(path), 'best': result.best.in_transit.tolist() if result.best else None,
+                'nodes': result.nodes, 'pruned': result.pruned, 'evaluated': result.evaluated}
+
+    # Decisions on the path from the root to the current search node (depth-first)
+    path = []
+    saved = budget.load(key)
+    if saved is not None:
+        path = saved['path']
+        for depth, decision in enumerate(path):
+            decide(depth, decision)
+        result.nodes, result.pruned, result.evaluated = saved['nodes'], saved['pruned'], saved['evaluated']
+        if saved['best'] is not None:
+            evaluate(np.array(saved['best'], dtype=int))
+    for candidate in initial:
+        evaluate(candidate)
+
+    finished = False
+    while not budget.expired():
+        result.nodes += 1
+        leaf = True
+        if result.best is not None and scale > 0:
+            time_step = best_score / scale / steps * margin
+            if bound.time_step != time_step:
+                bound.set_time_step(time_step)
+            if not bound.fits(decisions, nc_mem):
+                result.pruned += 1
+                leaf = False
+        if leaf and len(path) == num_anas:
+            evaluate(np.flatnonzero(mask))
+        elif leaf:
+            # Co-schedule the next analysis first
+            path.append(False)
+            decide(len(path) - 1, False)
+            continue
+        # Backtrack to the next unexplored subtree: move the deepest co-scheduled analysis in transit
+        while path and path[-1]:
+            decide(len(path) - 1, None)
+            path.pop()
+        if not path:
+            finished = True
+            break
+        path[-1] = True
+        decide(len(path) - 1, True)
+        budget.checkpoint(key, state)
+
+    if finished:
+        result.optimal = result.best is not None
+        result.bound = best_score
+    else:
+        budget.checkpoint(key, state, force=True)
+        if result.best is not None and scale > 0:
+            result.bound = bound.lower_bound(best_score / scale) * scale
+    return result
+
+
+def anneal(scheduler, start=(), node_heuristic='model', core_heuristic='model', iterations=2000, seed=0, temperature=0.05, cooling=1e-3, deadline=None):
+    """
+    Simulated annealing over the in-transit mask.
+
+    Every move either flips one analysis in or out of transit, or swaps an in-transit
+    analysis with a co-scheduled one. Moves are scored with an IncrementalAllocator, so
+    a move only recomputes the members it touches, and scheduler.score(). Infeasible sets
+    score infinity. A rejected move restores the previous order of the in-transit
+    analyses, on which the even core split and the rounding ties depend. The best set is
+    returned in the order it was scored in and scored again with scheduler.allocate(),
+    without the running sums of the allocator.
+
+    Args:
+        scheduler: scheduler.Scheduler of the ensemble
+        start: initial in-transit set (index array)
+        node_heuristic: either 'model', 'even' or 'exact'
+        core_heuristic: either 'model', 'even' or 'exact'
+        iterations: number of moves
+        seed: seed of the random moves
+        temperature: initial temperature, relative to the first feasible makespan
+        cooling: final temperature relative to the initial one (geometric cooling)
+        deadline: time.time() after which the search stops, None for no deadline
+
+    Returns:
+        (best in-transit index array in scheduling order, its score), score is infinity if
+        no feasible set was met
+
+    """
+    ensemble = scheduler.ensemble
+    num_anas = len(ensemble.analyses)
+    rng = random.Random(seed)
+    allocator = engine.IncrementalAllocator(ensemble, node_heuristic, core_heuristic)
+    allocator.add(start)
+
+    def score(allocation):
+        if allocation.feasible and not scheduler.feasible(allocation):
+            return scheduler.score(allocation)
+        instrument.count('infeasible')
+        return float('inf')
+
+    def score_move():
+        nonlocal scored
+        instrument.count('candidates')
+        allocation = allocator.allocate()
+        scored = allocation.in_transit
+        return score(allocation)
+
+    scored = None
+    current = score_move()
+    best = current
+    best_set = scored
+    initial_temperature = temperature * current if current < float('inf') else None
+    for k in range(iterations if num_anas else 0):
+        if deadline is not None and time.time() >= deadline:
+            break
+        # Pick a move and its inverse
+        in_transit = allocator.added
+        if in_transit and len(in_transit) < num_anas and rng.random() < 0.5:
+            added = [rng.randrange(num_anas)]
+            while allocator.mask[added[0]]:
+                added = [rng.randrange(num_anas)]
+            removed = [rng.choice(in_transit)]
+        else:
+            j = rng.randrange(num_anas)
+            added, removed = ([], [j]) if allocator.mask[j] else ([j], [])
+        previous = list(allocator.added)
+        allocator.remove(removed)
+        allocator.add(added)
+        candidate = score_move()
+
+        if current == float('inf'):
+            accept = True
+        elif candidate <= current:
+            accept = True
+        elif candidate == float('inf'):
+            accept = False
+        else:
+            step_temperature = initial_temperature * cooling ** (k / iterations)
+            accept = rng.random() < math.exp((current - candidate) / step_temperature)
+        if accept:
+            current = candidate
+            if initial_temperature is None and current < float('inf'):
+                initial_temperature = temperature * current
+            if current < best:
+                best = current
+                best_set = scored
+        else:
+            allocator.remove(added)
+            allocator.add(removed)
+            allocator.added = previous
+    if best == float('inf'):
+        return np.array(best_set, dtype=int), best
+    return np.array(best_set, dtype=int), score(scheduler.allocate(best_set, node_heuristic, core_heuristic))
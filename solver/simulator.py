@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Discrete-event stand-in for insitu-ensemble-simulator.
+
+simulate() replays the job DAG that Controller::main() submits for a configuration:
+for every step, every node of a member runs a compute job followed by a write of its
+share of the data, and every node of an analysis reads the data of the step and then
+analyzes it. A compute job waits for the write of the previous step on its node, a write
+for every read of the previous step of its member, a read for every write of its step
+and for the analysis of the previous step on its node. An analysis that runs every k
+steps only reads and analyzes steps 0, k, 2k, ..., its read waiting for its previous run.
+
+Compute jobs run on their dedicated cores (the allocation never oversubscribes a node)
+for flop / (speedup * speed), where the speedup of the cores follows Amdahl's law with
+the serial fraction of the component and stops at its saturation core count. File
+transfers share bandwidth with max-min fairness as in SimGrid: a write goes through the
+loopback link and the write bandwidth of the local disk, a co-scheduled read through the
+read bandwidth of the local disk and the loopback link, and an in-transit read of each
+simulation node through the read bandwidth of its disk and the shared network. Network
+bandwidths are scaled by SimGrid's default bandwidth factor. Latencies and control
+messages are ignored.
+"""
+import sys
+import math
+import glob
+import os
+import re
+import heapq
+import argparse
+import yaml
+import numpy as np
+from results import Loader
+from engine import speedup
+from network import BANDWIDTH_FACTOR, iterparse, node_partitions, quantity
+
+STAGES = ['compute', 'write', 'read', 'analyze']
+
+
+class Platform:
+    """
+    Speeds (GFLOP/s per core) and bandwidths (GB/s) of the platform.
+
+    `speeds` holds the speed of every compute host of a platform file, None if every
+    node runs at `speed`.
+    """
+
+    def __init__(self, speed=36.8, disk_read=100, disk_write=100, shared_bandwidth=6, loopback_bandwidth=1000, bandwidth_factor=BANDWIDTH_FACTOR):
+        self.speed = speed
+        self.speeds = None
+        self.disk_read = disk_read
+        self.disk_write = disk_write
+        self.shared_bandwidth = shared_bandwidth
+        self.loopback_bandwidth = loopback_bandwidth
+        self.bandwidth_factor = bandwidth_factor
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Platform of a generator spec (see generator.DEFAULT_SPEC).
+        """
+        return cls(spec['speed'], spec['read_bandwidth'], spec['write_bandwidth'], spec['bandwidth'], spec['loopback_bandwidth'])
+
+    @classmethod
+    def from_file(cls, platform_file):
+        """
+        Platform of a SimGrid platform file written by generator.py.
+        """
+        platform = cls()
+        platform.speeds = []
+        for _, element in iterparse(platform_file):
+            if element.tag == 'host' and element.get('id') != 'UserHost':
+                platform.speed = quantity(element.get('speed'), 'f')
+                platform.speeds.append(platform.speed)
+            elif element.tag == 'disk':
+                platform.disk_read = quantity(element.get('read_bw'), 'Bps')
+                platform.disk_write = quantity(element.get('write_bw'), 'Bps')
+            elif element.tag == 'link' and element.get('id') == 'shared_network':
+                platform.shared_bandwidth = quantity(element.get('bandwidth'), 'Bps')
+            elif element.tag == 'link' and element.get('id') == 'loopback_network':
+                platform.loopback_bandwidth = quantity(element.get('bandwidth'), 'Bps')
+            if element.tag in ['host', 'route']:
+                element.clear()
+        return platform
+
+
+class SimulationResult:
+    """
+    Outcome of simulate(): the makespan, and for every stage the time during which at
+    least one of its jobs runs (`busy`) and the total duration of its jobs (`work`).
+    """
+
+    def __init__(self):
+        self.makespan = 0.0
+        self.busy = {stage: 0.0 for stage in STAGES}
+        self.work = {stage: 0.0 for stage in STAGES}
+        self.jobs = 0
+
+
+class JobGraph:
+    """
+    Job DAG as flat arrays.
+
+    Job j belongs to STAGES[stage[j]] and computes for duration[j] seconds or transfers
+    flows flow_ptr[j]:flow_ptr[j + 1]. Flow f moves size[f] GB of job owner[f] through
+    resources[f] (two indices into capacities). The children of job j are
+    children[child_ptr[j]:child_ptr[j + 1]] and job j waits for parents[j] jobs.
+    """
+
+    def __init__(self, stage, duration, owner, size, resources, parent, child, capacities):
+        num_jobs = len(stage)
+        self.stage = stage
+        self.duration = duration
+        self.owner = owner
+        self.size = size
+        self.resources = resources
+        self.flow_ptr = np.concatenate([[0], np.cumsum(np.bincount(owner, minlength=num_jobs))])
+        order = np.argsort(parent, kind='stable')
+        self.children = child[order]
+        self.child_ptr = np.concatenate([[0], np.cumsum(np.bincount(parent, minlength=num_jobs))])
+        self.parents = np.bincount(child, minlength=num_jobs)
+        self.capacities = capacities
+
+
+def build_jobs(config, platform):
+    """
+    JobGraph of Controller::main() for a configuration.
+
+    The jobs of a member repeat every step with the same layout: the compute jobs of its
+    simulation nodes, their writes, then the reads and the analyses of every node of its
+    analyses. The layout of one step is built once and tiled over the steps, and the jobs
+    of the steps on which an analysis does not run are dropped.
+    Every node computes at the speed of its partition in the config, else of its host.
+    """
+    allocations = config['allocations']
+    steps = config['steps']
+    nodes = config['nodes']
+    if config.get('partitions'):
+        runs = node_partitions(config)
+        speed = np.repeat([run[1] for run in runs], [run[0] for run in runs])
+    elif platform.speeds is not None and len(platform.speeds) >= nodes:
+        speed = np.array(platform.speeds[:nodes])
+    else:
+        speed = np.full(nodes, platform.speed)
+    # Resources: shared network, loopback, then the read and write bandwidths of every disk
+    shared = 0
+    loopback = 1
+    disk_read = 2
+    disk_write = 2 + nodes
+    stages, durations, owners, sizes, resources, parents, children, kept = [], [], [], [], [], [], [], []
+    base = 0
+    step_range = np.arange(steps)
+    for sim_config in config['simulations'].values():
+        sim_allocation = allocations[sim_config['alloc']]
+        sim_nodes = np.arange(sim_allocation['start'], sim_allocation['end'] + 1)
+        num_sim_nodes = len(sim_nodes)
+        sim_data = sim_config['data'] / num_sim_nodes
+        sim_speedup = speedup(sim_config['core_per_node'], sim_config.get('serial_fraction', 0), sim_config.get('saturation_cores', math.inf))
+        sim_duration = sim_config['flop'] / num_sim_nodes / (sim_speedup * speed[sim_nodes])
+        # Analysis nodes of the member: node, duration, size of the data it reads, co-scheduled, frequency
+        ana_nodes, ana_durations, ana_sizes, co_scheduled, ana_frequencies = [], [], [], [], []
+        for ana_config in sim_config['coupling'].values():
+            allocation = allocations[ana_config['alloc']]
+            num_nodes = allocation['end'] - allocation['start'] + 1
+            ana_nodes.append(np.arange(allocation['start'], allocation['end'] + 1))
+            ana_speedup = speedup(ana_config['core_per_node'], ana_config.get('serial_fraction', 0), ana_config.get('saturation_cores', math.inf))
+            ana_durations.append(ana_config['flop'] / num_nodes / (ana_speedup * speed[ana_nodes[-1]]))
+            ana_sizes.append(np.full(num_nodes, sim_data / num_nodes))
+            co_scheduled.append(np.full(num_nodes, ana_config['alloc'] == sim_config['alloc']))
+            ana_frequencies.append(np.full(num_nodes, ana_config.get('frequency', 1)))
+        ana_nodes = np.concatenate(ana_nodes) if ana_nodes else np.zeros(0, dtype=int)
+        ana_durations = np.concatenate(ana_durations) if ana_durations else np.zeros(0)
+        ana_sizes = np.concatenate(ana_sizes) if ana_sizes else np.zeros(0)
+        co_scheduled = np.concatenate(co_scheduled) if co_scheduled else np.zeros(0, dtype=bool)
+        ana_frequencies = np.concatenate(ana_frequencies) if ana_frequencies else np.zeros(0, dtype=int)
+        num_ana_nodes = len(ana_nodes)
+
+        # Jobs of one step
+        compute = np.arange(num_sim_nodes)
+        write = num_sim_nodes + compute
+        read = 2 * num_sim_nodes + np.arange(num_ana_nodes)
+        analyze = read + num_ana_nodes
+        width = 2 * num_sim_nodes + 2 * num_ana_nodes
+        stage = np.repeat([0, 1, 2, 3], [num_sim_nodes, num_sim_nodes, num_ana_nodes, num_ana_nodes])
+        duration = np.concatenate([sim_duration, np.zeros(num_sim_nodes + num_ana_nodes), ana_durations])
+
+        # Flows of one step, ordered by job: writes, co-scheduled reads of the local disk
+        # and in-transit reads of every simulation node
+        transit = np.flatnonzero(~co_scheduled)
+        flow_owner = [write, read[co_scheduled], np.repeat(read[transit], num_sim_nodes)]
+        flow_size = [np.full(num_sim_nodes, sim_data), np.full(co_scheduled.sum(), sim_data), np.repeat(ana_sizes[transit], num_sim_nodes)]
+        flow_first = [np.full(num_sim_nodes, loopback), disk_read + ana_nodes[co_scheduled], np.tile(disk_read + sim_nodes, len(transit))]
+        flow_second = [disk_write + sim_nodes, np.full(co_scheduled.sum(), loopback), np.full(len(transit) * num_sim_nodes, shared)]
+        flow_owner, flow_size, flow_first, flow_second = map(np.concatenate, (flow_owner, flow_size, flow_first, flow_second))
+        order = np.argsort(flow_owner, kind='stable')
+        flow_owner, flow_size, flow_first, flow_second = flow_owner[order], flow_size[order], flow_first[order], flow_second[order]
+
+        # Dependencies within a step, then between consecutive steps, then between the
+        # consecutive runs of every analysis
+        within = [(compute, write), (np.repeat(write, num_ana_nodes), np.tile(read, num_sim_nodes)), (read, analyze)]
+        across = [(write, compute), (np.repeat(read, num_sim_nodes), np.tile(write, num_ana_nodes))]
+        offsets = base + width * step_range[:, None]
+        for parent, child in within:
+            parents.append((offsets + parent).ravel())
+            children.append((offsets + child).ravel())
+        for parent, child in across:
+            parents.append((offsets[:-1] + parent).ravel())
+            children.append((offsets[1:] + child).ravel())
+        later = step_range[:, None] + ana_frequencies[None, :] < steps
+        parents.append((offsets + analyze)[later])
+        children.append((offsets + ana_frequencies * width + read)[later])
+        runs = np.ones((steps, width), dtype=bool)
+        runs[:, 2 * num_sim_nodes:] = np.tile(step_range[:, None] % ana_frequencies[None, :] == 0, 2)
+        kept.append(runs.ravel())
+        stages.append(np.tile(stage, steps))
+        durations.append(np.tile(duration, steps))
+        owners.append((offsets + flow_owner).ravel())
+        sizes.append(np.tile(flow_size, steps))
+        resources.append(np.stack([np.tile(flow_first, steps), np.tile(flow_second, steps)], axis=1))
+        base += width * steps
+
+    capacities = np.zeros(2 + 2 * nodes)
+    capacities[shared] = platform.shared_bandwidth * platform.bandwidth_factor
+    capacities[loopback] = platform.loopback_bandwidth * platform.bandwidth_factor
+    capacities[disk_read:disk_write] = platform.disk_read
+    capacities[disk_write:] = platform.disk_write
+    if not stages:
+        stages, durations, owners, sizes, parents, children, kept = [[np.zeros(0, dtype=int)]] * 7
+        resources = [np.zeros((0, 2), dtype=int)]
+    stages, durations, owners, sizes, resources, parents, children, kept = map(np.concatenate, (stages, durations, owners, sizes, resources, parents, children, kept))
+    if not kept.all():
+        # Drop the reads and analyses of the steps on which their analysis does not run,
+        # their dependencies and their flows, and renumber the jobs
+        number = np.cumsum(kept) - 1
+        edges = kept[parents] & kept[children]
+        parents, children = number[parents[edges]], number[children[edges]]
+        flows = kept[owners]
+        owners, sizes, resources = number[owners[flows]], sizes[flows], resources[flows]
+        stages, durations = stages[kept], durations[kept]
+    return JobGraph(stages, durations.astype(float), owners, sizes.astype(float), resources, parents, children, capacities)
+
+
+def _max_min_rates(resources, capacities):
+    """
+    Max-min fair rates of flows that each use two resources (progressive filling).
+    """
+    num_flows = len(resources)
+    rates = np.zeros(num_flows)
+    remaining = capacities.astype(float)
+    active = np.ones(num_flows, dtype=bool)
+    first = resources[:, 0]
+    second = resources[:, 1]
+    while active.any():
+        counts = np.bincount(first[active], minlength=len(capacities)) + np.bincount(second[active], minlength=len(capacities))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.where(counts > 0, remaining / counts, np.inf)
+        bottleneck = int(np.argmin(shares))
+        share = shares[bottleneck]
+        fixed = active & ((first == bottleneck) | (second == bottleneck))
+        rates[fixed] = share
+        remaining -= (np.bincount(first[fixed], minlength=len(capacities)) + np.bincount(second[fixed], minlength=len(capacities))) * share
+        np.maximum(remaining, 0, out=remaining)
+        active &= ~fixed
+    return rates
+
+
+def _ranges(ptr, indices):
+    """
+    Concatenation of ptr[i]:ptr[i + 1] for every i in indices.
+    """
+    lengths = ptr[indices + 1] - ptr[indices]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=int)
+    return np.repeat(ptr[indices] - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+
+def simulate(config, platform=None):
+    """
+    Simulate the execution of a configuration.
+
+    Args:
+        config: configuration written by the scheduler (with allocations)
+        platform: Platform, the platform of generator.DEFAULT_SPEC if None
+
+    Returns:
+        SimulationResult
+
+    """
+    platform = platform or Platform()
+    graph = build_jobs(config, platform)
+    num_jobs = len(graph.stage)
+    waiting = graph.parents.copy()
+    pending = np.diff(graph.flow_ptr)
+    remaining = graph.size.copy()
+    start = np.zeros(num_jobs)
+    end = np.zeros(num_jobs)
+    now = 0.0
+    # Running compute jobs as a heap of (end, job) and indices of the running flows
+    computing = []
+    active = np.zeros(0, dtype=int)
+
+    def launch(jobs):
+        nonlocal active
+        start[jobs] = now
+        transferring = pending[jobs] > 0
+        for job, duration in zip(jobs[~transferring].tolist(), graph.duration[jobs[~transferring]].tolist()):
+            heapq.heappush(computing, (now + duration, job))
+        active = np.concatenate([active, _ranges(graph.flow_ptr, jobs[transferring])])
+
+    launch(np.flatnonzero(waiting == 0))
+    while computing or active.size:
+        if active.size:
+            rates = _max_min_rates(graph.resources[active], graph.capacities)
+            times = remaining[active] / rates
+            transfer_end = now + times.min()
+        else:
+            transfer_end = np.inf
+        compute_end = computing[0][0] if computing else np.inf
+        elapsed = min(transfer_end, compute_end) - now
+        now += elapsed
+        done = []
+        if active.size:
+            # Flows that end within rounding errors of the event
+            finished = times - elapsed <= 1e-12 * max(now, 1.0)
+            remaining[active] -= rates * elapsed
+            owners = graph.owner[active[finished]]
+            active = active[~finished]
+            if owners.size:
+                np.subtract.at(pending, owners, 1)
+                owners = np.unique(owners)
+                done.append(owners[pending[owners] == 0])
+        ended = []
+        while computing and computing[0][0] <= now:
+            ended.append(heapq.heappop(computing)[1])
+        done.append(np.array(ended, dtype=int))
+        done = np.concatenate(done)
+        end[done] = now
+        children = graph.children[_ranges(graph.child_ptr, done)]
+        np.subtract.at(waiting, children, 1)
+        launch(np.unique(children[waiting[children] == 0]))
+
+    result = SimulationResult()
+    result.jobs = num_jobs
+    result.makespan = now
+    for k, stage in enumerate(STAGES):
+        jobs = np.flatnonzero(graph.stage == k)
+        result.work[stage] = float((end[jobs] - start[jobs]).sum())
+        result.busy[stage] = _union(start[jobs], end[jobs])
+    return result
+
+
+def _union(starts, ends):
+    """
+    Total length of the union of the intervals [starts[i], ends[i]].
+    """
+    if len(starts) == 0:
+        return 0.0
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    # Furthest end of the intervals that start before each interval
+    reach = np.concatenate([[-np.inf], np.maximum.accumulate(ends)[:-1]])
+    return float(np.maximum(ends - np.maximum(starts, reach), 0).sum())
+
+
+def validate(log_dir, platform=None):
+    """
+    Compare simulate() with the runs of insitu-ensemble-simulator in a log directory, as
+    analysis/extract.py reads them: every <run>/<case>.conf next to a <case>.err with the
+    'End time of the simulation'.
+
+    Returns:
+        list of (case, simulated makespan, recorded makespan)
+
+    """
+    rows = []
+    for conf_file in sorted(glob.glob(os.path.join(log_dir, '**', '*.conf'), recursive=True)):
+        err_file = conf_file[:-len('.conf')] + '.err'
+        if not os.path.exists(err_file):
+            continue
+        with open(err_file, 'r') as file:
+            match = re.search(r'End time of the simulation: ([0-9.eE+-]+)', file.read())
+        if match is None:
+            continue
+        platform_file = os.path.join(os.path.dirname(conf_file), 'platform.xml')
+        case_platform = platform or (Platform.from_file(platform_file) if os.path.exists(platform_file) else None)
+        with open(conf_file, 'r') as file:
+            config = yaml.load(file, Loader=Loader)
+        rows.append((conf_file, simulate(config, case_platform).makespan, float(match.group(1))))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage='python3 simulator.py <config> [<config> ...] [--platform <platform xml>] | --validate <log directory>')
+    parser.add_argument('configs', nargs='*', help='configurations written by the scheduler')
+    parser.add_argument('--platform', help='platform file (generator defaults if omitted)')
+    parser.add_argument('--validate', help='compare with the runs of insitu-ensemble-simulator in a log directory')
+    args = parser.parse_args()
+
+    platform = Platform.from_file(args.platform) if args.platform else None
+    if args.validate:
+        rows = validate(args.validate, platform)
+        errors = []
+        for case, simulated, recorded in rows:
+            error = (simulated - recorded) / recorded
+            errors.append(abs(error))
+            print(f'{case}: simulated {simulated:.4f}, recorded {recorded:.4f}, error {100 * error:.2f}%')
+        if errors:
+            print(f'{len(errors)} cases, mean absolute error {100 * np.mean(errors):.2f}%, max {100 * np.max(errors):.2f}%')
+    elif args.configs:
+        for config_file in args.configs:
+            with open(config_file, 'r') as file:
+                config = yaml.load(file, Loader=Loader)
+            result = simulate(config, platform)
+            print(f'{config_file}: makespan {result.makespan:.4f}, {result.jobs} jobs')
+            for stage in STAGES:
+                print(f'  {stage}: busy {result.busy[stage]:.4f}, work {result.work[stage]:.4f}')
+    else:
+        parser.print_usage()
+        sys.exit()
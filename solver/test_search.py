@@ -0,0 +1,21 @@
+"""
+Regression tests of search.py, run with python3 -m pytest solver
+"""
+import generator
+import search
+from scheduler import Scheduler
+
+
+def test_anneal_returns_the_scored_allocation():
+    # The even core split and the rounding ties depend on the order of the in-transit
+    # analyses: the returned set must allocate to the score of the search
+    for seed in range(4):
+        scheduler = Scheduler(generator.generate(generator.load_spec(seed=seed, nodes=24, simulations=6, analyses=4, cores=16)))
+        for node_heuristic, core_heuristic in [('model', 'model'), ('even', 'even'), ('model', 'even')]:
+            for k, start in enumerate(scheduler.scenarios()[:3]):
+                best_set, score = search.anneal(scheduler, start, node_heuristic, core_heuristic, iterations=100, seed=k)
+                if score == float('inf'):
+                    continue
+                allocation = scheduler.allocate(best_set, node_heuristic, core_heuristic)
+                assert allocation.feasible and not scheduler.feasible(allocation)
+                assert scheduler.score(allocation) == score
@@ -17,6 +17,7 @@
 #define GBYTE (1000.0 * 1000.0 * 1000.0)
 
 #include <iostream>
+#include <algorithm>
 
 #include <yaml-cpp/yaml.h>
 
@@ -65,9 +66,6 @@ namespace wrench {
         double compute_mem = 0;
         double analysis_mem = 0;
 
-        /* Amdahl alpha fraction. Setting this to 1 mean the task is perfectly parallel */
-        double amdahl_fraction = 1.0;
-
         /* Create a job manager so that we can create/submit jobs */
         auto job_manager = this->createJobManager();
 
@@ -91,6 +89,10 @@ namespace wrench {
             double simulation_data_size = data_size / simulation_num_nodes;
             int simulation_core = i->second["core_per_node"].as<int>();
             double simulation_flop = i->second["flop"].as<double>() * GFLOP / simulation_num_nodes;
+            /* Amdahl alpha fraction (1 - serial fraction). Setting this to 1 mean the task is perfectly parallel */
+            double simulation_amdahl_fraction = 1.0 - i->second["serial_fraction"].as<double>(0.0);
+            /* Cores beyond the saturation of the memory bandwidth do not speed up the task */
+            int simulation_compute_core = std::min(simulation_core, i->second["saturation_cores"].as<int>(simulation_core));
             int num_analyses = i->second["coupling"].size();
             WRENCH_DEBUG("Simulation %s is co-scheduled on co-scheduling allocation %s from node %d to node %d, each node writes %.2lf bytes", simulation_name.c_str(), simulation_allocation.c_str(), simulation_node_start, simulation_node_end, simulation_data_size);
             WRENCH_DEBUG("Number of analyses coupled with simulation %s : %d", simulation_name.c_str(), num_analyses);
@@ -108,7 +110,7 @@ namespace wrench {
                     /* Computing stage */
                     // WRENCH_INFO("Creating a compound job %s with a file read action followed by a compute action", job->getName().c_str());
                     auto compute_job = job_manager->createCompoundJob("member_" + simulation_name + "_compute_job_step_" + std::to_string(step) + "_node_" + std::to_string(node));
-                    compute_job->addComputeAction("compute", simulation_flop, compute_mem, simulation_core, simulation_core, wrench::ParallelModel::AMDAHL(amdahl_fraction));     
+                    compute_job->addComputeAction("compute", simulation_flop, compute_mem, simulation_compute_core, simulation_compute_core, wrench::ParallelModel::AMDAHL(simulation_amdahl_fraction));     
                     /* Computing stage succeeds writing stage of the previous step */
                     if (step > 1)
                         compute_job->addParentJob(data_write_jobs[node-simulation_node_start]);       
@@ -141,6 +143,12 @@ namespace wrench {
                     
                     std::string analysis_name = j->first.as<std::string>();
                     // std::cout << analysis_name << std::endl;
+                    /* The analysis only runs every analysis_frequency steps, from the first one */
+                    int analysis_frequency = j->second["frequency"].as<int>(1);
+                    if ((step - 1) % analysis_frequency != 0) {
+                        ++k;
+                        continue;
+                    }
                     std::string analysis_allocation = j->second["alloc"].as<std::string>();
                     int analysis_node_start = config["allocations"][analysis_allocation]["start"].as<int>(); 
                     int analysis_node_end = config["allocations"][analysis_allocation]["end"].as<int>(); 
@@ -149,6 +157,8 @@ namespace wrench {
                     double analysis_total_data_size = simulation_data_size * simulation_num_nodes / analysis_num_nodes;
                     int analysis_core = j->second["core_per_node"].as<int>();
                     double analysis_flop = j->second["flop"].as<double>() * GFLOP / analysis_num_nodes;        
+                    double analysis_amdahl_fraction = 1.0 - j->second["serial_fraction"].as<double>(0.0);
+                    int analysis_compute_core = std::min(analysis_core, j->second["saturation_cores"].as<int>(analysis_core));
 
                     WRENCH_DEBUG("Analysis %s (simulation %s) is co-scheduled on co-scheduling allocation %s from node %d to node %d, each node reads %.2lf bytes", analysis_name.c_str(), simulation_name.c_str(), analysis_allocation.c_str(), analysis_node_start, analysis_node_end, analysis_total_data_size);
 
@@ -193,7 +203,7 @@ namespace wrench {
                             }
                         }
 
-                        /* Reading stage succeeds the analyzing stage of the previous iteration */
+                        /* Reading stage succeeds the analyzing stage of the previous run */
                         if (step > 1)
                             data_read_job->addParentJob(analysis_jobs[k][node - analysis_node_start]);
                         /* Reading stage succeeds writing stages */
@@ -205,7 +215,7 @@ namespace wrench {
 
                         /* Analyzing stage */
                         auto analysis_job = job_manager->createCompoundJob("member_" + simulation_name + "_" + analysis_name + "_analysis_job_step_" + std::to_string(step) + "_node_" + std::to_string(node));
-                        analysis_job->addComputeAction("analysis", analysis_flop, analysis_mem, analysis_core, analysis_core, wrench::ParallelModel::AMDAHL(amdahl_fraction));
+                        analysis_job->addComputeAction("analysis", analysis_flop, analysis_mem, analysis_compute_core, analysis_compute_core, wrench::ParallelModel::AMDAHL(analysis_amdahl_fraction));
                         /* Analyzing stage succeeds reading stage */
                         analysis_job->addParentJob(data_read_job);
                         if (step > 1) 